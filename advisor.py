@@ -0,0 +1,218 @@
+"""
+Index advisor: runs EXPLAIN over the queries in app.py and auth.py and
+reports full table scans, filesorts and temporary tables.
+
+    python benchmark.py seed
+    python advisor.py --db student_roster_bench
+
+Queries are read from the source, not from a running app: every string
+literal starting with SELECT, plus the ORDER BY ... LIMIT and keyset page
+forms paginate_template builds around list page queries. The /api/<table>
+list queries are assembled at request time from the query string, so
+list_page_query is run for the representative query strings in
+LIST_SHAPES instead. Queries without WHERE or LIMIT read whole tables on
+purpose (index loads, exports) and are skipped. Run it against a seeded database; on a near-empty one
+MySQL prefers scans anyway. Exits with status 1 when something is
+reported, so it can gate a deployment.
+"""
+import argparse
+import ast
+import os
+import re
+import sys
+
+from benchmark import connect
+
+SOURCES = ["app.py", "auth.py"]
+
+# Findings that are known and accepted, by (query name, table, kind),
+# with the reason. Other findings for the same query are still reported.
+ACCEPTED = {
+    ("get_classes", "classes", "filesort"):
+        "classes.description is TEXT and cannot be indexed for ORDER BY; one filesort per page",
+}
+
+# Query strings of /api/<table> requests worth checking: the default
+# order, the sorts the list indexes are for, and common filters.
+LIST_SHAPES = [
+    ("students", ""),
+    ("students", "sort=firstname"),
+    ("students", "lastname=Smith&sort=-birthdate"),
+    ("teachers", "sort=firstname"),
+    ("classes", "idcourse=1"),
+    ("rooms", "sort=location"),
+    ("courses", "sort=name"),
+    ("roster", "idclass=1"),
+    ("roster", "idstudent=1"),
+    ("roster", "idteacher=1&class_period=Morning"),
+]
+
+BULK_READ = re.compile(r"\b(WHERE|LIMIT)\b", re.IGNORECASE)
+LIMIT_PARAM = re.compile(r"\bLIMIT\s+%s", re.IGNORECASE)
+
+
+def is_query(value):
+    return isinstance(value, str) and value.lstrip().upper().startswith("SELECT")
+
+def page_queries(query, order):
+    """
+    The first and a later page of a paginate_template query ordered by
+    the columns in order.
+    """
+    order_by = " ORDER BY " + ", ".join(order) + " LIMIT %s"
+    clauses = [" AND ".join([f"{prior} = %s" for prior in order[:i]] + [f"{column} > %s"])
+               for i, column in enumerate(order)]
+    condition = clauses[0] if len(clauses) == 1 else "(" + " OR ".join(f"({c})" for c in clauses) + ")"
+    return [query + order_by, f"{query} WHERE {condition}{order_by}"]
+
+def collect_queries(source, filename="<source>"):
+    """
+    (name, query) for every query in a module's source. name is the
+    constant the query is assigned to, or the enclosing function.
+    """
+    tree = ast.parse(source, filename)
+    constants = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and is_query(node.value.value):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    constants[target.id] = node.value.value
+
+    queries = [(name, query) for name, query in constants.items()]
+    for function in ast.walk(tree):
+        if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        local = dict(constants)
+        for node in ast.walk(function):
+            if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and is_query(node.value.value):
+                local.update((target.id, node.value.value) for target in node.targets if isinstance(target, ast.Name))
+                queries.append((function.name, node.value.value))
+            elif isinstance(node, ast.Call) and node.args:
+                if isinstance(node.args[0], ast.Constant) and is_query(node.args[0].value):
+                    queries.append((function.name, node.args[0].value))
+                if getattr(node.func, "id", None) == "paginate_template" and len(node.args) == 2:
+                    query = node.args[0]
+                    query = local.get(query.id) if isinstance(query, ast.Name) else getattr(query, "value", None)
+                    if query is not None:
+                        order = [column for column, _ in ast.literal_eval(node.args[1])]
+                        queries.extend((function.name, page) for page in page_queries(query, order))
+
+    seen, result = set(), []
+    for name, query in queries:
+        if (name, query) not in seen and BULK_READ.search(query):
+            seen.add((name, query))
+            result.append((name, query))
+    return result
+
+def list_queries(shapes=LIST_SHAPES):
+    """
+    (name, query) for the first and a later page of every /api/<table>
+    request in shapes, built by the app's own list_page_query.
+    """
+    from app import TABLE_COLUMNS, app, encode_keyset, list_page_query
+
+    queries = []
+    for table, query_string in shapes:
+        pk = TABLE_COLUMNS[table][0]
+        name = f"/api/{table}" + (f"?{query_string}" if query_string else "")
+        with app.test_request_context(f"/api/{table}", query_string=query_string):
+            first, _, (_, _, order, _) = list_page_query(table, pk)
+        cursor = "cursor=" + encode_keyset(["1"] * len(order))
+        with app.test_request_context(f"/api/{table}", query_string="&".join(filter(None, [query_string, cursor]))):
+            later, _, _ = list_page_query(table, pk)
+        queries.extend([(name, first), (name, later)])
+    return queries
+
+def explainable(query):
+    """
+    The query with its placeholders filled in: LIMIT gets a page size,
+    every other %s the string '1' (which MySQL compares against numeric
+    columns without losing the index) and IN ({}) lists one value.
+    """
+    query = query.replace("{}", "%s")
+    query = LIMIT_PARAM.sub("LIMIT 51", query)
+    return query.replace("%s", "'1'")
+
+def explain(conn, query):
+    cur = conn.cursor()
+    try:
+        cur.execute("EXPLAIN " + explainable(query))
+        columns = [column[0].lower() for column in cur.description]
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+    finally:
+        cur.close()
+
+def problems(plan, min_rows=1000):
+    """
+    What is wrong with an EXPLAIN plan (a list of row dicts), as
+    (table, kind, message) triples, ignoring steps estimated to touch
+    fewer than min_rows rows.
+    """
+    found = []
+    for step in plan:
+        rows = step.get("rows") or 0
+        if rows < min_rows:
+            continue
+        extra = step.get("extra") or ""
+        table = step["table"]
+        if step.get("type") == "ALL":
+            found.append((table, "full scan", f"full scan of {table} (~{rows} rows)"))
+        if "Using filesort" in extra:
+            found.append((table, "filesort", f"filesort on {table} (~{rows} rows)"))
+        if "Using temporary" in extra:
+            found.append((table, "temporary table", f"temporary table on {table} (~{rows} rows)"))
+    return found
+
+def advise(conn, queries, min_rows=1000, show_accepted=False):
+    """
+    Prints a report for (name, query) pairs and returns the number of
+    queries with unaccepted findings.
+    """
+    failed = 0
+    for name, query in queries:
+        try:
+            found = problems(explain(conn, query), min_rows)
+        except Exception as e:
+            found = [(None, "error", f"EXPLAIN failed: {e}")]
+        reasons = [ACCEPTED.get((name, table, kind)) for table, kind, _ in found]
+        shown = [(message, reason) for (_, _, message), reason in zip(found, reasons) if show_accepted or not reason]
+        if not shown:
+            continue
+        failed += not all(reasons)
+        print(name)
+        print("    " + " ".join(query.split()))
+        for message, reason in shown:
+            print(f"    - {message}{' (accepted: ' + reason + ')' if reason else ''}")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EXPLAIN the app's queries and report scans and filesorts.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--db", default="student_roster_bench")
+    parser.add_argument("--min-rows", type=int, default=1000, help="ignore plan steps estimated below this many rows")
+    parser.add_argument("--show-accepted", action="store_true", help="also print findings listed in ACCEPTED")
+    parser.add_argument("sources", nargs="*", default=SOURCES)
+    args = parser.parse_args(argv)
+
+    queries = []
+    here = os.path.dirname(os.path.abspath(__file__))
+    for path in args.sources:
+        with open(os.path.join(here, path), encoding="utf-8") as f:
+            queries.extend(collect_queries(f.read(), path))
+    queries.extend(list_queries())
+
+    conn = connect(args)
+    try:
+        failed = advise(conn, queries, args.min_rows, args.show_accepted)
+    finally:
+        conn.close()
+    print(f"{len(queries)} queries explained, {failed} with findings")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,112 @@
-from flask import Flask, render_template, jsonify, request, make_response
-from flask_mysqldb import MySQL
-from auth import auth_bp, role_required
+import base64
+import binascii
+import click
+import csv
+import gzip
+import io
+import json
+import re
+import threading
+import time
+import uuid
+from functools import partial, wraps
+from urllib.parse import urlencode
+from flask import Flask, Response, render_template, jsonify, request, make_response, stream_with_context, has_request_context, g
+from pool import MySQLPool, mysql_connector
+from cache import create_cache
+from schedule import ScheduleSummary
+from search import PeopleIndex
+from conflicts import ConflictIndex
+from timetable import TimetableIndex
+from instrumentation import create_query_stats
+from metrics import RequestMetrics
+from importer import CSVImport, IMPORT_ORDER, IMPORT_SPECS, load_ids, referenced_tables
+from exporter import EXPORT_FORMATS, export_writer, fetch_batches, gzip_chunks
+from migrate import MigrationRunner
+from MySQLdb.cursors import SSCursor
+from auth import auth_bp, role_required, token_cache
 from werkzeug.exceptions import BadRequest
 from flask_jwt_extended import JWTManager
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 app = Flask(__name__)
 app.config["MYSQL_HOST"] = "localhost"
 app.config["MYSQL_USER"] = "root"
 app.config["MYSQL_PASSWORD"] = ""
 app.config["MYSQL_DB"] = "student_roster_db"
 app.config["JWT_SECRET_KEY"] = "auth_key_1001"  
-mysql = MySQL(app)
+app.config["JWT_VERIFY_CACHE_SIZE"] = 10000
+app.config["JWT_VERIFY_CACHE_MAX_AGE"] = 300
+app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:600000"
+app.config["AUTH_DEMO_ACCOUNTS"] = False
+app.config["AUTH_USER_CACHE_SIZE"] = 10000
+app.config["AUTH_USER_CACHE_TTL"] = 60
+app.config["AUTH_MAX_USERS_PER_REQUEST"] = 100
+app.config["LOGIN_MAX_FAILURES"] = 5
+app.config["LOGIN_MAX_FAILURES_PER_ADDRESS"] = 100
+app.config["LOGIN_FAILURE_WINDOW"] = 300
+app.config["LOGIN_MAX_CONCURRENT_HASHES"] = 4
+app.config["LOGIN_QUEUE_TIMEOUT"] = 5
+app.config["API_PAGE_SIZE"] = 100
+app.config["API_MAX_PAGE_SIZE"] = 1000
+app.config["API_STREAM_BATCH_SIZE"] = 1000
+app.config["PAGE_SIZE"] = 50
+app.config["BULK_CHUNK_SIZE"] = 1000
+app.config["API_MAX_BATCH_IDS"] = 100
+app.config["API_MAX_BATCH_OPERATIONS"] = 1000
+app.config["IMPORT_CHUNK_SIZE"] = 5000
+app.config["IMPORT_LOAD_DATA"] = False
+app.config["IMPORT_MAX_REPORTED_REJECTS"] = 1000
+app.config["EXPORT_BATCH_SIZE"] = 10000
+app.config["MIGRATION_BATCH_SIZE"] = 1000
+app.config["MIGRATION_SLEEP"] = 0.05
+app.config["MIGRATION_LOCK_WAIT_TIMEOUT"] = 5
+app.config["MIGRATION_REPLICA_HOST"] = None
+app.config["MIGRATION_MAX_REPLICA_LAG"] = 1.0
+app.config["MYSQL_POOL_MIN_SIZE"] = 2
+app.config["MYSQL_POOL_MAX_SIZE"] = 20
+app.config["MYSQL_POOL_IDLE_TIMEOUT"] = 300
+app.config["MYSQL_POOL_MAX_LIFETIME"] = 3600
+app.config["CACHE_BACKEND"] = "memory"
+app.config["CACHE_TTL"] = 300
+app.config["CACHE_MAX_ENTRIES"] = 1024
+app.config["SCHEDULE_MAX_AGE"] = 300
+app.config["SEARCH_MAX_AGE"] = 300
+app.config["ROSTER_CONFLICTS"] = "flag"
+app.config["CONFLICTS_MAX_AGE"] = 300
+app.config["TIMETABLE_MAX_AGE"] = 300
+app.config["INDEX_REFRESH_INTERVAL"] = 5
+app.config["SEARCH_LIMIT"] = 10
+app.config["SEARCH_MAX_LIMIT"] = 50
+app.config["PAGE_CACHE_ENCODINGS"] = ["br", "gzip"]
+app.config["QUERY_STATS_ENABLED"] = True
+app.config["QUERY_STATS_SAMPLES"] = 1000
+app.config["SLOW_QUERY_THRESHOLD"] = 0.5
+app.config["SLOW_QUERY_LOG"] = None
+app.config["METRICS_DIR"] = None
+app.config["METRICS_FLUSH_INTERVAL"] = 1.0
+app.config["METRICS_SNAPSHOT_TTL"] = 300
+mysql = MySQLPool(app)
+response_cache = create_cache(app.config)
+query_stats = create_query_stats(app.config)
+metrics = RequestMetrics(directory=app.config["METRICS_DIR"], flush_interval=app.config["METRICS_FLUSH_INTERVAL"],
+                         snapshot_ttl=app.config["METRICS_SNAPSHOT_TTL"])
 jwt = JWTManager(app)
 
 app.register_blueprint(auth_bp, url_prefix='/auth')
 
 
+def record_query(query, started, rows_returned=0, rows_affected=0):
+    if started is not None:
+        query_stats.record(request.endpoint if has_request_context() else None, query,
+                           time.perf_counter() - started, rows_returned, rows_affected)
+
 def execute_json(query, *args):
+    started = time.perf_counter() if query_stats.enabled else None
     cur = mysql.connection.cursor()
     try:
         cur.execute(query, *args if args else ())
@@ -25,9 +115,11 @@ def execute_json(query, *args):
         return make_response(jsonify({"error": "Database error", "message": str(e)}), 500)
     finally:
         cur.close()
+    record_query(query, started, rows_returned=len(data))
     return data
 
 def execute_template(query, *args):
+    started = time.perf_counter() if query_stats.enabled else None
     cur = mysql.connection.cursor()
     try:
         cur.execute(query, args if args else ())
@@ -37,19 +129,119 @@ def execute_template(query, *args):
         return make_response(jsonify({"error": "Database error", "message": str(e)}), 500)
     finally:
         cur.close()
+    record_query(query, started, rows_returned=len(data))
     return data
 
+def execute_stream(query, *args):
+    started = time.perf_counter() if query_stats.enabled else None
+    cur = mysql.connection.cursor(SSCursor)
+    try:
+        cur.execute(query, *args if args else ())
+        columns = [col[0] for col in cur.description]
+    except Exception as e:
+        cur.close()
+        return make_response(jsonify({"error": "Database error", "message": str(e)}), 500)
+
+    def generate():
+        count = 0
+        try:
+            while True:
+                rows = cur.fetchmany(app.config["API_STREAM_BATCH_SIZE"])
+                if not rows:
+                    break
+                count += len(rows)
+                for row in rows:
+                    if not isinstance(row, dict):
+                        row = dict(zip(columns, row))
+                    yield app.json.dumps(row, separators=(",", ":")) + "\n"
+        finally:
+            cur.close()
+            record_query(query, started, rows_returned=count)
+
+    return Response(stream_with_context(generate()), 200, mimetype="application/x-ndjson")
+
+write_listeners = []
+
+def on_write(func):
+    """
+    Registers func(table, op, key) to run after every committed write.
+    key is the inserted id or the id in a trailing "WHERE pk=%s", and
+    None when the write may have touched any number of rows.
+    """
+    write_listeners.append(func)
+    return func
+
+WRITE_PATTERN = re.compile(r"^\s*(INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)", re.IGNORECASE)
+KEY_PATTERN = re.compile(r"WHERE\s+\w+\s*=\s*%s\s*$", re.IGNORECASE)
+
+def notify_write(query, args=None, lastrowid=None):
+    match = WRITE_PATTERN.match(query)
+    if not match:
+        return
+    op = match.group(1).split()[0].lower()
+    key = None
+    if args is not None:
+        if op == "insert":
+            key = lastrowid
+        elif KEY_PATTERN.search(query):
+            key = args[-1]
+    for listener in write_listeners:
+        listener(match.group(2).lower(), op, key)
+
 def commit(query, *args):
+    started = time.perf_counter() if query_stats.enabled else None
     cur = mysql.connection.cursor()
     try:
         cur.execute(query, args)
         mysql.connection.commit()
-        return cur.rowcount
+        rows, lastrowid = cur.rowcount, cur.lastrowid
+    except Exception as e:
+        mysql.connection.rollback()
+        raise RuntimeError(f"Commit failed: {str(e)}")
+    finally:
+        cur.close()
+    record_query(query, started, rows_affected=rows)
+    notify_write(query, args, lastrowid)
+    return rows
+
+def commit_many(query, rows):
+    """
+    Writes rows with executemany, one transaction per BULK_CHUNK_SIZE rows.
+    A chunk the database rejects is rolled back and replayed row by row so
+    the good rows still land and each bad one is reported with its index.
+    Returns (rows_affected, errors).
+    """
+    started = time.perf_counter() if query_stats.enabled else None
+    chunk_size = app.config["BULK_CHUNK_SIZE"]
+    total, errors = 0, []
+    cur = mysql.connection.cursor()
+    try:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            try:
+                cur.executemany(query, chunk)
+                mysql.connection.commit()
+                total += cur.rowcount
+                continue
+            except Exception:
+                mysql.connection.rollback()
+
+            for index, row in enumerate(chunk, start):
+                try:
+                    cur.execute(query, row)
+                    total += cur.rowcount
+                except Exception as e:
+                    errors.append({"index": index, "message": str(e)})
+            mysql.connection.commit()
     except Exception as e:
         mysql.connection.rollback()
         raise RuntimeError(f"Commit failed: {str(e)}")
     finally:
         cur.close()
+    record_query(query, started, rows_affected=total)
+    if total:
+        notify_write(query)
+    return total, errors
 
 def validate_request_data(required_fields):
     if not request.is_json:
@@ -60,6 +252,479 @@ def validate_request_data(required_fields):
             raise BadRequest(f"'{field}' is required")
     return data
 
+def is_bulk_request():
+    return request.is_json and isinstance(request.get_json(silent=True), list)
+
+def validate_bulk_request_data(required_fields):
+    data = request.get_json()
+    if not data:
+        raise BadRequest("Request must contain at least one row")
+    errors = []
+    for index, row in enumerate(data):
+        if not isinstance(row, dict):
+            errors.append({"index": index, "message": "Row must be a JSON object"})
+            continue
+        for field in required_fields:
+            if field not in row:
+                errors.append({"index": index, "message": f"'{field}' is required"})
+                break
+    return data, errors
+
+def bulk_insert(query, required_fields, values, check=None):
+    """
+    Inserts a JSON array of rows. Nothing is written unless every row
+    passes validation. check, if given, takes the rows and returns
+    (flags, rejection) like check_roster_write.
+    """
+    data, errors = validate_bulk_request_data(required_fields)
+    if errors:
+        return make_response(jsonify(
+            {"error": "Bad Request", "message": "invalid rows", "errors": errors}
+            ), 400)
+    flags = {}
+    if check is not None:
+        flags, rejection = check(data)
+        if rejection is not None:
+            return rejection
+
+    rows, errors = commit_many(query, [values(row) for row in data])
+    if errors and not rows:
+        return make_response(jsonify(
+            {"error": "Bad Request", "message": "no rows created", "rows_affected": 0, "errors": errors}
+            ), 400)
+    return make_response(jsonify(
+        {"message": "data created successfully", "rows_affected": rows, "errors": errors, **flags}
+        ), 207 if errors else 201)
+
+def person_values(data):
+    return (data["firstname"], data.get("middlename"), data["lastname"], data["birthdate"], data["gender"])
+
+def roster_values(data):
+    return (data.get("idclass"), data.get("idstudent"), data.get("idteacher"), data["class_period"])
+
+TABLE_COLUMNS = {
+    "students": ["idstudents", "firstname", "middlename", "lastname", "birthdate", "gender"],
+    "teachers": ["idteachers", "firstname", "middlename", "lastname", "birthdate", "gender"],
+    "classes": ["idclasses", "description", "idroom", "idcourse"],
+    "rooms": ["idrooms", "location", "description"],
+    "courses": ["idcourses", "name", "code"],
+    "roster": ["idroster", "idclass", "idstudent", "idteacher", "class_period"],
+}
+
+# Keyset cursors compare column values, so only NOT NULL columns can be sorted on.
+SORTABLE_COLUMNS = {
+    "students": ["idstudents", "firstname", "lastname", "birthdate", "gender"],
+    "teachers": ["idteachers", "firstname", "lastname", "birthdate", "gender"],
+    "classes": ["idclasses", "description"],
+    "rooms": ["idrooms", "location"],
+    "courses": ["idcourses", "name", "code"],
+    "roster": ["idroster", "class_period"],
+}
+
+RESERVED_ARGS = {"limit", "cursor", "format", "fields", "sort"}
+
+def escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def filter_in(column, value):
+    values = [item for item in value.split(",") if item]
+    if not values:
+        raise BadRequest(f"'{column}__in' needs at least one value")
+    return f"{column} IN ({', '.join(['%s'] * len(values))})", values
+
+def filter_isnull(column, value):
+    if value not in ("true", "false"):
+        raise BadRequest(f"'{column}__isnull' must be true or false")
+    return f"{column} IS {'' if value == 'true' else 'NOT '}NULL", []
+
+FILTER_OPERATORS = {
+    "eq": lambda column, value: (f"{column} = %s", [value]),
+    "ne": lambda column, value: (f"{column} <> %s", [value]),
+    "lt": lambda column, value: (f"{column} < %s", [value]),
+    "lte": lambda column, value: (f"{column} <= %s", [value]),
+    "gt": lambda column, value: (f"{column} > %s", [value]),
+    "gte": lambda column, value: (f"{column} >= %s", [value]),
+    "startswith": lambda column, value: (f"{column} LIKE %s", [escape_like(value) + "%"]),
+    "contains": lambda column, value: (f"{column} LIKE %s", ["%" + escape_like(value) + "%"]),
+    "in": filter_in,
+    "isnull": filter_isnull,
+}
+
+def parse_list_args(table, pk):
+    """
+    Turns ?fields=, ?sort= and column filters (?gender=F,
+    ?lastname__startswith=Sm) into whitelisted SQL pieces. Returns
+    (fields, order, conditions, params); fields is None for every column
+    and order always ends with the primary key.
+    """
+    columns = TABLE_COLUMNS[table]
+
+    fields = None
+    if "fields" in request.args:
+        fields = [field.strip() for field in request.args["fields"].split(",") if field.strip()]
+        if not fields:
+            raise BadRequest("'fields' needs at least one field")
+        for field in fields:
+            if field not in columns:
+                raise BadRequest(f"Unknown field '{field}'")
+
+    order = []
+    for item in request.args.get("sort", "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        column = item.lstrip("+-")
+        if column not in SORTABLE_COLUMNS[table]:
+            raise BadRequest(f"Cannot sort by '{column}'")
+        order.append((column, item.startswith("-")))
+    if pk not in [column for column, _ in order]:
+        order.append((pk, False))
+
+    conditions, params = [], []
+    for name, value in request.args.items(multi=True):
+        # Leading underscores are left to clients (e.g. a ?_= cache-buster).
+        if name in RESERVED_ARGS or name.startswith("_"):
+            continue
+        column, _, op = name.partition("__")
+        if column not in columns or (op or "eq") not in FILTER_OPERATORS:
+            raise BadRequest(f"Unknown filter '{name}'")
+        condition, values = FILTER_OPERATORS[op or "eq"](column, value)
+        conditions.append(condition)
+        params.extend(values)
+    return fields, order, conditions, params
+
+def keyset_condition(order, cursor):
+    """
+    Rows strictly after cursor in the given order, e.g. for
+    (lastname DESC, id): lastname < %s OR (lastname = %s AND id > %s).
+    """
+    values = decode_cursor(cursor)
+    if len(order) == 1:
+        values = [values]
+    if not isinstance(values, list) or len(values) != len(order):
+        raise BadRequest("Invalid cursor")
+    # Values go straight into the query; anything but a scalar (a JSON
+    # object or list crafted into the cursor) would fail in the driver.
+    if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values):
+        raise BadRequest("Invalid cursor")
+
+    clauses, params = [], []
+    for i, (column, descending) in enumerate(order):
+        parts = [f"{prior} = %s" for prior, _ in order[:i]]
+        parts.append(f"{column} {'<' if descending else '>'} %s")
+        clauses.append(" AND ".join(parts))
+        params.extend(values[:i] + [values[i]])
+    if len(clauses) == 1:
+        return clauses[0], params
+    return "(" + " OR ".join(f"({clause})" for clause in clauses) + ")", params
+
+def build_list_query(table, fields, order, conditions, select_extra=()):
+    select = "*" if fields is None else ", ".join(list(fields) + list(select_extra))
+    query = f"SELECT {select} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY " + ", ".join(f"{column} DESC" if descending else column for column, descending in order)
+    return query
+
+def encode_cursor(value):
+    raw = json.dumps(value, separators=(",", ":"), default=lambda v: v.isoformat()).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def encode_keyset(values):
+    return encode_cursor(values[0] if len(values) == 1 else values)
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return json.loads(raw)
+    except (ValueError, binascii.Error):
+        raise BadRequest("Invalid cursor")
+
+def get_page_size(capped=True, default=None):
+    limit = request.args.get("limit", default or app.config["API_PAGE_SIZE"])
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise BadRequest("'limit' must be an integer")
+    if limit < 1:
+        raise BadRequest("'limit' must be positive")
+    if not capped:
+        return limit
+    return min(limit, app.config["API_MAX_PAGE_SIZE"])
+
+def row_value(row, column, columns):
+    if isinstance(row, dict):
+        return row[column]
+    return row[columns.index(column)]
+
+def wants_ndjson():
+    if request.args.get("format") == "ndjson":
+        return True
+    best = request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"])
+    return best == "application/x-ndjson"
+
+def stream_table(table, pk):
+    """
+    Streams a whole table (or the part after ?cursor=) as NDJSON from a
+    server-side cursor. ?limit= is honoured but not capped.
+    """
+    fields, order, conditions, params = parse_list_args(table, pk)
+    cursor = request.args.get("cursor")
+    if cursor:
+        condition, values = keyset_condition(order, cursor)
+        conditions.append(condition)
+        params.extend(values)
+    query = build_list_query(table, fields, order, conditions)
+    if "limit" in request.args:
+        query += " LIMIT %s"
+        params.append(get_page_size(capped=False))
+    return execute_stream(query, tuple(params))
+
+def paginate_json(table, pk):
+    """
+    Keyset pagination in the requested sort order (primary key by
+    default). The next page is advertised through the X-Next-Cursor and
+    Link headers.
+    """
+    if wants_ndjson():
+        return stream_table(table, pk)
+
+    query, params, page = list_page_query(table, pk)
+    results = execute_json(query, params)
+    if isinstance(results, Flask.response_class):
+        return results
+    return list_page_response(table, results, page)
+
+def list_page_query(table, pk):
+    """
+    The query (and its params) for one page of paginate_json, plus what
+    list_page_response needs to shape the rows it returns.
+    """
+    limit = get_page_size()
+    fields, order, conditions, params = parse_list_args(table, pk)
+    cursor = request.args.get("cursor")
+    if cursor:
+        condition, values = keyset_condition(order, cursor)
+        conditions.append(condition)
+        params.extend(values)
+
+    # Sort columns left out of ?fields= are still needed for the cursor.
+    extra = [column for column, _ in order if fields is not None and column not in fields]
+    query = build_list_query(table, fields, order, conditions, extra) + " LIMIT %s"
+    return query, tuple(params) + (limit + 1,), (limit, fields, order, extra)
+
+def list_page_response(table, results, page):
+    limit, fields, order, extra = page
+    if not results:
+        return make_response(jsonify({"message": "data not found"}), 404)
+
+    rows = list(results)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        selected = TABLE_COLUMNS[table] if fields is None else fields + extra
+        next_cursor = encode_keyset([row_value(rows[-1], column, selected) for column, _ in order])
+    if extra:
+        if isinstance(rows[0], dict):
+            rows = [{field: row[field] for field in fields} for row in rows]
+        else:
+            rows = [row[:len(fields)] for row in rows]
+
+    response = make_response(jsonify(rows), 200)
+    if next_cursor:
+        args = request.args.copy()
+        args["cursor"] = next_cursor
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.base_url}?{urlencode(list(args.items(multi=True)))}>; rel="next"'
+    return response
+
+@on_write
+def invalidate_response_cache(table, op, key):
+    response_cache.invalidate(table)
+
+def cached(table):
+    """
+    Serves a GET from response_cache, keyed on endpoint and query string.
+    Only 200 responses are stored; writes to table invalidate them.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if wants_ndjson():
+                return func(*args, **kwargs)
+            key = response_cache_key()
+            hit = cached_response(key)
+            if hit is not None:
+                return hit
+            versions = response_cache.tag_versions([table])
+            return store_response(key, make_response(func(*args, **kwargs)), table, versions)
+        wrapper.cache_table = table
+        return wrapper
+    return decorator
+
+def response_cache_key():
+    return f"{request.endpoint}?{urlencode(sorted(request.args.items(multi=True)))}"
+
+def cached_response(key):
+    hit = response_cache.get(key)
+    if hit is None:
+        return None
+    response = make_response(hit["body"], hit["status"])
+    response.headers.update(hit["headers"])
+    return response
+
+def store_response(key, response, table, versions):
+    if response.status_code == 200:
+        headers = {name: value for name, value in response.headers.items()
+                   if name in ("Content-Type", "X-Next-Cursor", "Link")}
+        response_cache.set(key, {"body": response.get_data(as_text=True), "status": 200, "headers": headers},
+                           tags=[table], versions=versions)
+    return response
+
+def compress_page(body):
+    """
+    Pre-compresses a rendered page once, for every encoding in
+    PAGE_CACHE_ENCODINGS that is available here.
+    """
+    encoded = {}
+    for encoding in app.config["PAGE_CACHE_ENCODINGS"]:
+        if encoding == "gzip":
+            encoded[encoding] = gzip.compress(body)
+        elif encoding == "br" and brotli is not None:
+            encoded[encoding] = brotli.compress(body)
+    return {encoding: base64.b64encode(data).decode() for encoding, data in encoded.items()}
+
+def cached_page(*tables):
+    """
+    Serves a rendered HTML page from response_cache, keyed on endpoint,
+    view arguments and query string. Any write to one of tables drops it.
+    The stored bytes are pre-compressed so hits skip both Jinja and gzip.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = f"page:{request.endpoint}:{sorted(kwargs.items())}?{urlencode(sorted(request.args.items(multi=True)))}"
+            page = response_cache.get(key)
+            if page is None:
+                versions = response_cache.tag_versions(tables)
+                response = make_response(func(*args, **kwargs))
+                if response.status_code != 200 or response.mimetype != "text/html":
+                    return response
+                body = response.get_data()
+                page = {"body": body.decode(), "encodings": compress_page(body)}
+                response_cache.set(key, page, tags=tables, versions=versions)
+
+            encoding = request.accept_encodings.best_match(list(page["encodings"]))
+            if encoding:
+                response = make_response(base64.b64decode(page["encodings"][encoding]))
+                response.headers["Content-Encoding"] = encoding
+            else:
+                response = make_response(page["body"])
+            response.mimetype = "text/html"
+            response.vary.add("Accept-Encoding")
+            return response
+        return wrapper
+    return decorator
+
+def paginate_template(query, order):
+    """
+    One page of a list page query (which must not have its own ORDER BY),
+    in keyset order. order is [(sql column, result key), ...] ending with
+    the primary key. Returns (rows, next_cursor).
+    """
+    limit = get_page_size(default=app.config["PAGE_SIZE"])
+    params = []
+    cursor = request.args.get("cursor")
+    if cursor:
+        condition, params = keyset_condition([(column, False) for column, _ in order], cursor)
+        query += f" WHERE {condition}"
+    query += " ORDER BY " + ", ".join(column for column, _ in order) + " LIMIT %s"
+    results = execute_template(query, *params, limit + 1)
+
+    if isinstance(results, Flask.response_class) or len(results) <= limit:
+        return results, None
+    results = results[:limit]
+    return results, encode_keyset([results[-1][key] for _, key in order])
+
+def render_page(name, results, next_cursor):
+    """
+    Renders templates/<name>.html, or for ?format=json (the "Load more"
+    button) just the rows of templates/rows/<name>.html plus the next cursor.
+    """
+    if request.args.get("format") == "json":
+        html = render_template(f"rows/{name}.html", results=results)
+        return make_response(jsonify({"html": html, "next": next_cursor}), 200)
+    return render_template(f"{name}.html", results=results, next_cursor=next_cursor)
+
+BOOT_ID = uuid.uuid4().hex[:8]
+BOOT_TIME = time.time()
+table_modified = {}
+
+@on_write
+def touch_table(table, op, key):
+    table_modified[table] = time.time()
+
+def table_etag(table):
+    """
+    Validator for the current state of a table, built from the write
+    counter the response cache keeps per table. A per-worker counter is
+    only trusted for one CACHE_TTL window, like the cached bodies.
+    """
+    parts = [table, str(response_cache.tag_versions([table])[table])]
+    if not response_cache.shared:
+        parts += [BOOT_ID, str(int(time.time() // app.config["CACHE_TTL"]))]
+    parts.append("ndjson" if wants_ndjson() else "json")
+    return "-".join(parts)
+
+def conditional(table):
+    """
+    Adds ETag/Last-Modified to a list endpoint and answers a matching
+    If-None-Match with 304 before any query runs.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            etag = table_etag(table)
+            if request.if_none_match.contains(etag):
+                return add_validators(make_response("", 304), table, etag)
+            return add_validators(make_response(func(*args, **kwargs)), table, etag)
+        wrapper.etag_table = table
+        return wrapper
+    return decorator
+
+def add_validators(response, table, etag):
+    if response.status_code in (200, 304):
+        response.set_etag(etag)
+        response.last_modified = table_modified.get(table, BOOT_TIME)
+    return response
+
+def pool_gauges():
+    return {f"db_pool_{key}": value for key, value in mysql.stats().items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)}
+
+def finish_request_metrics(status):
+    if g.pop("metrics_started", None) is None:
+        return
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    metrics.request_finished(request.method, route, status, time.perf_counter() - g.request_started)
+    metrics.flush(pool_gauges())
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.metrics_started = True
+    metrics.request_started()
+
+@app.after_request
+def record_request_metrics(response):
+    finish_request_metrics(response.status_code)
+    return response
+
+@app.teardown_request
+def record_failed_request_metrics(error):
+    # Only reached with the request still open when no response was built.
+    finish_request_metrics(500)
+
 @app.errorhandler(BadRequest)
 def handle_bad_request(e):
     return make_response(jsonify({"error": "Bad Request", "message": str(e)}), 400)
@@ -69,53 +734,233 @@ def handle_not_found(e):
     return make_response(jsonify({"error": "Not Found", "message": str(e)}), 404)
 
 
+class IndexRefresher:
+    """
+    Background thread that rebuilds the SyncedIndexes, so that requests
+    never scan the tables for one that has already been loaded. It wakes
+    every INDEX_REFRESH_INTERVAL seconds, or as soon as a request finds an
+    index stale, and rebuilds the ones that are not current. Started by
+    the first request (except under testing) and by the ASGI startup.
+    """
+
+    def __init__(self):
+        self.indexes = []
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="index-refresh", daemon=True)
+                self.thread.start()
+
+    def running(self):
+        return self.thread is not None
+
+    def wake(self):
+        self.wakeup.set()
+
+    def refresh_stale(self):
+        for index in self.indexes:
+            if index.is_current():
+                continue
+            with app.app_context():
+                error = index.refresh()
+            if error is not None:
+                app.logger.warning("Could not rebuild the %s index: %s", index.name, error.get_json().get("message"))
+
+    def run(self):
+        while True:
+            try:
+                self.refresh_stale()
+            except Exception:
+                app.logger.warning("Index refresh failed", exc_info=True)
+            self.wakeup.wait(app.config["INDEX_REFRESH_INTERVAL"])
+            self.wakeup.clear()
+
+
+index_refresher = IndexRefresher()
+
+@app.before_request
+def start_index_refresher():
+    if not app.testing:
+        index_refresher.start()
+
+
+class SyncedIndex:
+    """
+    An in-memory structure built from full table scans and kept in step
+    with writes. sources maps each table to (pk, query), pk selected
+    first; load takes {table: [row tuples]} and replaces the structure;
+    updaters maps each table to (set_row, remove_row), applied as writes
+    commit. A keyed write re-selects its row; a write without a key that
+    inserted rows (bulk POSTs, CSV imports) selects the rows above the
+    highest key seen so far. Anything else it cannot apply (another
+    worker's write, or a failed query) marks it stale, and with the
+    per-worker cache backend it also goes stale every max_age_setting
+    seconds to pick up other workers' writes. A stale index keeps
+    serving while index_refresher rebuilds it; only one thread rebuilds
+    at a time.
+    """
+
+    def __init__(self, name, sources, load, updaters, max_age_setting):
+        self.name = name
+        self.sources = sources
+        self.load = load
+        self.updaters = updaters
+        self.max_age_setting = max_age_setting
+        self.state = {"loaded": False, "stale": False, "loaded_at": 0, "versions": {}, "high": {}}
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        on_write(self.update)
+        index_refresher.indexes.append(self)
+
+    def is_current(self):
+        with self.lock:
+            if not self.state["loaded"] or self.state["stale"]:
+                return False
+            if response_cache.tag_versions(list(self.sources)) != self.state["versions"]:
+                return False
+            return response_cache.shared or time.time() - self.state["loaded_at"] < app.config[self.max_age_setting]
+
+    def refresh(self):
+        """
+        Rebuilds from full table scans unless another thread just did.
+        Returns an error response when a query fails.
+        """
+        with self.refresh_lock:
+            if self.is_current():
+                return
+            versions = response_cache.tag_versions(list(self.sources))
+            tables = {}
+            for table, (pk, query) in self.sources.items():
+                results = execute_template(query)
+                if isinstance(results, Flask.response_class):
+                    return results
+                tables[table] = [tuple(row.values()) for row in results]
+            with self.lock:
+                self.load(tables)
+                self.state.update(loaded=True, stale=False, loaded_at=time.time(), versions=versions,
+                                  high={table: max((row[0] for row in rows), default=0) for table, rows in tables.items()})
+
+    def ensure(self):
+        """
+        None, or an error response. Only an index that was never loaded
+        is built in the request; a stale one is handed to index_refresher
+        (or, when it is not running, rebuilt here).
+        """
+        if self.is_current():
+            return None
+        if self.state["loaded"] and index_refresher.running():
+            index_refresher.wake()
+            return None
+        return self.refresh()
+
+    def update(self, table, op, key):
+        if table not in self.sources:
+            return
+        with self.lock:
+            if not self.state["loaded"]:
+                return
+            # A version we did not expect means another worker wrote too.
+            expected = self.state["versions"].get(table, 0) + 1
+            if response_cache.tag_versions([table])[table] != expected:
+                self.state["stale"] = True
+                return
+            self.state["versions"][table] = expected
+
+            remove_row = self.updaters[table][1]
+            pk, query = self.sources[table]
+            if key is None:
+                high = self.state["high"]
+                rows = self.apply_rows(table, f"{query} WHERE {pk} > %s", high[table]) if op == "insert" else None
+                if rows is None:
+                    self.state["stale"] = True
+                elif rows:
+                    high[table] = max(high[table], *(row[0] for row in rows))
+                return
+            if op == "delete":
+                remove_row(key)
+                return
+            rows = self.apply_rows(table, f"{query} WHERE {pk} = %s", key)
+            if rows is None:
+                self.state["stale"] = True
+            elif not rows:
+                remove_row(key)
+
+    def apply_rows(self, table, query, key):
+        """
+        Sets every row query selects and returns them, or None when the
+        query fails. Must be called with the lock held.
+        """
+        results = execute_template(query, key)
+        if isinstance(results, Flask.response_class):
+            return None
+        rows = [tuple(row.values()) for row in results]
+        set_row = self.updaters[table][0]
+        for row in rows:
+            set_row(*row)
+        return rows
+
+
+schedule = ScheduleSummary()
+schedule_sync = SyncedIndex(
+    "schedule",
+    sources={
+        "classes": ("idclasses", "SELECT idclasses, description, idroom, idcourse FROM classes"),
+        "rooms": ("idrooms", "SELECT idrooms, location FROM rooms"),
+        "courses": ("idcourses", "SELECT idcourses, name FROM courses"),
+        "teachers": ("idteachers", "SELECT idteachers, CONCAT(firstname, ' ', lastname) AS name FROM teachers"),
+        "roster": ("idroster", "SELECT idroster, idclass, idteacher, class_period FROM roster"),
+    },
+    load=lambda tables: schedule.load(**tables),
+    updaters={
+        "classes": (schedule.set_class, schedule.remove_class),
+        "rooms": (schedule.set_room, schedule.remove_room),
+        "courses": (schedule.set_course, schedule.remove_course),
+        "teachers": (schedule.set_teacher, schedule.remove_teacher),
+        "roster": (schedule.set_roster, schedule.remove_roster),
+    },
+    max_age_setting="SCHEDULE_MAX_AGE",
+)
+schedule_state = schedule_sync.state
+
 @app.route("/")
 def home():
-    query = """
-        SELECT 
-            classes.description AS class,
-            class_period AS period,
-            courses.name AS course,
-            CONCAT(teachers.firstname, ' ', teachers.lastname) AS teacher,
-            rooms.location AS room
-        FROM classes
-        INNER JOIN rooms ON idrooms = idroom
-        INNER JOIN courses ON idcourses = idcourse
-        INNER JOIN roster ON idclasses = idclass
-        INNER JOIN teachers ON idteachers = idteacher
-        GROUP BY classes.description, class_period, courses.name, rooms.location, teacher
-        ORDER BY classes.description;
-    """
-    
-    results = execute_template(query)
-    return render_template('index.html', results=results)
+    error = schedule_sync.ensure()
+    if error is not None:
+        return error
+    return render_template('index.html', results=schedule.rows())
 
 # Students CRUD
 
 @app.route("/students", methods=["GET"])
+@cached_page("students")
 def get_students():
-    query = """SELECT * FROM students ORDER BY firstname"""
-    results = execute_template(query)
+    query = """SELECT * FROM students"""
+    results, next_cursor = paginate_template(query, [("firstname", "firstname"), ("idstudents", "idstudents")])
     
+    if isinstance(results, Flask.response_class):
+        return results
     if not results:
         return make_response(jsonify({"message": "data not found"}), 404)
-    return render_template('students.html', results=results)
+    return render_page('students', results, next_cursor)
 
 @app.route("/api/students", methods=["GET"])
 @role_required(["admin", "teacher"])
+@conditional("students")
 def get_students_api():
-    query = "SELECT * FROM students"
-    results = execute_json(query)
-    if not results:
-        return make_response(jsonify({"message": "data not found"}), 404)
-    return make_response(jsonify(results), 200)
+    return paginate_json("students", "idstudents")
 
 @app.route("/api/students", methods=["POST"])
 @role_required(["admin"])
 def add_students():
-    data = validate_request_data(["firstname", "lastname", "birthdate", "gender"])
     query = """INSERT INTO students (firstname, middlename, lastname, birthdate, gender) VALUES (%s, %s, %s, %s, %s)"""
-    rows = commit(query, data["firstname"], data.get("middlename"), data["lastname"], data["birthdate"], data["gender"])
+    if is_bulk_request():
+        return bulk_insert(query, ["firstname", "lastname", "birthdate", "gender"], person_values)
+    data = validate_request_data(["firstname", "lastname", "birthdate", "gender"])
+    rows = commit(query, *person_values(data))
     if isinstance(rows, Flask.response_class):
         return rows    
     return make_response(jsonify({"message": "data created successfully", "rows_affected": rows}), 201)
@@ -142,30 +987,32 @@ def delete_student(idstudents):
 # Teachers CRUD
 
 @app.route("/teachers", methods=["GET"])
+@cached_page("teachers")
 def get_teachers():
-    query = """SELECT * FROM teachers ORDER BY firstname"""
-    results = execute_template(query)
+    query = """SELECT * FROM teachers"""
+    results, next_cursor = paginate_template(query, [("firstname", "firstname"), ("idteachers", "idteachers")])
     
+    if isinstance(results, Flask.response_class):
+        return results
     if not results:
         return make_response(jsonify({"message": "data not found"}), 404)
-    return render_template('teachers.html', results=results)
+    return render_page('teachers', results, next_cursor)
 
 @app.route("/api/teachers", methods=["GET"])
 @role_required(["admin"])
+@conditional("teachers")
 def get_teachers_api():
-    query = """SELECT * FROM teachers """
-    results = execute_json(query)
-    if not results:
-        return make_response(jsonify({"message": "data not found"}), 404)
-    return make_response(jsonify(results), 200)
+    return paginate_json("teachers", "idteachers")
 
 
 @app.route("/api/teachers", methods=["POST"])
 @role_required(["admin"])
 def add_teachers():
-    data = validate_request_data(["firstname", "lastname", "birthdate", "gender"])    
     query = """INSERT INTO teachers (firstname, middlename, lastname, birthdate, gender) VALUES (%s, %s, %s, %s, %s)"""
-    rows = commit(query, data["firstname"], data.get("middlename"), data["lastname"], data["birthdate"], data["gender"])
+    if is_bulk_request():
+        return bulk_insert(query, ["firstname", "lastname", "birthdate", "gender"], person_values)
+    data = validate_request_data(["firstname", "lastname", "birthdate", "gender"])    
+    rows = commit(query, *person_values(data))
     
     if isinstance(rows, Flask.response_class):
         return rows    
@@ -200,6 +1047,7 @@ def delete_teacher(idteachers):
 
 # Classes CRUD
 @app.route("/classes", methods=["GET"])
+@cached_page("classes", "rooms", "courses")
 def get_classes():
     query = """
     SELECT 
@@ -213,53 +1061,99 @@ def get_classes():
     ON idrooms = idroom
     INNER JOIN courses
     ON idcourses = idcourse
-    ORDER BY classes.description
     """
-    results = execute_template(query)
+    results, next_cursor = paginate_template(query, [("classes.description", "class description"), ("idclasses", "idclasses")])
     
-    if not results:
+    if isinstance(results, Flask.response_class) or not results:
         return results
-    return render_template('classes.html', results=results)
+    return render_page('classes', results, next_cursor)
 
 @app.route("/api/classes", methods=["GET"])
+@conditional("classes")
+@cached("classes")
 def get_classes_api():
-    query = """SELECT * FROM classes"""
-    results = execute_json(query)
-    
-    if not results:
-        return make_response(jsonify({"message": "data not found"}), 404)
-    return make_response(jsonify(results), 200)
+    return paginate_json("classes", "idclasses")
 
-@app.route("/classes/<int:idclasses>", methods=["GET"])
-def get_class(idclasses):
-    query = """
+CLASS_STUDENTS_QUERY = """
     SELECT 
         idclasses, 
         classes.description AS 'class description',
+        idstudents,
         CONCAT(firstname, ' ', lastname) as student
     FROM classes
-    INNER JOIN roster
+    LEFT JOIN roster
     ON idclasses = idclass
-    INNER JOIN students
+    LEFT JOIN students
     ON idstudents = idstudent
-    WHERE idclasses = %s
-    ORDER BY students.firstname
+    WHERE idclasses IN ({})
+    ORDER BY idclasses, students.firstname
+"""
+
+def class_students(ids):
     """
-    results = execute_template(query, idclasses)
-    
-    query1 = """
-        SELECT 
-            idclasses, 
-            classes.description AS 'class description'
-        FROM classes
-        WHERE idclasses = %s
-    """
-    cur_class = execute_template(query1, idclasses)
+    Class headers and enrolled students for every id in one query,
+    grouped in a single pass. Unknown ids are left out.
+    """
+    ids = list(dict.fromkeys(ids))
+    results = execute_template(CLASS_STUDENTS_QUERY.format(", ".join(["%s"] * len(ids))), *ids)
+    if isinstance(results, Flask.response_class):
+        return results
+
+    classes = {}
+    for row in results:
+        cls = classes.get(row["idclasses"])
+        if cls is None:
+            cls = classes[row["idclasses"]] = {
+                "idclasses": row["idclasses"],
+                "description": row["class description"],
+                "students": []
+            }
+        if row["idstudents"] is not None:
+            cls["students"].append({"idstudents": row["idstudents"], "student": row["student"]})
+    return [classes[idclass] for idclass in ids if idclass in classes]
+
+@app.route("/classes/<int:idclasses>", methods=["GET"])
+def get_class(idclasses):
+    classes = class_students([idclasses])
+    if isinstance(classes, Flask.response_class):
+        return classes
+
+    cur_class = [{"idclasses": cls["idclasses"], "class description": cls["description"]} for cls in classes]
+    results = classes[0]["students"] if classes else []
     
     if not results:
         results=False
     return render_template('class.html', results=results, cur_class=cur_class)
 
+@app.route("/api/classes/<int:idclasses>/students", methods=["GET"])
+@role_required(["admin", "teacher"])
+def get_class_students_api(idclasses):
+    classes = class_students([idclasses])
+    if isinstance(classes, Flask.response_class):
+        return classes
+    if not classes:
+        return make_response(jsonify({"message": "data not found"}), 404)
+    return make_response(jsonify(classes[0]), 200)
+
+@app.route("/api/classes/students", methods=["GET"])
+@role_required(["admin", "teacher"])
+def get_classes_students_api():
+    try:
+        ids = [int(idclass) for idclass in request.args.get("ids", "").split(",") if idclass.strip()]
+    except ValueError:
+        raise BadRequest("'ids' must be a comma-separated list of integers")
+    if not ids:
+        raise BadRequest("'ids' is required")
+    if len(ids) > app.config["API_MAX_BATCH_IDS"]:
+        raise BadRequest(f"At most {app.config['API_MAX_BATCH_IDS']} ids are allowed")
+
+    classes = class_students(ids)
+    if isinstance(classes, Flask.response_class):
+        return classes
+    if not classes:
+        return make_response(jsonify({"message": "data not found"}), 404)
+    return make_response(jsonify(classes), 200)
+
 @app.route("/api/classes", methods=["POST"])
 @role_required(["admin"])
 def add_classes():
@@ -303,6 +1197,7 @@ def delete_class(idclasses):
 # Rooms CRUD
 
 @app.route("/rooms", methods=["GET"])
+@cached_page("rooms")
 def get_rooms():
     query = """
     SELECT 
@@ -310,22 +1205,19 @@ def get_rooms():
         description,
         location
     FROM rooms
-    ORDER BY location
     """
-    results = execute_template(query)
+    results, next_cursor = paginate_template(query, [("location", "location"), ("idrooms", "idrooms")])
     
-    if not results:
+    if isinstance(results, Flask.response_class) or not results:
         return results
-    return render_template('rooms.html', results=results)
+    return render_page('rooms', results, next_cursor)
 
 
 @app.route("/api/rooms", methods=["GET"])
+@conditional("rooms")
+@cached("rooms")
 def get_rooms_api():
-    query = """SELECT * FROM rooms """
-    results = execute_json(query)
-    if not results:
-        return make_response(jsonify({"message": "data not found"}), 404)
-    return make_response(jsonify(results), 200)
+    return paginate_json("rooms", "idrooms")
 
 @app.route("/api/rooms", methods=["POST"])
 @role_required(["admin"])
@@ -368,6 +1260,7 @@ def delete_room(idrooms):
 # Courses CRUD
 
 @app.route("/courses", methods=["GET"])
+@cached_page("courses")
 def get_courses():
     query = """
     SELECT 
@@ -375,22 +1268,18 @@ def get_courses():
         name,
         code
     FROM courses
-    ORDER BY name
     """
-    results = execute_template(query)
+    results, next_cursor = paginate_template(query, [("name", "name"), ("idcourses", "idcourses")])
     
-    if not results:
+    if isinstance(results, Flask.response_class) or not results:
         return results
-    return render_template('courses.html', results=results)
+    return render_page('courses', results, next_cursor)
 
 @app.route("/api/courses", methods=["GET"])
+@conditional("courses")
+@cached("courses")
 def get_courses_api():
-    query = """SELECT * FROM courses """
-    results = execute_json(query)
-    
-    if not results:
-        return make_response(jsonify({"message": "data not found"}), 404)
-    return make_response(jsonify(results), 200)
+    return paginate_json("courses", "idcourses")
 
 @app.route("/api/courses", methods=["POST"])
 @role_required(["admin", "teacher"])
@@ -432,9 +1321,7 @@ def delete_course(idcourses):
 
 # Roster CRUD
 
-@app.route("/roster", methods=["GET"])
-def get_roster():
-    query = """SELECT 
+ROSTER_QUERY = """SELECT 
                 idroster, idclass, idstudent, idteacher, class_period,
                 CONCAT(teachers.firstname, ' ', teachers.lastname) AS teacher,
                 CONCAT(students.firstname, ' ', students.lastname) AS student,
@@ -447,32 +1334,42 @@ def get_roster():
                 INNER JOIN teachers
                 ON idteachers = idteacher
                 """
-    results = execute_template(query)
+
+ROSTER_EXPORT_COLUMNS = [
+    ("idroster", "int"), ("idclass", "int"), ("idstudent", "int"), ("idteacher", "int"),
+    ("class_period", "str"), ("teacher", "str"), ("student", "str"), ("description", "str"),
+]
+
+@app.route("/roster", methods=["GET"])
+@cached_page("roster", "classes", "students", "teachers")
+def get_roster():
+    results, next_cursor = paginate_template(ROSTER_QUERY, [("idroster", "idroster")])
     
-    if not results:
+    if isinstance(results, Flask.response_class) or not results:
         return results
-    return render_template('roster.html', results=results)
+    return render_page('roster', results, next_cursor)
 
 @app.route("/api/roster", methods=["GET"])
+@conditional("roster")
 def get_roster_api():
-    query = """SELECT * FROM roster """
-    results = execute_json(query)
-    
-    if not results:
-        return make_response(jsonify({"message": "data not found"}), 404)
-    return make_response(jsonify(results), 200)
+    return paginate_json("roster", "idroster")
 
 @app.route("/api/roster", methods=["POST"])
 @role_required(["admin"])
 def add_roster():
-    data = validate_request_data(["class_period"])
     query = """INSERT INTO roster (idclass, idstudent, idteacher, class_period) VALUES (%s, %s, %s, %s)"""
-    rows = commit(query, data.get("idclass"), data.get("idstudent"), data.get("idteacher"), data["class_period"])
+    if is_bulk_request():
+        return bulk_insert(query, ["class_period"], roster_values, check_roster_write)
+    data = validate_request_data(["class_period"])
+    flags, rejection = check_roster_write([data])
+    if rejection is not None:
+        return rejection
+    rows = commit(query, *roster_values(data))
     
     if isinstance(rows, Flask.response_class):
         return rows    
     return make_response(jsonify(
-        {"message": "data created successfully", "rows_affected": rows}
+        {"message": "data created successfully", "rows_affected": rows, **flags}
         ), 201)
     
 
@@ -480,13 +1377,16 @@ def add_roster():
 @role_required(["admin"])
 def update_roster(idroster):
     data = validate_request_data(["class_period"])
+    flags, rejection = check_roster_write([data], idroster)
+    if rejection is not None:
+        return rejection
     query = """UPDATE roster SET idclass=%s, idstudent=%s, idteacher=%s, class_period=%s WHERE idroster=%s"""
     rows = commit(query, data.get("idclass"), data.get("idstudent"), data.get("idteacher"), data["class_period"], idroster)
         
     if isinstance(rows, Flask.response_class):
         return rows    
     return make_response(jsonify(
-        {"message": "data updated successfully", "rows_affected": rows}
+        {"message": "data updated successfully", "rows_affected": rows, **flags}
         ), 200)
     
 @app.route("/api/roster/<int:idroster>", methods=["DELETE"])
@@ -501,6 +1401,649 @@ def delete_roster(idroster):
         {"message": "data deleted successfully", "rows_affected": rows}
         ), 200)   
     
+# Roster conflicts
+
+conflict_index = ConflictIndex()
+conflict_sync = SyncedIndex(
+    "conflict",
+    sources={
+        "classes": ("idclasses", "SELECT idclasses, idroom FROM classes"),
+        "roster": ("idroster", "SELECT idroster, idclass, idstudent, idteacher, class_period FROM roster"),
+    },
+    load=lambda tables: conflict_index.load(**tables),
+    updaters={
+        "classes": (conflict_index.set_class, conflict_index.remove_class),
+        "roster": (conflict_index.set_roster, conflict_index.remove_roster),
+    },
+    max_age_setting="CONFLICTS_MAX_AGE",
+)
+conflict_state = conflict_sync.state
+
+def current_conflict_index():
+    error = conflict_sync.ensure()
+    if error is not None:
+        return error
+    return conflict_index
+
+def roster_conflict_checker(index, keep_conflicting=True):
+    """
+    A function checking one roster row about to be written against index
+    and against the rows it checked before: check(values, key, replaces)
+    with values (idclass, idstudent, idteacher, class_period), key naming
+    the row within the write and replaces the idroster it overwrites.
+    Returns the double bookings. Conflicting rows only count against
+    later ones when keep_conflicting is set.
+    """
+    batch = ConflictIndex()
+    batch.classes = index.classes
+
+    def check(values, key, replaces=None):
+        batch.remove_roster(key)
+        conflicts = index.check(*values, ignore=replaces) + batch.check(*values)
+        if not conflicts or keep_conflicting:
+            batch.set_roster(key, *values)
+        return conflicts
+    return check
+
+def check_roster_write(rows, idroster=None, positions=None, replaces=None):
+    """
+    Double bookings that roster rows (JSON objects) about to be written
+    would create, against the index and against each other. Returns
+    (flags, rejection): with ROSTER_CONFLICTS = "reject" a conflict gives
+    a 409 response to return instead of writing; with "flag" the
+    conflicts come back as {"conflicts": [...]} to add to the reply.
+    idroster is the row an update replaces. A write mixing several rows
+    can instead pass positions (the index reported for each row) and
+    replaces (the idroster each row overwrites, None for inserts).
+    """
+    mode = app.config["ROSTER_CONFLICTS"]
+    if mode == "off" or not rows:
+        return {}, None
+    index = current_conflict_index()
+    if isinstance(index, Flask.response_class):
+        return {}, index
+
+    single = positions is None and len(rows) == 1
+    positions = positions if positions is not None else list(range(len(rows)))
+    replaces = replaces if replaces is not None else [idroster] * len(rows)
+    check = roster_conflict_checker(index)
+    found = []
+    for position, row, old in zip(positions, rows, replaces):
+        values = (row.get("idclass"), row.get("idstudent"), row.get("idteacher"), row["class_period"])
+        conflicts = check(values, ("row", position) if old is None else old, old)
+        if conflicts:
+            found.append(conflicts if single else {"index": position, "conflicts": conflicts})
+    if not found:
+        return {}, None
+    if single:
+        found = found[0]
+    if mode == "reject":
+        return {}, make_response(jsonify(
+            {"error": "Conflict", "message": "double booking", "conflicts": found}
+            ), 409)
+    return {"conflicts": found}, None
+
+def roster_import_check():
+    """
+    The conflict check for a roster CSV import: takes the value lists of
+    a validated chunk and returns the double bookings of each row,
+    counting the rows imported before it. The index is loaded on the
+    first chunk, after the import's classes are in. None when
+    ROSTER_CONFLICTS is "off".
+    """
+    mode = app.config["ROSTER_CONFLICTS"]
+    if mode == "off":
+        return None
+    state = {"check": None, "rows": 0}
+
+    def check_chunk(rows):
+        if state["check"] is None:
+            index = current_conflict_index()
+            if isinstance(index, Flask.response_class):
+                raise RuntimeError("Could not load the roster conflict index")
+            state["check"] = roster_conflict_checker(index, keep_conflicting=mode == "flag")
+        found = []
+        for values in rows:
+            state["rows"] += 1
+            found.append(state["check"](tuple(values), ("import", state["rows"])))
+        return found
+    return check_chunk
+
+@app.route("/api/conflicts", methods=["GET"])
+@role_required(["admin"])
+def get_conflicts():
+    """
+    Every teacher, student and room booked by more than one class in the
+    same period. ?type=teacher,student,room narrows it.
+    """
+    kinds = request.args.get("type")
+    kinds = kinds.split(",") if kinds else list(ConflictIndex.KINDS)
+    if not set(kinds) <= set(ConflictIndex.KINDS):
+        raise BadRequest("'type' must be teacher, student or room")
+    index = current_conflict_index()
+    if isinstance(index, Flask.response_class):
+        return index
+    return make_response(jsonify(index.report(kinds)), 200)
+
+# Timetables
+
+timetable_index = TimetableIndex()
+timetable_sync = SyncedIndex(
+    "timetable",
+    sources={
+        "students": ("idstudents", "SELECT idstudents FROM students"),
+        "teachers": ("idteachers", "SELECT idteachers, CONCAT(firstname, ' ', lastname) AS name FROM teachers"),
+        "classes": ("idclasses", "SELECT idclasses, description, idroom, idcourse FROM classes"),
+        "rooms": ("idrooms", "SELECT idrooms, location FROM rooms"),
+        "courses": ("idcourses", "SELECT idcourses, name FROM courses"),
+        "roster": ("idroster", "SELECT idroster, idclass, idstudent, idteacher, class_period FROM roster"),
+    },
+    load=lambda tables: timetable_index.load(**tables),
+    updaters={
+        "students": (timetable_index.set_student, timetable_index.remove_student),
+        "teachers": (timetable_index.set_teacher, timetable_index.remove_teacher),
+        "classes": (timetable_index.set_class, timetable_index.remove_class),
+        "rooms": (timetable_index.set_room, timetable_index.remove_room),
+        "courses": (timetable_index.set_course, timetable_index.remove_course),
+        "roster": (timetable_index.set_roster, timetable_index.remove_roster),
+    },
+    max_age_setting="TIMETABLE_MAX_AGE",
+)
+timetable_state = timetable_sync.state
+
+def person_timetable(kind, key):
+    error = timetable_sync.ensure()
+    if error is not None:
+        return error
+    entries = timetable_index.timetable(kind, key)
+    if entries is None:
+        return make_response(jsonify({"message": "data not found"}), 404)
+    return make_response(jsonify(entries), 200)
+
+@app.route("/api/students/<int:idstudents>/schedule", methods=["GET"])
+@role_required(["admin", "teacher"])
+def get_student_schedule(idstudents):
+    """
+    The student's timetable: one {"period", "idclass", "class",
+    "idcourse", "course", "idroom", "room", "idteacher", "teacher"} per
+    class and period, from the in-memory index.
+    """
+    return person_timetable("student", idstudents)
+
+@app.route("/api/teachers/<int:idteachers>/schedule", methods=["GET"])
+@role_required(["admin", "teacher"])
+def get_teacher_schedule(idteachers):
+    """
+    The classes the teacher takes in each period, shaped like a student
+    timetable.
+    """
+    return person_timetable("teacher", idteachers)
+
+# Search
+
+# Person kind per table.
+SEARCH_KINDS = {"students": "student", "teachers": "teacher"}
+
+search_index = PeopleIndex()
+search_sync = SyncedIndex(
+    "search",
+    sources={
+        "students": ("idstudents", "SELECT idstudents, firstname, middlename, lastname FROM students"),
+        "teachers": ("idteachers", "SELECT idteachers, firstname, middlename, lastname FROM teachers"),
+    },
+    load=lambda tables: search_index.load(
+        [(SEARCH_KINDS[table], *row) for table, rows in tables.items() for row in rows]),
+    updaters={
+        table: (partial(search_index.set, kind), partial(search_index.remove, kind))
+        for table, kind in SEARCH_KINDS.items()
+    },
+    max_age_setting="SEARCH_MAX_AGE",
+)
+search_state = search_sync.state
+
+@app.route("/api/search", methods=["GET"])
+@role_required(["admin", "teacher"])
+def search_people():
+    """
+    Type-ahead lookup of students and teachers by name: ?q= (every word
+    is a name prefix, with typos tolerated), ?type=student|teacher and
+    ?limit=.
+    """
+    query = request.args.get("q", "").strip()
+    if not query:
+        raise BadRequest("'q' is required")
+    kinds = request.args.get("type")
+    if kinds is not None:
+        kinds = set(kinds.split(","))
+        if not kinds <= {"student", "teacher"}:
+            raise BadRequest("'type' must be student or teacher")
+    limit = min(get_page_size(capped=False, default=app.config["SEARCH_LIMIT"]), app.config["SEARCH_MAX_LIMIT"])
+
+    error = search_sync.ensure()
+    if error is not None:
+        return error
+    return make_response(jsonify(search_index.search(query, limit, kinds)), 200)
+
+# Batch writes
+
+# Per table: primary key, required fields, written columns (in the same
+# order as the single-row endpoints' queries).
+BATCH_TABLES = {
+    "students": ("idstudents", ["firstname", "lastname", "birthdate", "gender"],
+                 ["firstname", "middlename", "lastname", "birthdate", "gender"]),
+    "teachers": ("idteachers", ["firstname", "lastname", "birthdate", "gender"],
+                 ["firstname", "middlename", "lastname", "birthdate", "gender"]),
+    "classes": ("idclasses", ["description"], ["description", "idroom", "idcourse"]),
+    "rooms": ("idrooms", ["location"], ["location", "description"]),
+    "courses": ("idcourses", ["name", "code"], ["name", "code"]),
+    "roster": ("idroster", ["class_period"], ["idclass", "idstudent", "idteacher", "class_period"]),
+}
+
+def batch_statement(index, operation):
+    """
+    (query, args) for one operation of a batch. args may still hold
+    {"$ref": n} placeholders. Raises ValueError when it is invalid.
+    """
+    if not isinstance(operation, dict):
+        raise ValueError("Operation must be a JSON object")
+    op, table = operation.get("op"), operation.get("table")
+    if table not in BATCH_TABLES:
+        raise ValueError(f"Unknown table '{table}'")
+    pk, required_fields, columns = BATCH_TABLES[table]
+    if op not in ("create", "update", "delete"):
+        raise ValueError("'op' must be create, update or delete")
+
+    args = []
+    if op != "delete":
+        data = operation.get("data")
+        if not isinstance(data, dict):
+            raise ValueError("'data' must be a JSON object")
+        for field in required_fields:
+            if field not in data:
+                raise ValueError(f"'{field}' is required")
+        args = [data.get(column) for column in columns]
+    if op != "create":
+        key = operation.get("id")
+        if not isinstance(key, int) and not is_batch_ref(key):
+            raise ValueError("'id' must be an integer or a reference")
+        args.append(key)
+    for value in args:
+        if is_batch_ref(value) and not 0 <= value["$ref"] < index:
+            raise ValueError("A reference must point at an earlier operation")
+
+    if op == "create":
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    elif op == "update":
+        query = f"UPDATE {table} SET {', '.join(f'{column}=%s' for column in columns)} WHERE {pk}=%s"
+    else:
+        query = f"DELETE FROM {table} WHERE {pk}=%s"
+    return query, args
+
+def is_batch_ref(value):
+    return isinstance(value, dict) and list(value) == ["$ref"] and isinstance(value["$ref"], int)
+
+def check_batch_roster(operations):
+    """
+    check_roster_write over every roster create and update of a batch,
+    before any of it runs. A {"$ref": n} stands for the row operation n
+    creates, so rows created in the batch are checked against each other.
+    """
+    def value(item):
+        return ("$ref", item["$ref"]) if is_batch_ref(item) else item
+
+    rows, positions, replaces = [], [], []
+    for index, operation in enumerate(operations):
+        if operation["table"] != "roster" or operation["op"] == "delete":
+            continue
+        rows.append({column: value(operation["data"].get(column)) for column in BATCH_TABLES["roster"][2]})
+        positions.append(index)
+        if operation["op"] == "create":
+            replaces.append(None)
+        else:
+            key = operation["id"]
+            replaces.append(("row", key["$ref"]) if is_batch_ref(key) else key)
+    return check_roster_write(rows, positions=positions, replaces=replaces)
+
+@app.route("/api/batch", methods=["POST"])
+@role_required(["admin"])
+def run_batch():
+    """
+    Runs an ordered list of create/update/delete operations on one
+    connection in one transaction: either all of them are committed or
+    none is. {"$ref": n} in an id or field stands for the id created by
+    operation n.
+    """
+    if not request.is_json:
+        raise BadRequest("Request must be JSON")
+    operations = request.get_json().get("operations") if isinstance(request.get_json(), dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise BadRequest("'operations' must be a non-empty list")
+    if len(operations) > app.config["API_MAX_BATCH_OPERATIONS"]:
+        raise BadRequest(f"At most {app.config['API_MAX_BATCH_OPERATIONS']} operations are allowed")
+
+    statements, errors = [], []
+    for index, operation in enumerate(operations):
+        try:
+            statements.append(batch_statement(index, operation))
+        except ValueError as e:
+            errors.append({"index": index, "message": str(e)})
+    if errors:
+        return make_response(jsonify(
+            {"error": "Bad Request", "message": "invalid operations", "errors": errors}
+            ), 400)
+    flags, rejection = check_batch_roster(operations)
+    if rejection is not None:
+        return rejection
+
+    results, written = [], []
+    cur = mysql.connection.cursor()
+    try:
+        for index, (query, args) in enumerate(statements):
+            args = tuple(results[value["$ref"]]["id"] if is_batch_ref(value) else value for value in args)
+            started = time.perf_counter() if query_stats.enabled else None
+            try:
+                cur.execute(query, args)
+            except Exception as e:
+                mysql.connection.rollback()
+                return make_response(jsonify(
+                    {"error": "Bad Request", "message": "no operations were applied",
+                     "errors": [{"index": index, "message": str(e)}]}
+                    ), 400)
+            record_query(query, started, rows_affected=cur.rowcount)
+            result = {"index": index, "rows_affected": cur.rowcount}
+            result["id"] = cur.lastrowid if query.startswith("INSERT") else args[-1]
+            results.append(result)
+            written.append((query, args, cur.lastrowid))
+        mysql.connection.commit()
+    except Exception as e:
+        mysql.connection.rollback()
+        raise RuntimeError(f"Commit failed: {str(e)}")
+    finally:
+        cur.close()
+
+    for query, args, lastrowid in written:
+        notify_write(query, args, lastrowid)
+    return make_response(jsonify({"message": "batch committed", "results": results, **flags}), 200)
+
+# Bulk import
+
+def start_import(files, load_data=None, on_reject=None):
+    """
+    Prepares a CSV import of files, a list of (table, text stream), in
+    dependency order. The ids the rows may refer to are loaded once, up
+    front; a missing header column raises ValueError before anything is
+    written. Returns the jobs, to be run with run_import.
+    """
+    if load_data is None:
+        load_data = app.config["IMPORT_LOAD_DATA"]
+    if load_data and not app.config["MYSQL_LOCAL_INFILE"]:
+        raise ValueError("Loading with LOAD DATA LOCAL INFILE needs MYSQL_LOCAL_INFILE enabled")
+    files = sorted(files, key=lambda item: IMPORT_ORDER.index(item[0]))
+    ids = load_ids(mysql.connection, referenced_tables([table for table, _ in files]), SSCursor)
+    jobs = []
+    for table, stream in files:
+        check = roster_import_check() if table == "roster" else None
+        job = CSVImport(mysql.connection, table, ids, chunk_size=app.config["IMPORT_CHUNK_SIZE"],
+                        load_data=load_data, on_reject=on_reject,
+                        max_reported=app.config["IMPORT_MAX_REPORTED_REJECTS"],
+                        check=check, reject_conflicts=app.config["ROSTER_CONFLICTS"] == "reject")
+        job.start(stream)
+        jobs.append(job)
+    return jobs
+
+def run_import(jobs):
+    """
+    Runs the jobs one after the other, yielding each job's report after
+    every chunk it writes.
+    """
+    for job in jobs:
+        started = time.perf_counter() if query_stats.enabled else None
+        for report in job.chunks():
+            yield report
+        record_query(job.insert_query(job.columns(False)), started, rows_affected=job.report["rows_imported"])
+        if job.report["rows_imported"]:
+            notify_write(f"INSERT INTO {job.table}")
+
+def import_files():
+    files = []
+    for table in request.files:
+        if table not in IMPORT_SPECS:
+            raise BadRequest(f"Cannot import '{table}', expected one of {', '.join(IMPORT_ORDER)}")
+        files.append((table, io.TextIOWrapper(request.files[table].stream, encoding="utf-8-sig", newline="")))
+    if not files:
+        raise BadRequest(f"Upload at least one CSV file named {', '.join(IMPORT_ORDER)}")
+    return files
+
+@app.route("/api/import", methods=["POST"])
+@role_required(["admin"])
+def import_csv():
+    """
+    Imports uploaded CSV files (multipart fields named after the tables).
+    Replies with one report per file, or streams a report line after
+    every chunk when NDJSON is asked for.
+    """
+    try:
+        jobs = start_import(import_files())
+    except ValueError as e:
+        raise BadRequest(str(e))
+
+    if wants_ndjson():
+        def generate():
+            try:
+                for report in run_import(jobs):
+                    yield json.dumps(report, default=str) + "\n"
+            except RuntimeError as e:
+                yield json.dumps({"error": "Import failed", "message": str(e)}) + "\n"
+        return Response(stream_with_context(generate()), 200, mimetype="application/x-ndjson")
+
+    try:
+        for _ in run_import(jobs):
+            pass
+    except RuntimeError as e:
+        return make_response(jsonify({"error": "Import failed", "message": str(e)}), 500)
+    reports = [job.report for job in jobs]
+    imported = sum(report["rows_imported"] for report in reports)
+    rejected = sum(report["rows_rejected"] for report in reports)
+    status = 201 if not rejected else 207 if imported else 400
+    return make_response(jsonify({"rows_imported": imported, "rows_rejected": rejected, "files": reports}), status)
+
+@app.cli.command("import-csv")
+@click.option("--students", type=click.File(encoding="utf-8-sig"), help="Students CSV.")
+@click.option("--teachers", type=click.File(encoding="utf-8-sig"), help="Teachers CSV.")
+@click.option("--classes", type=click.File(encoding="utf-8-sig"), help="Classes CSV.")
+@click.option("--roster", type=click.File(encoding="utf-8-sig"), help="Roster CSV.")
+@click.option("--load-data/--insert", default=None, help="Load with LOAD DATA LOCAL INFILE instead of INSERTs.")
+@click.option("--rejects", type=click.File("w"), help="Write rejected rows (table, line, message) to this CSV.")
+def import_csv_command(students, teachers, classes, roster, load_data, rejects):
+    """
+    Imports SIS CSV exports, parents first, printing progress per chunk.
+    """
+    files = [(table, stream) for table, stream in
+             (("students", students), ("teachers", teachers), ("classes", classes), ("roster", roster)) if stream]
+    if not files:
+        raise click.UsageError("Pass at least one of --students, --teachers, --classes, --roster")
+
+    on_reject = None
+    if rejects:
+        writer = csv.writer(rejects)
+        writer.writerow(["table", "line", "message"])
+        on_reject = lambda table, line, message, row: writer.writerow([table, line, message])
+
+    try:
+        jobs = start_import(files, load_data, on_reject)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    try:
+        for report in run_import(jobs):
+            rate = report["rows_read"] / report["seconds"] if report["seconds"] else 0
+            click.echo(f"{report['table']}: {report['rows_read']} read, {report['rows_imported']} imported, "
+                       f"{report['rows_rejected']} rejected ({rate:.0f} rows/s)", err=True)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+# Export
+
+def export_roster(fmt, compress=False, idclass=None):
+    """
+    The roster join as fmt bytes, streamed from a server-side cursor
+    EXPORT_BATCH_SIZE rows at a time and gzipped on the fly if asked.
+    idclass narrows it to one class list. Format errors (ValueError,
+    RuntimeError) are raised before the query runs.
+    """
+    write = export_writer(fmt, ROSTER_EXPORT_COLUMNS)
+    query, args = ROSTER_QUERY, ()
+    if idclass is not None:
+        query, args = query + " WHERE idclass = %s", (idclass,)
+    query += " ORDER BY idroster"
+
+    started = time.perf_counter() if query_stats.enabled else None
+    cur = mysql.connection.cursor(SSCursor)
+    try:
+        cur.execute(query, args)
+    except Exception:
+        cur.close()
+        raise
+
+    def batches():
+        count = 0
+        try:
+            for rows in fetch_batches(cur, app.config["EXPORT_BATCH_SIZE"], [name for name, _ in ROSTER_EXPORT_COLUMNS]):
+                count += len(rows)
+                yield rows
+        finally:
+            cur.close()
+            record_query(query, started, rows_returned=count)
+
+    chunks = write(batches())
+    return gzip_chunks(chunks) if compress else chunks
+
+@app.route("/api/export/roster", methods=["GET"])
+@role_required(["admin"])
+def export_roster_api():
+    """
+    ?format=csv (default), parquet or arrow; ?compress=gzip; ?idclass=
+    for a single class list.
+    """
+    fmt = request.args.get("format", "csv")
+    compress = request.args.get("compress")
+    if compress not in (None, "gzip"):
+        raise BadRequest("compress must be 'gzip'")
+    idclass = request.args.get("idclass")
+    if idclass is not None:
+        try:
+            idclass = int(idclass)
+        except ValueError:
+            raise BadRequest("'idclass' must be an integer")
+    try:
+        chunks = export_roster(fmt, compress == "gzip", idclass)
+    except ValueError as e:
+        raise BadRequest(str(e))
+    except RuntimeError as e:
+        return make_response(jsonify({"error": "Not Implemented", "message": str(e)}), 501)
+    except Exception as e:
+        return make_response(jsonify({"error": "Database error", "message": str(e)}), 500)
+
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    filename = f"roster.{extension}" if idclass is None else f"class-{idclass}.{extension}"
+    if compress:
+        mimetype, filename = "application/gzip", filename + ".gz"
+    response = Response(stream_with_context(chunks), 200, mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+@app.cli.command("export-roster")
+@click.option("--format", "fmt", type=click.Choice(list(EXPORT_FORMATS)), default="csv", show_default=True)
+@click.option("--gzip", "compress", is_flag=True, help="Gzip the output.")
+@click.option("--idclass", type=int, help="Export one class list only.")
+@click.option("--output", type=click.File("wb"), default="-", help="File to write (default stdout).")
+def export_roster_command(fmt, compress, idclass, output):
+    """
+    Writes the roster joined with student, teacher and class names.
+    """
+    try:
+        chunks = export_roster(fmt, compress, idclass)
+    except (ValueError, RuntimeError) as e:
+        raise click.ClickException(str(e))
+    for chunk in chunks:
+        output.write(chunk)
+
+# Migrations
+
+def migration_runner(batch_size=None, sleep=None, log=None):
+    """
+    A MigrationRunner on a pooled connection, set up from the MIGRATION_*
+    settings. With MIGRATION_REPLICA_HOST set, backfills also wait for
+    that replica to catch up.
+    """
+    replica = None
+    if app.config["MIGRATION_REPLICA_HOST"]:
+        replica = mysql_connector(dict(app.config, MYSQL_HOST=app.config["MIGRATION_REPLICA_HOST"]))()
+    return MigrationRunner(
+        mysql.connection,
+        batch_size=batch_size or app.config["MIGRATION_BATCH_SIZE"],
+        sleep=app.config["MIGRATION_SLEEP"] if sleep is None else sleep,
+        replica=replica,
+        max_lag=app.config["MIGRATION_MAX_REPLICA_LAG"],
+        lock_wait_timeout=app.config["MIGRATION_LOCK_WAIT_TIMEOUT"],
+        log=log,
+    )
+
+@app.cli.command("migrate")
+@click.option("--status", "show_status", is_flag=True, help="List migrations and when they were applied.")
+@click.option("--target", type=int, help="Stop after this version.")
+@click.option("--batch-size", type=int, help="Rows per backfill batch (default MIGRATION_BATCH_SIZE).")
+@click.option("--sleep", type=float, help="Seconds between backfill batches (default MIGRATION_SLEEP).")
+def migrate_command(show_status, target, batch_size, sleep):
+    """
+    Applies pending schema migrations from migrations/, resuming an
+    interrupted one where it stopped.
+    """
+    runner = migration_runner(batch_size, sleep, log=lambda message: click.echo(message, err=True))
+    try:
+        if show_status:
+            for version, filename, applied_at in runner.status():
+                click.echo(f"{version:>5}  {filename:<40} {applied_at or 'pending'}")
+            return
+        applied = runner.run(target)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    finally:
+        if runner.replica is not None:
+            runner.replica.close()
+    click.echo(f"{len(applied)} migration(s) applied", err=True)
+
+# Monitoring
+
+@app.route("/api/pool", methods=["GET"])
+@role_required(["admin"])
+def get_pool_stats():
+    return make_response(jsonify(mysql.stats()), 200)
+
+@app.route("/api/cache", methods=["GET"])
+@role_required(["admin"])
+def get_cache_stats():
+    return make_response(jsonify(response_cache.stats()), 200)
+
+@app.route("/api/token-cache", methods=["GET"])
+@role_required(["admin"])
+def get_token_cache_stats():
+    return make_response(jsonify(token_cache().stats()), 200)
+
+@app.route("/api/query-stats", methods=["GET"])
+@role_required(["admin"])
+def get_query_stats():
+    return make_response(jsonify(query_stats.summary()), 200)
+
+@app.route("/api/query-stats", methods=["DELETE"])
+@role_required(["admin"])
+def reset_query_stats():
+    query_stats.reset()
+    return make_response(jsonify({"message": "query stats reset"}), 200)
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.render(pool_gauges()), mimetype="text/plain; version=0.0.4")
+
 # API Page
     
 @app.route("/api")
@@ -0,0 +1,408 @@
+"""
+Asynchronous serving mode:
+
+    uvicorn asgi:application --workers 4
+
+The list and single-row CRUD endpoints under /api run as coroutines on an
+aiomysql pool, so a worker waiting on MySQL holds no thread. Everything
+else (HTML pages, auth, bulk inserts, NDJSON streams, monitoring) is
+served by the Flask WSGI app on a thread, streamed chunk by chunk, so
+every route and JSON contract is the same as under WSGI.
+"""
+import asyncio
+import contextvars
+import sys
+import tempfile
+import time
+from functools import partial
+
+from flask import Flask, jsonify, make_response, request
+from werkzeug.exceptions import HTTPException
+
+from app import (
+    app, add_validators, cached_response, check_roster_write, index_refresher, is_bulk_request, list_page_query,
+    list_page_response, notify_write, person_values, query_stats, record_query, response_cache, response_cache_key,
+    roster_values, store_response, table_etag, validate_request_data, wants_ndjson,
+)
+from auth import check_role
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+# Request bodies above this size are spooled to disk instead of memory.
+SPOOL_SIZE = 1024 * 1024
+
+
+class AsyncMySQLPool:
+    """
+    aiomysql pool configured from the same MYSQL_* / MYSQL_POOL_* settings
+    as pool.MySQLPool, with the query helpers the async views need.
+    """
+
+    def __init__(self):
+        self.pool = None
+
+    async def start(self, config):
+        if aiomysql is None:
+            raise RuntimeError("The ASGI mode requires the aiomysql package")
+        kwargs = {
+            "host": config["MYSQL_HOST"],
+            "port": config["MYSQL_PORT"],
+            "user": config["MYSQL_USER"] or "",
+            "password": config["MYSQL_PASSWORD"] or "",
+            "db": config["MYSQL_DB"],
+            "charset": config["MYSQL_CHARSET"],
+            "connect_timeout": config["MYSQL_CONNECT_TIMEOUT"],
+            "minsize": config["MYSQL_POOL_MIN_SIZE"],
+            "maxsize": config["MYSQL_POOL_MAX_SIZE"],
+            "pool_recycle": config["MYSQL_POOL_MAX_LIFETIME"],
+            "autocommit": False,
+        }
+        if config["MYSQL_UNIX_SOCKET"]:
+            kwargs["unix_socket"] = config["MYSQL_UNIX_SOCKET"]
+        if config["MYSQL_CURSORCLASS"]:
+            kwargs["cursorclass"] = getattr(aiomysql, config["MYSQL_CURSORCLASS"])
+        self.pool = await aiomysql.create_pool(**kwargs)
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    async def fetchall(self, query, args=()):
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(query, args)
+                rows = await cur.fetchall()
+            await conn.rollback()
+        return rows
+
+    async def commit(self, query, args=()):
+        """
+        Runs one write in its own transaction. Returns (rowcount, lastrowid).
+        """
+        async with self.pool.acquire() as conn:
+            try:
+                async with conn.cursor() as cur:
+                    await cur.execute(query, args)
+                    result = cur.rowcount, cur.lastrowid
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+        return result
+
+    def stats(self):
+        if self.pool is None:
+            return {}
+        return {"size": self.pool.size, "idle": self.pool.freesize,
+                "in_use": self.pool.size - self.pool.freesize,
+                "min_size": self.pool.minsize, "max_size": self.pool.maxsize}
+
+
+db = AsyncMySQLPool()
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    Calls func on the default executor inside a copy of the current
+    context, so it sees the same Flask request.
+    """
+    ctx = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(None, partial(ctx.run, func, *args, **kwargs))
+
+def role_check(endpoint):
+    roles = getattr(app.view_functions[endpoint], "required_roles", None)
+    return None if roles is None else check_role(roles)
+
+async def fetch_json(query, args):
+    """
+    Async counterpart of app.execute_json.
+    """
+    started = time.perf_counter() if query_stats.enabled else None
+    try:
+        data = await db.fetchall(query, args)
+    except Exception as e:
+        return make_response(jsonify({"error": "Database error", "message": str(e)}), 500)
+    record_query(query, started, rows_returned=len(data))
+    return data
+
+async def commit(query, *args):
+    """
+    Async counterpart of app.commit; write listeners (cache invalidation,
+    the home page schedule) still run, on a thread.
+    """
+    started = time.perf_counter() if query_stats.enabled else None
+    try:
+        rows, lastrowid = await db.commit(query, args)
+    except Exception as e:
+        raise RuntimeError(f"Commit failed: {str(e)}")
+    record_query(query, started, rows_affected=rows)
+    await run_sync(notify_write, query, args, lastrowid)
+    return rows
+
+
+# Views. Roles, ETags and caching follow the decorators on the Flask view
+# of the same endpoint.
+
+def list_view(table, pk):
+    async def view(endpoint, **kwargs):
+        sync_view = app.view_functions[endpoint]
+        forbidden = role_check(endpoint)
+        if forbidden is not None:
+            return forbidden
+
+        etag_table = getattr(sync_view, "etag_table", None)
+        etag = table_etag(etag_table) if etag_table else None
+        if etag and request.if_none_match.contains(etag):
+            return add_validators(make_response("", 304), etag_table, etag)
+
+        cache_table = getattr(sync_view, "cache_table", None)
+        if cache_table:
+            key = response_cache_key()
+            response = cached_response(key)
+            if response is None:
+                versions = response_cache.tag_versions([cache_table])
+                response = store_response(key, await list_page(table, pk), cache_table, versions)
+        else:
+            response = await list_page(table, pk)
+        return add_validators(response, etag_table, etag) if etag else response
+    view.lists = True
+    return view
+
+async def list_page(table, pk):
+    query, params, page = list_page_query(table, pk)
+    results = await fetch_json(query, params)
+    if isinstance(results, Flask.response_class):
+        return results
+    return make_response(list_page_response(table, results, page))
+
+def write_view(query, required_fields=None, values=None, status=200, message="data updated successfully", check=None):
+    """
+    One INSERT, UPDATE or DELETE. values maps the JSON body to the query
+    params; a path id (UPDATE/DELETE) is appended last. check, if given,
+    vets the body first (see check_roster_write).
+    """
+    async def view(endpoint, **kwargs):
+        if status == 201 and is_bulk_request():
+            return await run_sync(app.view_functions[endpoint], **kwargs)
+        forbidden = role_check(endpoint)
+        if forbidden is not None:
+            return forbidden
+        args, flags = (), {}
+        if required_fields is not None:
+            data = validate_request_data(required_fields)
+            if check is not None:
+                flags, rejection = await run_sync(check, [data], *kwargs.values())
+                if rejection is not None:
+                    return rejection
+            args = tuple(values(data))
+        args += tuple(kwargs.values())
+        rows = await commit(query, *args)
+        return make_response(jsonify({"message": message, "rows_affected": rows, **flags}), status)
+    return view
+
+def person_writes(table, pk, delete_endpoint):
+    person_fields = ["firstname", "lastname", "birthdate", "gender"]
+    return {
+        f"add_{table}": write_view(
+            f"""INSERT INTO {table} (firstname, middlename, lastname, birthdate, gender) VALUES (%s, %s, %s, %s, %s)""",
+            person_fields, person_values, 201, "data created successfully"),
+        f"update_{table}": write_view(
+            f"""UPDATE {table} SET firstname=%s, middlename=%s, lastname=%s, birthdate=%s, gender=%s WHERE {pk}=%s""",
+            person_fields, person_values),
+        delete_endpoint: write_view(f"""DELETE FROM {table} WHERE {pk}=%s""", message="data deleted successfully"),
+    }
+
+ASYNC_VIEWS = {
+    "get_students_api": list_view("students", "idstudents"),
+    "get_teachers_api": list_view("teachers", "idteachers"),
+    "get_classes_api": list_view("classes", "idclasses"),
+    "get_rooms_api": list_view("rooms", "idrooms"),
+    "get_courses_api": list_view("courses", "idcourses"),
+    "get_roster_api": list_view("roster", "idroster"),
+    **person_writes("students", "idstudents", "delete_student"),
+    **person_writes("teachers", "idteachers", "delete_teacher"),
+    "add_classes": write_view(
+        """INSERT INTO classes (description, idroom, idcourse) VALUES (%s, %s, %s)""", ["description"],
+        lambda data: (data["description"], data.get("idroom"), data.get("idcourse")), 201, "data created successfully"),
+    "update_classes": write_view(
+        """UPDATE classes SET description=%s, idroom=%s, idcourse=%s WHERE idclasses=%s""", ["description"],
+        lambda data: (data["description"], data.get("idroom"), data.get("idcourse"))),
+    "delete_class": write_view("""DELETE FROM classes WHERE idclasses=%s""", message="data deleted successfully"),
+    "add_rooms": write_view(
+        """INSERT INTO rooms (location, description) VALUES (%s, %s)""", ["location"],
+        lambda data: (data["location"], data.get("description")), 201, "data created successfully"),
+    "update_rooms": write_view(
+        """UPDATE rooms SET location=%s, description=%s WHERE idrooms=%s""", ["location"],
+        lambda data: (data["location"], data.get("description"))),
+    "delete_room": write_view("""DELETE FROM rooms WHERE idrooms=%s""", message="data deleted successfully"),
+    "add_courses": write_view(
+        """INSERT INTO courses (name, code) VALUES (%s, %s)""", ["name", "code"],
+        lambda data: (data["name"], data["code"]), 201, "data created successfully"),
+    "update_courses": write_view(
+        """UPDATE courses SET name=%s, code=%s WHERE idcourses=%s""", ["name", "code"],
+        lambda data: (data["name"], data["code"])),
+    "delete_course": write_view("""DELETE FROM courses WHERE idcourses=%s""", message="data deleted successfully"),
+    "add_roster": write_view(
+        """INSERT INTO roster (idclass, idstudent, idteacher, class_period) VALUES (%s, %s, %s, %s)""", ["class_period"],
+        roster_values, 201, "data created successfully", check_roster_write),
+    "update_roster": write_view(
+        """UPDATE roster SET idclass=%s, idstudent=%s, idteacher=%s, class_period=%s WHERE idroster=%s""", ["class_period"],
+        roster_values, check=check_roster_write),
+    "delete_roster": write_view("""DELETE FROM roster WHERE idroster=%s""", message="data deleted successfully"),
+}
+
+
+# ASGI plumbing
+
+async def read_body(receive):
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunk = message.get("body", b"")
+        body.write(chunk)
+        size += len(chunk)
+        if not message.get("more_body"):
+            break
+    body.seek(0)
+    return body, size
+
+def build_environ(scope, body, size):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "CONTENT_LENGTH": str(size),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name != "CONTENT_LENGTH":
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+async def dispatch(view, endpoint, view_args, environ):
+    """
+    Flask's full_dispatch_request with an awaited view: before/after
+    request hooks, error handlers and teardown all run as under WSGI.
+    """
+    ctx = app.request_context(environ)
+    ctx.push()
+    error = None
+    try:
+        try:
+            rv = app.preprocess_request()
+            if rv is None:
+                rv = await view(endpoint, **view_args)
+        except Exception as e:
+            rv = app.handle_user_exception(e)
+        response = app.make_response(rv)
+        response = app.process_response(response)
+    except Exception as e:
+        error = e
+        response = app.handle_exception(e)
+    finally:
+        ctx.pop(error)
+    return response
+
+async def send_response(send, response):
+    headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in response.headers.items()]
+    await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": response.get_data()})
+
+async def call_wsgi(environ, send):
+    """
+    Serves the request with the Flask WSGI app on a thread. The body is
+    passed on chunk by chunk, so streamed responses stay streamed.
+    """
+    ctx = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+    iterable = await loop.run_in_executor(None, ctx.run, app.wsgi_app, environ, start_response)
+    iterator = iter(iterable)
+    try:
+        chunk = await loop.run_in_executor(None, ctx.run, next, iterator, None)
+        await send({"type": "http.response.start", "status": started["status"], "headers": started["headers"]})
+        while chunk is not None:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            chunk = await loop.run_in_executor(None, ctx.run, next, iterator, None)
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        if hasattr(iterable, "close"):
+            await loop.run_in_executor(None, ctx.run, iterable.close)
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                with app.app_context():
+                    await db.start(app.config)
+                index_refresher.start()
+            except Exception as e:
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await db.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+def streams(environ):
+    """
+    Whether the request asks for an NDJSON stream. Those read a
+    server-side cursor as the body is sent, so they go to call_wsgi
+    rather than being buffered by send_response.
+    """
+    with app.request_context(environ):
+        return wants_ndjson()
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    body, size = await read_body(receive)
+    try:
+        environ = build_environ(scope, body, size)
+        try:
+            endpoint, view_args = app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            endpoint = None
+        view = ASYNC_VIEWS.get(endpoint)
+        if view is None or db.pool is None or (getattr(view, "lists", False) and streams(environ)):
+            await call_wsgi(environ, send)
+        else:
+            await send_response(send, await dispatch(view, endpoint, view_args, environ))
+    finally:
+        body.close()
@@ -1,32 +1,221 @@
-from flask import Blueprint, jsonify, request
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import Blueprint, current_app, g, jsonify, request
 from functools import wraps
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.default_callbacks import default_blocklist_callback
+from flask_jwt_extended.internal_utils import get_jwt_manager
 from datetime import timedelta
+from users import DEFAULT_HASH_METHOD, LoginThrottle, UserCache, hash_password, needs_rehash, verify_password
 
 auth_bp = Blueprint("auth", __name__)
 
+ROLES = ("admin", "teacher", "student")
+
+# Demo accounts with documented passwords. They are only honoured (ahead
+# of the users table) when AUTH_DEMO_ACCOUNTS is on, so an admin can log in
+# and create the real accounts on an empty development database.
 users = {
-    "admin": {"password": "roster_admin", "role": "admin"},
-    "teacher": {"password": "roster_teacher", "role": "teacher"},
-    "student": {"password": "roster_student", "role": "student"}
+    "admin": {"password_hash": "pbkdf2:sha256:600000$eyZjRoop5hcvvVdY$af952cb4ed74fca50020f27d503aba4842e99c77e7d2853f8e6b385b346806bd", "role": "admin"},
+    "teacher": {"password_hash": "pbkdf2:sha256:600000$6yLNhnA1Rnkq1gUz$f0888424d61de3b60c974535cbcd9185c940cb08a7f8a65422c906c17a55a909", "role": "teacher"},
+    "student": {"password_hash": "pbkdf2:sha256:600000$FOpp70WR8zmp2wLn$e13e6334358787a1d7ab970864e143003b871891f8a9eda425313a6cfd24b369", "role": "student"}
 }
 
+class VerifiedTokenCache:
+    """
+    Claims of bearer tokens that already passed signature verification,
+    keyed on a digest of the Authorization header. Entries are dropped at
+    the token's expiry (or after max_age seconds, whichever comes first),
+    and the least recently used entry goes once max_entries is reached.
+    """
+
+    def __init__(self, max_entries=10000, max_age=300):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.time():
+                del self._entries[key]
+                self._counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[0]
+
+    def set(self, key, value, expires_at=None):
+        deadline = time.time() + self.max_age
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        with self._lock:
+            self._entries[key] = (value, deadline)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+        return stats
+
+
+def token_cache():
+    cache = current_app.extensions.get("jwt_verify_cache")
+    if cache is None:
+        cache = current_app.extensions.setdefault("jwt_verify_cache", VerifiedTokenCache(
+            max_entries=current_app.config.get("JWT_VERIFY_CACHE_SIZE", 10000),
+            max_age=current_app.config.get("JWT_VERIFY_CACHE_MAX_AGE", 300),
+        ))
+    return cache
+
+def verified_claims():
+    """
+    Same checks as jwt_required(), but a bearer token seen before is taken
+    from token_cache() instead of being decoded and verified again. Apps
+    that revoke tokens or load users per token always verify.
+
+    This reads the JWTManager's callbacks and fills in the g attributes
+    verify_jwt_in_request() sets, which are Flask-JWT-Extended internals:
+    the package is pinned exactly, and test_token_cache_internals fails
+    if an upgrade renames them.
+    """
+    header = request.headers.get(current_app.config["JWT_HEADER_NAME"])
+    manager = get_jwt_manager()
+    cacheable = (
+        header and current_app.config.get("JWT_VERIFY_CACHE_SIZE", 10000)
+        and manager._token_in_blocklist_callback is default_blocklist_callback
+        and manager._user_lookup_callback is None
+    )
+    if cacheable:
+        key = hashlib.sha256(header.encode()).digest()
+        cached = token_cache().get(key)
+        if cached is not None:
+            g._jwt_extended_jwt_header, g._jwt_extended_jwt = cached
+            g._jwt_extended_jwt_user = {"loaded_user": None}
+            g._jwt_extended_jwt_location = "headers"
+            return g._jwt_extended_jwt
+
+    verified = verify_jwt_in_request()
+    if verified is None:
+        return {}
+    if cacheable and g._jwt_extended_jwt_location == "headers":
+        token_cache().set(key, verified, expires_at=verified[1].get("exp"))
+    return verified[1]
+
 def role_required(required_roles):
     """
     Decorator to enforce role-based access control.
     """
     def decorator(func):
         @wraps(func)
-        @jwt_required()  
         def wrapper(*args, **kwargs):
-            claims = get_jwt()  
-            user_role = claims.get("role")
-            if user_role not in required_roles:
-                return jsonify({"error": "Access forbidden: Insufficient role"}), 403
+            forbidden = check_role(required_roles)
+            if forbidden is not None:
+                return forbidden
             return func(*args, **kwargs)
+        wrapper.required_roles = required_roles
         return wrapper
     return decorator
 
+def check_role(required_roles):
+    """
+    None if the request's token carries one of required_roles, otherwise
+    the 403 response.
+    """
+    claims = verified_claims()
+    user_role = claims.get("role")
+    if user_role not in required_roles:
+        return jsonify({"error": "Access forbidden: Insufficient role"}), 403
+    return None
+
+def login_state():
+    """
+    Per-app user cache, throttles and the semaphore bounding how many
+    password hashes are checked at once, built from AUTH_* / LOGIN_*
+    settings on first use.
+    """
+    state = current_app.extensions.get("auth_login")
+    if state is None:
+        config = current_app.config
+        state = current_app.extensions.setdefault("auth_login", {
+            "users": UserCache(
+                max_entries=config.get("AUTH_USER_CACHE_SIZE", 10000),
+                ttl=config.get("AUTH_USER_CACHE_TTL", 60),
+            ),
+            "user_throttle": LoginThrottle(
+                max_failures=config.get("LOGIN_MAX_FAILURES", 5),
+                window=config.get("LOGIN_FAILURE_WINDOW", 300),
+            ),
+            "address_throttle": LoginThrottle(
+                max_failures=config.get("LOGIN_MAX_FAILURES_PER_ADDRESS", 100),
+                window=config.get("LOGIN_FAILURE_WINDOW", 300),
+            ),
+            "hashing": threading.BoundedSemaphore(config.get("LOGIN_MAX_CONCURRENT_HASHES", 4)),
+        })
+    return state
+
+def fetch_user(username):
+    """
+    The users table row for username as a dict, or None.
+    """
+    cur = current_app.extensions["mysql"].connection.cursor()
+    try:
+        cur.execute("SELECT idusers, password_hash, role FROM users WHERE username=%s", (username,))
+        row = cur.fetchone()
+    finally:
+        cur.close()
+    if row is None:
+        return None
+    if not isinstance(row, dict):
+        row = dict(zip(("idusers", "password_hash", "role"), row))
+    return row
+
+def demo_accounts():
+    return users if current_app.config.get("AUTH_DEMO_ACCOUNTS", False) else {}
+
+def find_user(username):
+    demo = demo_accounts()
+    if username in demo:
+        return demo[username]
+    cache = login_state()["users"]
+    user = cache.get(username)
+    if user is UserCache.MISSING:
+        user = fetch_user(username)
+        cache.set(username, user)
+    return user
+
+def save_password_hash(username, password_hash):
+    conn = current_app.extensions["mysql"].connection
+    cur = conn.cursor()
+    try:
+        cur.execute("UPDATE users SET password_hash=%s WHERE username=%s", (password_hash, username))
+        conn.commit()
+    finally:
+        cur.close()
+    login_state()["users"].invalidate(username)
+
+def retry_later(message, status, retry_after):
+    response = jsonify({"error": message})
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
 @auth_bp.route("/login", methods=["POST"])
 def login():
     """
@@ -42,13 +231,109 @@ def login():
     if not username or not password:
         return jsonify({"error": "Missing username or password"}), 400
 
-    user = users.get(username)
-    if not user or user["password"] != password:
+    state = login_state()
+    address = request.remote_addr or "-"
+    # Failures per username are counted per client address too, so
+    # guessing at someone's username from elsewhere cannot lock them out.
+    retry_after = max(state["user_throttle"].retry_after((username, address)),
+                      state["address_throttle"].retry_after(address))
+    if retry_after:
+        return retry_later("Too many failed logins", 429, retry_after)
+
+    try:
+        user = find_user(username)
+    except Exception as e:
+        return jsonify({"error": "Database error", "message": str(e)}), 500
+
+    # Hashing is deliberately slow; bounding how many run at once keeps a
+    # login spike from starving every other request of CPU.
+    method = current_app.config.get("PASSWORD_HASH_METHOD", DEFAULT_HASH_METHOD)
+    if not state["hashing"].acquire(timeout=current_app.config.get("LOGIN_QUEUE_TIMEOUT", 5)):
+        return retry_later("Login service busy", 503, 1)
+    try:
+        valid = verify_password(user["password_hash"] if user else None, password, method)
+    finally:
+        state["hashing"].release()
+
+    if not valid:
+        state["user_throttle"].failed((username, address))
+        state["address_throttle"].failed(address)
         return jsonify({"error": "Invalid credentials"}), 401
+    state["user_throttle"].succeeded((username, address))
+
+    if "idusers" in user and needs_rehash(user["password_hash"], method):
+        try:
+            save_password_hash(username, hash_password(password, method))
+        except Exception:
+            current_app.logger.warning("Could not save the rehashed password of %s", username, exc_info=True)
 
     access_token = create_access_token(identity=username, additional_claims={"role": user["role"]}, expires_delta=timedelta(hours=8))
     return jsonify({"access_token": access_token}), 200
 
+@auth_bp.route("/users", methods=["POST"])
+@role_required(["admin"])
+def add_users():
+    """
+    Creates accounts, or resets the password and role of existing ones.
+    Takes one {"username", "password", "role", "idteacher", "idstudent"}
+    object or a list of them.
+    """
+    data = request.get_json(silent=True)
+    rows = data if isinstance(data, list) else [data]
+    if not rows or not all(isinstance(row, dict) for row in rows):
+        return jsonify({"error": "Bad Request", "message": "expected a JSON object or array of objects"}), 400
+    max_rows = current_app.config.get("AUTH_MAX_USERS_PER_REQUEST", 100)
+    if len(rows) > max_rows:
+        return jsonify({"error": "Bad Request", "message": f"at most {max_rows} users per request"}), 400
+    for index, row in enumerate(rows):
+        if not row.get("username") or not row.get("password") or row.get("role") not in ROLES:
+            return jsonify({"error": "Bad Request", "index": index,
+                            "message": f"username, password and role ({', '.join(ROLES)}) are required"}), 400
+        if row["username"] in demo_accounts():
+            return jsonify({"error": "Bad Request", "index": index,
+                            "message": f"'{row['username']}' is a demo account"}), 400
+
+    # Each hash takes one of the login hashing slots, so a bulk import
+    # shares the CPU with logins instead of hogging it.
+    method = current_app.config.get("PASSWORD_HASH_METHOD", DEFAULT_HASH_METHOD)
+    hashing = login_state()["hashing"]
+    values = []
+    for row in rows:
+        if not hashing.acquire(timeout=current_app.config.get("LOGIN_QUEUE_TIMEOUT", 5)):
+            return retry_later("Login service busy", 503, 1)
+        try:
+            password_hash = hash_password(row["password"], method)
+        finally:
+            hashing.release()
+        values.append((row["username"], password_hash, row["role"], row.get("idteacher"), row.get("idstudent")))
+    conn = current_app.extensions["mysql"].connection
+    cur = conn.cursor()
+    try:
+        cur.executemany("""INSERT INTO users (username, password_hash, role, idteacher, idstudent)
+                           VALUES (%s, %s, %s, %s, %s)
+                           ON DUPLICATE KEY UPDATE password_hash=VALUES(password_hash), role=VALUES(role),
+                           idteacher=VALUES(idteacher), idstudent=VALUES(idstudent)""", values)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": "Database error", "message": str(e)}), 500
+    finally:
+        cur.close()
+    cache = login_state()["users"]
+    for row in rows:
+        cache.invalidate(row["username"])
+    return jsonify({"message": "users saved", "rows": len(rows)}), 201
+
+@auth_bp.route("/login-stats", methods=["GET"])
+@role_required(["admin"])
+def get_login_stats():
+    state = login_state()
+    return jsonify({
+        "users": state["users"].stats(),
+        "user_throttle": state["user_throttle"].stats(),
+        "address_throttle": state["address_throttle"].stats(),
+    }), 200
+
 @auth_bp.route("/protected", methods=["GET"])
 @jwt_required()
 def protected():
@@ -0,0 +1,570 @@
+"""
+Load test for app.py against a local MySQL/MariaDB.
+
+    python benchmark.py seed --students 100000 --classes 2000 --roster 1000000
+    python benchmark.py run --concurrency 16 --requests 2000 --label before
+    python benchmark.py compare benchmark_results/before.json benchmark_results/after.json
+
+`seed` recreates the schema from student_roster_db_backup.sql in the
+benchmark database, appends synthetic rows and applies migrations/. `run` serves the app
+in-process (or targets --url), drives every route and writes a JSON
+result file; `compare` reports per-route changes between two of them.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+from instrumentation import percentile
+from migrate import MigrationRunner, split_statements
+from users import DEFAULT_HASH_METHOD, hash_password
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "student_roster_db_backup.sql")
+RESULTS_DIR = "benchmark_results"
+
+DEFAULT_VOLUMES = {
+    "rooms": 500,
+    "courses": 1000,
+    "teachers": 2000,
+    "students": 100000,
+    "classes": 2000,
+    "roster": 1000000,
+    "users": 10000,
+}
+
+# Every seeded account is user<idusers> with this password.
+BENCH_PASSWORD = "bench_password"
+
+FIRST_NAMES = ["Alice", "Brian", "Catherine", "David", "Evelyn", "Frank", "Grace", "Henry", "Isabel", "Jack",
+               "Karen", "Liam", "Maria", "Noah", "Olivia", "Peter", "Quinn", "Rachel", "Samuel", "Tina"]
+LAST_NAMES = ["Johnson", "Smith", "Davis", "Garcia", "Martinez", "Rodriguez", "Wilson", "Anderson", "Thomas",
+              "Taylor", "Moore", "Jackson", "Martin", "Lee", "Perez", "Thompson", "White", "Harris", "Clark"]
+SUBJECTS = ["Algebra", "Physics", "Biology", "Chemistry", "Programming", "History", "Psychology",
+            "Literature", "Art", "Music", "Philosophy", "Statistics", "Economics", "Geography"]
+PERIODS = ["Morning", "Afternoon", "Evening"]
+# Rows per uploaded CSV in the import scenario.
+IMPORT_ROWS = 100
+
+
+# Synthetic data
+
+def random_date(rng, start, end):
+    return (start + timedelta(days=rng.randrange((end - start).days))).isoformat()
+
+def person_row(rng, born_from, born_to):
+    return (
+        rng.choice(FIRST_NAMES),
+        rng.choice(FIRST_NAMES) if rng.random() < 0.5 else None,
+        rng.choice(LAST_NAMES),
+        random_date(rng, born_from, born_to),
+        rng.choice(["Male", "Female"]),
+    )
+
+def generate_rows(table, count, rng, refs):
+    """
+    Yields `count` insert tuples for table. refs maps the tables it points
+    at to their (first, last) id, so foreign keys always resolve.
+    """
+    for i in range(count):
+        if table == "rooms":
+            yield (f"Building {chr(65 + i % 26)}, Room {i + 1}", rng.choice(["Lecture hall.", "Lab.", None]))
+        elif table == "courses":
+            subject = rng.choice(SUBJECTS)
+            yield (f"{subject} {100 + i % 400}", f"{subject[:4].upper()}{i + 1}X")
+        elif table == "teachers":
+            yield person_row(rng, date(1960, 1, 1), date(1998, 1, 1))
+        elif table == "students":
+            yield person_row(rng, date(2000, 1, 1), date(2012, 1, 1))
+        elif table == "classes":
+            yield (f"{rng.choice(SUBJECTS)} section {i + 1}", rng.randint(*refs["rooms"]), rng.randint(*refs["courses"]))
+        elif table == "roster":
+            yield (rng.randint(*refs["classes"]), rng.randint(*refs["students"]),
+                   rng.randint(*refs["teachers"]), rng.choice(PERIODS))
+        elif table == "users":
+            # Hashing is the slow part of a login, not of seeding, so all
+            # accounts share refs["password_hash"].
+            n = refs["users"][1] + i + 1
+            if rng.random() < 0.1:
+                yield (f"user{n}", refs["password_hash"], "teacher", rng.randint(*refs["teachers"]), None)
+            else:
+                yield (f"user{n}", refs["password_hash"], "student", None, rng.randint(*refs["students"]))
+        else:
+            raise ValueError(f"Unknown table '{table}'")
+
+INSERTS = {
+    "rooms": "INSERT INTO rooms (location, description) VALUES (%s, %s)",
+    "courses": "INSERT INTO courses (name, code) VALUES (%s, %s)",
+    "teachers": "INSERT INTO teachers (firstname, middlename, lastname, birthdate, gender) VALUES (%s, %s, %s, %s, %s)",
+    "students": "INSERT INTO students (firstname, middlename, lastname, birthdate, gender) VALUES (%s, %s, %s, %s, %s)",
+    "classes": "INSERT INTO classes (description, idroom, idcourse) VALUES (%s, %s, %s)",
+    "roster": "INSERT INTO roster (idclass, idstudent, idteacher, class_period) VALUES (%s, %s, %s, %s)",
+    "users": "INSERT INTO users (username, password_hash, role, idteacher, idstudent) VALUES (%s, %s, %s, %s, %s)",
+}
+
+PRIMARY_KEYS = {
+    "rooms": "idrooms",
+    "courses": "idcourses",
+    "teachers": "idteachers",
+    "students": "idstudents",
+    "classes": "idclasses",
+    "roster": "idroster",
+    "users": "idusers",
+}
+
+
+# Database
+
+def connect(args, db=True):
+    import MySQLdb
+
+    kwargs = {"host": args.host, "port": args.port, "user": args.user, "charset": "utf8mb4"}
+    if args.password:
+        kwargs["passwd"] = args.password
+    if db:
+        kwargs["db"] = args.db
+    return MySQLdb.connect(**kwargs)
+
+def id_ranges(conn):
+    cur = conn.cursor()
+    ranges = {}
+    for table, pk in PRIMARY_KEYS.items():
+        cur.execute(f"SELECT MIN({pk}), MAX({pk}) FROM {table}")
+        first, last = cur.fetchone()
+        ranges[table] = (first or 0, last or 0)
+    cur.close()
+    return ranges
+
+def seed(args):
+    volumes = {table: getattr(args, table) for table in DEFAULT_VOLUMES}
+    conn = connect(args, db=False)
+    cur = conn.cursor()
+    cur.execute(f"CREATE DATABASE IF NOT EXISTS `{args.db}`")
+    cur.execute(f"USE `{args.db}`")
+    cur.execute("DROP TABLE IF EXISTS schema_migrations, schema_migration_steps")
+    with open(SCHEMA_FILE, encoding="utf-8") as f:
+        for statement in split_statements(f.read()):
+            cur.execute(statement)
+    conn.commit()
+
+    # Rows are generated with valid references, so skip the per-row checks.
+    cur.execute("SET foreign_key_checks=0, unique_checks=0")
+    rng = random.Random(args.seed)
+    password_hash = hash_password(BENCH_PASSWORD, args.hash_method)
+    for table, count in volumes.items():
+        started = time.perf_counter()
+        refs = id_ranges(conn)
+        refs["password_hash"] = password_hash
+        rows = generate_rows(table, count, rng, refs)
+        while True:
+            chunk = list(itertools.islice(rows, args.batch_size))
+            if not chunk:
+                break
+            cur.executemany(INSERTS[table], chunk)
+            conn.commit()
+        print(f"{table:<10} +{count:>9} rows  {time.perf_counter() - started:8.1f}s")
+    cur.execute("SET foreign_key_checks=1, unique_checks=1")
+    # Indexes are cheaper to build once the rows are in.
+    MigrationRunner(conn, batch_size=args.batch_size, log=print).run()
+    cur.execute("ANALYZE TABLE " + ", ".join(volumes))
+    cur.fetchall()
+    cur.close()
+    conn.close()
+
+
+# Scenarios
+
+def multipart(files):
+    """
+    A multipart/form-data body of files, a dict of field name to
+    (filename, text). Returns (content type, body).
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for field, (filename, text) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+                     f"Content-Type: text/csv\r\n\r\n{text}\r\n")
+    parts.append(f"--{boundary}--\r\n")
+    return f"multipart/form-data; boundary={boundary}", "".join(parts).encode()
+
+def scenarios(ids):
+    """
+    One (name, method, path, role, body) per route. path and body are
+    callables taking a Random, so every request hits a different row.
+    DELETEs target ids above the seeded range, i.e. rows created by the
+    POST scenarios earlier in the same run.
+    """
+    def any_id(table):
+        return lambda rng: rng.randint(*ids[table])
+
+    def new_ids(table):
+        counter = itertools.count(ids[table][1] + 1)
+        return lambda rng: next(counter)
+
+    def person(rng):
+        firstname, middlename, lastname, birthdate, gender = person_row(rng, date(2000, 1, 1), date(2012, 1, 1))
+        return {"firstname": firstname, "middlename": middlename, "lastname": lastname,
+                "birthdate": birthdate, "gender": gender}
+
+    def course(rng):
+        return {"name": rng.choice(SUBJECTS) + " 101", "code": uuid.uuid4().hex[:12]}
+
+    def class_(rng):
+        return {"description": rng.choice(SUBJECTS) + " section",
+                "idroom": rng.randint(*ids["rooms"]), "idcourse": rng.randint(*ids["courses"])}
+
+    def room(rng):
+        return {"location": f"Building {rng.choice('ABCDEFG')}, Room {rng.randint(1, 999)}", "description": "Lab."}
+
+    def roster(rng):
+        return {"idclass": rng.randint(*ids["classes"]), "idstudent": rng.randint(*ids["students"]),
+                "idteacher": rng.randint(*ids["teachers"]), "class_period": rng.choice(PERIODS)}
+
+    def roster_csv(rng):
+        lines = ["idclass,idstudent,idteacher,class_period"]
+        for _ in range(IMPORT_ROWS):
+            row = roster(rng)
+            lines.append(f"{row['idclass']},{row['idstudent']},{row['idteacher']},{row['class_period']}")
+        return multipart({"roster": ("roster.csv", "\n".join(lines) + "\n")})
+
+    def batch(rng):
+        operations = [{"op": "create", "table": "classes", "data": class_(rng)}]
+        for _ in range(30):
+            operations.append({"op": "create", "table": "roster", "data": dict(roster(rng), idclass={"$ref": 0})})
+        operations.append({"op": "update", "table": "rooms", "id": rng.randint(*ids["rooms"]), "data": room(rng)})
+        return {"operations": operations}
+
+    def typo(rng):
+        name = rng.choice(LAST_NAMES).lower()
+        return name[0] + name[2] + name[1] + name[3:]
+
+    def class_batch(rng):
+        return ",".join(str(rng.randint(*ids["classes"])) for _ in range(10))
+
+    bodies = {"students": person, "teachers": person, "classes": class_, "rooms": room,
+              "courses": course, "roster": roster}
+    result = [
+        ("home", "GET", lambda rng: "/", None, None),
+        ("api_page", "GET", lambda rng: "/api", None, None),
+        ("metrics", "GET", lambda rng: "/metrics", None, None),
+    ]
+    for table in bodies:
+        result.append((f"{table}_page", "GET", lambda rng, t=table: f"/{t}", None, None))
+        result.append((f"{table}_api", "GET", lambda rng, t=table: f"/api/{t}", "admin", None))
+    result += [
+        ("class_page", "GET", lambda rng, f=any_id("classes"): f"/classes/{f(rng)}", None, None),
+        ("class_students_api", "GET", lambda rng, f=any_id("classes"): f"/api/classes/{f(rng)}/students", "admin", None),
+        ("student_schedule_api", "GET", lambda rng, f=any_id("students"): f"/api/students/{f(rng)}/schedule", "teacher", None),
+        ("teacher_schedule_api", "GET", lambda rng, f=any_id("teachers"): f"/api/teachers/{f(rng)}/schedule", "teacher", None),
+        ("classes_students_api", "GET", lambda rng: f"/api/classes/students?ids={class_batch(rng)}", "admin", None),
+        ("students_filtered_api", "GET", lambda rng: f"/api/students?lastname={rng.choice(LAST_NAMES)}&sort=-birthdate", "admin", None),
+        ("roster_stream_api", "GET", lambda rng: "/api/roster?format=ndjson&limit=10000", "admin", None),
+        ("roster_export", "GET", lambda rng: "/api/export/roster", "admin", None),
+        ("class_list_export", "GET", lambda rng, f=any_id("classes"): f"/api/export/roster?idclass={f(rng)}&compress=gzip", "admin", None),
+        ("pool_api", "GET", lambda rng: "/api/pool", "admin", None),
+        ("cache_api", "GET", lambda rng: "/api/cache", "admin", None),
+        ("token_cache_api", "GET", lambda rng: "/api/token-cache", "admin", None),
+        ("query_stats_api", "GET", lambda rng: "/api/query-stats", "admin", None),
+        ("query_stats_reset", "DELETE", lambda rng: "/api/query-stats", "admin", None),
+        ("conflicts_api", "GET", lambda rng: "/api/conflicts", "admin", None),
+        ("forbidden_api", "GET", lambda rng: "/api/pool", "teacher", None),
+        ("login", "POST", lambda rng: "/auth/login", None,
+         lambda rng: {"username": f"user{rng.randint(*ids['users'])}", "password": BENCH_PASSWORD}),
+        ("login_failed", "POST", lambda rng: "/auth/login", None,
+         lambda rng: {"username": f"user{rng.randint(*ids['users'])}", "password": "wrong"}),
+        ("login_stats_api", "GET", lambda rng: "/auth/login-stats", "admin", None),
+        ("search_api", "GET", lambda rng: f"/api/search?q={rng.choice(FIRST_NAMES)[:3]}+{rng.choice(LAST_NAMES)[:2]}", "teacher", None),
+        ("search_typo_api", "GET", lambda rng: f"/api/search?q={typo(rng)}", "teacher", None),
+        ("roster_import", "POST", lambda rng: "/api/import", "admin", roster_csv),
+        ("batch_write", "POST", lambda rng: "/api/batch", "admin", batch),
+    ]
+    for table, body in bodies.items():
+        result.append((f"{table}_create", "POST", lambda rng, t=table: f"/api/{t}", "admin", body))
+        result.append((f"{table}_update", "PUT", lambda rng, t=table, f=any_id(table): f"/api/{t}/{f(rng)}", "admin", body))
+    # Children before parents, so created rows are not referenced when deleted.
+    for table in ("roster", "classes", "students", "teachers", "rooms", "courses"):
+        result.append((f"{table}_delete", "DELETE", lambda rng, t=table, f=new_ids(table): f"/api/{t}/{f(rng)}", "admin", None))
+    return result
+
+
+# Runner
+
+def rss_mb():
+    """
+    Current resident set size of this process (peak size where /proc is
+    not available).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def summarize(name, latencies, statuses, elapsed, memory=None):
+    return {
+        "name": name,
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "errors": sum(count for status, count in statuses.items() if status == 0 or status >= 500),
+        "rss_mb": memory,
+    }
+
+def run_scenario(scenario, base_url, tokens, concurrency, requests, seed):
+    name, method, path, role, body = scenario
+    target = urlsplit(base_url)
+    todo = itertools.count()
+    lock = threading.Lock()
+    latencies, statuses = [], {}
+
+    def worker(n):
+        rng = random.Random(f"{seed}:{name}:{n}")
+        conn = http.client.HTTPConnection(target.hostname, target.port, timeout=60)
+        headers = {"Accept-Encoding": "gzip"}
+        if role:
+            headers["Authorization"] = f"Bearer {tokens[role]}"
+        mine, seen = [], {}
+        while next(todo) < requests:
+            with lock:
+                url, payload = path(rng), body(rng) if body else None
+            if isinstance(payload, tuple):
+                headers["Content-Type"], payload = payload
+            else:
+                headers["Content-Type"] = "application/json"
+                payload = json.dumps(payload) if payload is not None else None
+            started = time.perf_counter()
+            try:
+                conn.request(method, url, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                status = 0
+            mine.append(time.perf_counter() - started)
+            seen[status] = seen.get(status, 0) + 1
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            for status, count in seen.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+def serve_in_process(args):
+    """
+    Starts the app on a free local port with the threaded WSGI server or,
+    for --server asgi, uvicorn. Returns (stop, base_url).
+    """
+    import logging
+    from werkzeug.serving import make_server
+    from app import app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    app.config.update({
+        "MYSQL_HOST": args.host, "MYSQL_PORT": args.port, "MYSQL_USER": args.user,
+        "MYSQL_PASSWORD": args.password, "MYSQL_DB": args.db,
+    })
+    if args.server == "wsgi":
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server.shutdown, f"http://127.0.0.1:{server.server_port}"
+
+    import socket
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("--server asgi requires the uvicorn package")
+    from asgi import application
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(application, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise SystemExit("uvicorn failed to start")
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return stop, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+def issue_tokens():
+    from flask_jwt_extended import create_access_token
+    from app import app
+
+    with app.app_context():
+        return {role: create_access_token(identity=f"bench_{role}", additional_claims={"role": role},
+                                          expires_delta=timedelta(hours=8))
+                for role in ("admin", "teacher")}
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    conn = connect(args)
+    ids = id_ranges(conn)
+    conn.close()
+
+    stop = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        stop, base_url = serve_in_process(args)
+    tokens = issue_tokens()
+
+    selected = [s for s in scenarios(ids) if not args.only or any(word in s[0] for word in args.only)]
+    results = []
+    print(f"{'scenario':<24}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'rss MB':>9}")
+    try:
+        for scenario in selected:
+            # Warm-up requests fill the connection pool and caches first.
+            run_scenario(scenario, base_url, tokens, args.concurrency, args.warmup, args.seed)
+            latencies, statuses, elapsed = run_scenario(
+                scenario, base_url, tokens, args.concurrency, args.requests, args.seed)
+            result = summarize(scenario[0], latencies, statuses, elapsed, None if args.url else rss_mb())
+            results.append(result)
+            print(f"{result['name']:<24}{result['throughput']:>10.1f}{result['p50_ms']:>10.2f}"
+                  f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>8}"
+                  f"{result['rss_mb'] if result['rss_mb'] is not None else '-':>9}")
+    finally:
+        if stop is not None:
+            stop()
+
+    report = {
+        "label": args.label,
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "server": None if args.url else args.server,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "rows": {table: last - first + 1 if last else 0 for table, (first, last) in ids.items()},
+        "peak_rss_mb": None if args.url else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "scenarios": results,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{args.label or report['revision'] or 'run'}-{int(time.time())}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {path}")
+
+
+# Comparison
+
+def compare_reports(old, new, threshold):
+    """
+    Per-scenario throughput and p95 change between two result files, in
+    percent. A scenario regresses when either moves the wrong way by more
+    than threshold percent.
+    """
+    before = {result["name"]: result for result in old["scenarios"]}
+    rows = []
+    for result in new["scenarios"]:
+        previous = before.get(result["name"])
+        if previous is None:
+            continue
+        throughput = (result["throughput"] - previous["throughput"]) / previous["throughput"] * 100 if previous["throughput"] else 0.0
+        p95 = (result["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100 if previous["p95_ms"] else 0.0
+        rows.append({
+            "name": result["name"],
+            "throughput_change": throughput,
+            "p95_change": p95,
+            "regressed": throughput < -threshold or p95 > threshold,
+        })
+    return rows
+
+def compare(args):
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    rows = compare_reports(old, new, args.threshold)
+    print(f"{old.get('label') or old.get('revision')} -> {new.get('label') or new.get('revision')}")
+    print(f"{'scenario':<24}{'req/s':>10}{'p95':>10}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regressed"] else ""
+        print(f"{row['name']:<24}{row['throughput_change']:>+9.1f}%{row['p95_change']:>+9.1f}%{flag}")
+    return 1 if any(row["regressed"] for row in rows) else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed, load test and compare student roster benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def database_args(command):
+        command.add_argument("--host", default="localhost")
+        command.add_argument("--port", type=int, default=3306)
+        command.add_argument("--user", default="root")
+        command.add_argument("--password", default="")
+        command.add_argument("--db", default="student_roster_bench")
+        command.add_argument("--seed", type=int, default=1)
+
+    seed_command = commands.add_parser("seed", help="recreate the benchmark database with synthetic rows")
+    database_args(seed_command)
+    for table, count in DEFAULT_VOLUMES.items():
+        seed_command.add_argument(f"--{table}", type=int, default=count)
+    seed_command.add_argument("--batch-size", type=int, default=5000)
+    seed_command.add_argument("--hash-method", default=DEFAULT_HASH_METHOD,
+                              help="password hash method (and work factor) of the seeded users")
+
+    run_command = commands.add_parser("run", help="drive every route and save the results")
+    database_args(run_command)
+    run_command.add_argument("--url", help="benchmark a running server instead of serving the app in-process")
+    run_command.add_argument("--server", choices=["wsgi", "asgi"], default="wsgi",
+                             help="serve in-process with the threaded WSGI server or with uvicorn and asgi.py")
+    run_command.add_argument("--concurrency", type=int, default=8)
+    run_command.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    run_command.add_argument("--warmup", type=int, default=20, help="untimed requests per scenario")
+    run_command.add_argument("--only", nargs="*", help="run scenarios whose name contains one of these words")
+    run_command.add_argument("--label")
+    run_command.add_argument("--output", default=RESULTS_DIR)
+
+    compare_command = commands.add_parser("compare", help="compare two result files")
+    compare_command.add_argument("old")
+    compare_command.add_argument("new")
+    compare_command.add_argument("--threshold", type=float, default=10.0, help="allowed change in percent")
+
+    args = parser.parse_args(argv)
+    if args.command == "seed":
+        seed(args)
+    elif args.command == "run":
+        run(args)
+    else:
+        return compare(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryCache:
+    """
+    In-process LRU cache with a TTL. Entries are tagged (e.g. with the
+    table they were read from) so a write can drop everything built on
+    that table. Each worker process has its own copy; use RedisCache when
+    invalidations have to reach every worker.
+    """
+
+    shared = False
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._versions = {}
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[0]
+
+    def set(self, key, value, tags=(), versions=None, ttl=None):
+        """
+        Stores value under key. When versions (from tag_versions) is given
+        and one of the tags was invalidated since, the value is stale and
+        is not stored.
+        """
+        with self._lock:
+            if versions is not None and versions != {tag: self._versions.get(tag, 0) for tag in tags}:
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + (ttl or self.ttl), tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+            return True
+
+    def tag_versions(self, tags):
+        with self._lock:
+            return {tag: self._versions.get(tag, 0) for tag in tags}
+
+    def invalidate(self, tag):
+        with self._lock:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+            for key in self._tags.pop(tag, set()):
+                if key in self._entries:
+                    self._remove(key)
+            self._counters["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+            stats["backend"] = "memory"
+        return stats
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+
+
+class RedisCache:
+    """
+    Cache shared by every worker, stored in Redis (or anything with the
+    same get/set/sadd/smembers/delete/incr calls). Values must be JSON
+    serialisable. Eviction is left to the server's maxmemory policy.
+    """
+
+    shared = True
+
+    def __init__(self, client, ttl=300, prefix="roster:cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        with self._lock:
+            self._counters["hits" if raw is not None else "misses"] += 1
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, tags=(), versions=None, ttl=None):
+        if versions is not None and versions != self.tag_versions(tags):
+            return False
+        self.client.set(self.prefix + key, json.dumps(value), ex=ttl or self.ttl)
+        for tag in tags:
+            self.client.sadd(self.prefix + "tag:" + tag, key)
+        return True
+
+    def tag_versions(self, tags):
+        return {tag: int(self.client.get(self.prefix + "version:" + tag) or 0) for tag in tags}
+
+    def invalidate(self, tag):
+        self.client.incr(self.prefix + "version:" + tag)
+        tag_key = self.prefix + "tag:" + tag
+        keys = [self.prefix + (key.decode() if isinstance(key, bytes) else key)
+                for key in self.client.smembers(tag_key)]
+        self.client.delete(tag_key, *keys)
+        with self._lock:
+            self._counters["invalidations"] += 1
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats["backend"] = "redis"
+        return stats
+
+
+def create_cache(config):
+    """
+    Builds the backend named by CACHE_BACKEND ("memory" or "redis").
+    """
+    backend = config.get("CACHE_BACKEND", "memory")
+    ttl = config.get("CACHE_TTL", 300)
+    if backend == "memory":
+        return MemoryCache(max_entries=config.get("CACHE_MAX_ENTRIES", 1024), ttl=ttl)
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND 'redis' requires the redis package")
+        return RedisCache(redis.Redis.from_url(config["CACHE_REDIS_URL"]), ttl=ttl)
+    raise ValueError(f"Unknown CACHE_BACKEND '{backend}'")
@@ -0,0 +1,145 @@
+import threading
+
+
+def class_order(idclass):
+    # Placeholders for classes not written yet (anything but an int id)
+    # sort after the real ids.
+    return (0, idclass, "") if isinstance(idclass, int) else (1, 0, str(idclass))
+
+
+class ConflictIndex:
+    """
+    Who is booked where in every period. For each (teacher, period),
+    (student, period) and (room, period) slot it counts the roster rows of
+    every class in it; a slot holding more than one class is a double
+    booking. Checking a new row touches three slots and the report is one
+    pass over them. Roster rows without a class are ignored.
+    """
+
+    KINDS = ("teacher", "student", "room")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.classes = {}
+        self.roster = {}
+        self.slots = {kind: {} for kind in self.KINDS}
+        self.class_periods = {}
+
+    def load(self, classes=(), roster=()):
+        """
+        Replaces the index with full table contents, given as rows of
+        (idclasses, idroom) and
+        (idroster, idclass, idstudent, idteacher, class_period).
+        """
+        with self._lock:
+            self.classes = {idclass: idroom for idclass, idroom in classes}
+            self.roster = {}
+            self.slots = {kind: {} for kind in self.KINDS}
+            self.class_periods = {}
+            for row in roster:
+                self._add_roster(*row)
+
+    def set_class(self, idclasses, idroom):
+        with self._lock:
+            old = self.classes.get(idclasses)
+            periods = self.class_periods.get(idclasses, {})
+            if old is not None:
+                for period, count in periods.items():
+                    self._count("room", (old, period), idclasses, -count)
+            self.classes[idclasses] = idroom
+            if idroom is not None:
+                for period, count in periods.items():
+                    self._count("room", (idroom, period), idclasses, count)
+
+    def remove_class(self, idclasses):
+        with self._lock:
+            idroom = self.classes.pop(idclasses, None)
+            if idroom is not None:
+                for period, count in self.class_periods.get(idclasses, {}).items():
+                    self._count("room", (idroom, period), idclasses, -count)
+
+    def set_roster(self, idroster, idclass, idstudent, idteacher, period):
+        with self._lock:
+            self._remove_roster(idroster)
+            self._add_roster(idroster, idclass, idstudent, idteacher, period)
+
+    def remove_roster(self, idroster):
+        with self._lock:
+            self._remove_roster(idroster)
+
+    def check(self, idclass, idstudent, idteacher, period, ignore=None):
+        """
+        The double bookings a roster row would create, as
+        {"type", "id", "period", "classes"} with the other classes already
+        in the slot. ignore is the idroster being replaced by an update.
+        """
+        if idclass is None:
+            return []
+        with self._lock:
+            old = self.roster.get(ignore)
+            old_keys = self._keys(*old) if old is not None else {}
+            conflicts = []
+            for kind, key in self._keys(idclass, idstudent, idteacher, period).items():
+                classes = self.slots[kind].get(key, {})
+                others = sorted((c for c, count in classes.items()
+                                 if c != idclass and count - (old_keys.get(kind) == key and old[0] == c) > 0),
+                                key=class_order)
+                if others:
+                    conflicts.append({"type": kind, "id": key[0], "period": period, "classes": others})
+            return conflicts
+
+    def report(self, kinds=KINDS):
+        """
+        Every slot booked by more than one class.
+        """
+        with self._lock:
+            return [
+                {"type": kind, "id": key[0], "period": key[1], "classes": sorted(classes, key=class_order)}
+                for kind in kinds
+                for key, classes in self.slots[kind].items()
+                if len(classes) > 1
+            ]
+
+    def _keys(self, idclass, idstudent, idteacher, period):
+        keys = {}
+        if idteacher is not None:
+            keys["teacher"] = (idteacher, period)
+        if idstudent is not None:
+            keys["student"] = (idstudent, period)
+        idroom = self.classes.get(idclass)
+        if idroom is not None:
+            keys["room"] = (idroom, period)
+        return keys
+
+    def _count(self, kind, key, idclass, delta):
+        classes = self.slots[kind].setdefault(key, {})
+        count = classes.get(idclass, 0) + delta
+        if count > 0:
+            classes[idclass] = count
+        else:
+            classes.pop(idclass, None)
+            if not classes:
+                del self.slots[kind][key]
+
+    def _add_roster(self, idroster, idclass, idstudent, idteacher, period):
+        if idclass is None:
+            return
+        self.roster[idroster] = (idclass, idstudent, idteacher, period)
+        periods = self.class_periods.setdefault(idclass, {})
+        periods[period] = periods.get(period, 0) + 1
+        for kind, key in self._keys(idclass, idstudent, idteacher, period).items():
+            self._count(kind, key, idclass, 1)
+
+    def _remove_roster(self, idroster):
+        row = self.roster.pop(idroster, None)
+        if row is None:
+            return
+        idclass, period = row[0], row[3]
+        periods = self.class_periods[idclass]
+        periods[period] -= 1
+        if not periods[period]:
+            del periods[period]
+            if not periods:
+                del self.class_periods[idclass]
+        for kind, key in self._keys(*row).items():
+            self._count(kind, key, idclass, -1)
@@ -0,0 +1,127 @@
+import csv
+import io
+import zlib
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Format name: (mimetype, file extension).
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+def fetch_batches(cur, size, columns):
+    """
+    Rows of an executed (server-side) cursor as tuples, size at a time.
+    """
+    while True:
+        rows = cur.fetchmany(size)
+        if not rows:
+            return
+        yield [tuple(row[column] for column in columns) if isinstance(row, dict) else row for row in rows]
+
+def export_writer(fmt, columns):
+    """
+    The chunk generator for fmt: a function taking batches of rows and
+    yielding bytes. columns is a list of (name, kind) with kind "int",
+    "str" or "date". Raises ValueError for an unknown format and
+    RuntimeError when a columnar one is asked for without pyarrow, so
+    callers can fail before they start streaming.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {', '.join(EXPORT_FORMATS)}")
+    if fmt == "csv":
+        return lambda batches: csv_chunks(columns, batches)
+    if pyarrow is None:
+        raise RuntimeError(f"Export format '{fmt}' requires the pyarrow package")
+    return lambda batches: arrow_chunks(columns, batches, parquet=fmt == "parquet")
+
+def csv_chunks(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class ChunkSink(io.RawIOBase):
+    """
+    Write-only file that keeps what was written until drained, so a
+    pyarrow writer can be streamed out batch by batch.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def arrow_schema(columns):
+    types = {"int": pyarrow.int64(), "str": pyarrow.string(), "date": pyarrow.date32()}
+    return pyarrow.schema([(name, types[kind]) for name, kind in columns])
+
+def arrow_chunks(columns, batches, parquet=False):
+    """
+    Arrow IPC stream, or Parquet with one row group per batch.
+    """
+    schema = arrow_schema(columns)
+    sink = ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema) if parquet else pyarrow.ipc.new_stream(sink, schema)
+    closed = False
+    try:
+        for rows in batches:
+            batch = pyarrow.RecordBatch.from_arrays(
+                [pyarrow.array(values, type=field.type) for values, field in zip(zip(*rows), schema)],
+                schema=schema)
+            if parquet:
+                writer.write_table(pyarrow.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+        writer.close()
+        closed = True
+        yield sink.drain()
+    finally:
+        if not closed:
+            writer.close()
+
+def gzip_chunks(chunks, level=6):
+    """
+    Compresses a stream of bytes into one gzip member as it goes.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
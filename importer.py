@@ -0,0 +1,317 @@
+import csv
+import os
+import tempfile
+import time
+from datetime import date
+
+# Per table: primary key, then (column, required, kind, max length or
+# referenced table). kind is "text", "date" or "ref" (an id that must exist
+# in the referenced table).
+IMPORT_SPECS = {
+    "students": ("idstudents", [
+        ("firstname", True, "text", 50),
+        ("middlename", False, "text", 50),
+        ("lastname", True, "text", 50),
+        ("birthdate", True, "date", None),
+        ("gender", True, "text", 10),
+    ]),
+    "teachers": ("idteachers", [
+        ("firstname", True, "text", 50),
+        ("middlename", False, "text", 50),
+        ("lastname", True, "text", 50),
+        ("birthdate", True, "date", None),
+        ("gender", True, "text", 10),
+    ]),
+    "classes": ("idclasses", [
+        ("description", True, "text", None),
+        ("idroom", False, "ref", "rooms"),
+        ("idcourse", False, "ref", "courses"),
+    ]),
+    "roster": ("idroster", [
+        ("idclass", False, "ref", "classes"),
+        ("idstudent", False, "ref", "students"),
+        ("idteacher", False, "ref", "teachers"),
+        ("class_period", True, "text", 45),
+    ]),
+}
+
+# MySQL error codes meaning LOAD DATA LOCAL INFILE itself is unavailable
+# (disabled on the client or the server), not that the rows are bad.
+LOAD_DATA_UNAVAILABLE = {1148, 2068, 3948}
+
+# Files are imported parents first, so roster rows can point at students,
+# teachers and classes from the same import.
+IMPORT_ORDER = ["students", "teachers", "classes", "roster"]
+
+TABLE_KEYS = {
+    "students": "idstudents",
+    "teachers": "idteachers",
+    "classes": "idclasses",
+    "rooms": "idrooms",
+    "courses": "idcourses",
+    "roster": "idroster",
+}
+
+
+# Tables other rows point at. Their ids are kept in memory while importing;
+# roster ids are not, the database rejects a duplicate one itself.
+PARENT_TABLES = {target for _, columns in IMPORT_SPECS.values() for _, _, kind, target in columns if kind == "ref"}
+
+
+def referenced_tables(tables):
+    """
+    Tables whose ids have to be loaded before importing tables: the ones
+    they reference, plus any imported parent table so its duplicate ids
+    are caught early.
+    """
+    needed = set(tables) & PARENT_TABLES
+    for table in tables:
+        needed.update(target for _, _, kind, target in IMPORT_SPECS[table][1] if kind == "ref")
+    return sorted(needed)
+
+def load_ids(conn, tables, cursorclass=None):
+    """
+    Every primary key of the given tables, one set per table, read once
+    before the import starts. Pass an unbuffered cursorclass to fetch
+    them in batches instead of all at once.
+    """
+    ids = {}
+    cur = conn.cursor(cursorclass) if cursorclass else conn.cursor()
+    try:
+        for table in tables:
+            cur.execute(f"SELECT {TABLE_KEYS[table]} FROM {table}")
+            ids[table] = set()
+            while True:
+                rows = cur.fetchmany(10000)
+                if not rows:
+                    break
+                ids[table].update(row[TABLE_KEYS[table]] if isinstance(row, dict) else row[0] for row in rows)
+    finally:
+        cur.close()
+    return ids
+
+def parse_row(table, row, ids):
+    """
+    Validates one CSV row (a dict from DictReader) and returns
+    (pk or None, values in column order). Raises ValueError with the
+    reason it is rejected.
+    """
+    pk, columns = IMPORT_SPECS[table]
+    values = []
+    for column, required, kind, extra in columns:
+        value = (row.get(column) or "").strip()
+        if not value:
+            if required:
+                raise ValueError(f"'{column}' is required")
+            values.append(None)
+            continue
+        if kind == "text":
+            if extra is not None and len(value) > extra:
+                raise ValueError(f"'{column}' is longer than {extra} characters")
+        elif kind == "date":
+            try:
+                value = date.fromisoformat(value).isoformat()
+            except ValueError:
+                raise ValueError(f"'{column}' must be a YYYY-MM-DD date")
+        elif kind == "ref":
+            try:
+                value = int(value)
+            except ValueError:
+                raise ValueError(f"'{column}' must be an integer")
+            if value not in ids[extra]:
+                raise ValueError(f"'{column}' {value} does not exist in {extra}")
+        values.append(value)
+
+    key = (row.get(pk) or "").strip()
+    if not key:
+        return None, values
+    try:
+        key = int(key)
+    except ValueError:
+        raise ValueError(f"'{pk}' must be an integer")
+    if key in ids.get(table, ()):
+        raise ValueError(f"'{pk}' {key} already exists")
+    return key, values
+
+
+class CSVImport:
+    """
+    Streams one CSV file into a table: rows are validated against the
+    id sets and written chunk_size at a time, either with multi-row
+    INSERTs (executemany) or with LOAD DATA LOCAL INFILE. A chunk the
+    database rejects is retried row by row; RuntimeError is raised
+    instead when LOAD DATA itself is disabled. Only the current chunk is
+    held in memory; rejected rows go to on_reject and the first
+    max_reported of them are kept for the report.
+
+    Rows that carry their own primary key are added to the id sets, so a
+    later file in the same import can refer to them.
+
+    check, if given, takes the value lists of a validated chunk and
+    returns a list of conflicts for each row. Rows with conflicts are
+    rejected when reject_conflicts is set, and otherwise written and
+    listed under "conflicts" in the report.
+    """
+
+    def __init__(self, conn, table, ids, chunk_size=1000, load_data=False,
+                 on_reject=None, max_reported=1000, check=None, reject_conflicts=False):
+        if table not in IMPORT_SPECS:
+            raise ValueError(f"Cannot import into '{table}'")
+        self.conn = conn
+        self.table = table
+        self.ids = ids
+        self.chunk_size = chunk_size
+        self.load_data = load_data
+        self.on_reject = on_reject
+        self.max_reported = max_reported
+        self.check = check
+        self.reject_conflicts = reject_conflicts
+        self.report = {"table": table, "rows_read": 0, "rows_imported": 0, "rows_rejected": 0,
+                       "rejected": [], "rows_conflicting": 0, "conflicts": [], "seconds": 0.0}
+        self.reader = None
+
+    def start(self, stream):
+        """
+        Reads the header of stream (a text file object). Raises ValueError
+        when a required column is missing.
+        """
+        self.reader = csv.DictReader(stream)
+        columns = IMPORT_SPECS[self.table][1]
+        fieldnames = self.reader.fieldnames or []
+        missing = [column for column, required, _, _ in columns if required and column not in fieldnames]
+        if missing:
+            raise ValueError(f"{self.table} CSV header is missing {', '.join(missing)}")
+
+    def chunks(self):
+        """
+        Imports the rest of the stream, yielding the report after every
+        chunk.
+        """
+        started = time.perf_counter()
+        chunk = []
+        for row in self.reader:
+            self.report["rows_read"] += 1
+            try:
+                key, values = parse_row(self.table, row, self.ids)
+            except ValueError as e:
+                self.reject(self.reader.line_num, str(e), row)
+                continue
+            if key is not None and self.table in self.ids:
+                self.ids[self.table].add(key)
+            chunk.append((self.reader.line_num, key, values))
+            if len(chunk) >= self.chunk_size:
+                self.flush(self.check_chunk(chunk))
+                chunk = []
+                self.report["seconds"] = time.perf_counter() - started
+                yield self.report
+        if chunk:
+            self.flush(self.check_chunk(chunk))
+        self.report["seconds"] = time.perf_counter() - started
+        yield self.report
+
+    def run(self, stream):
+        """
+        Imports every row of stream and returns the report.
+        """
+        self.start(stream)
+        for _ in self.chunks():
+            pass
+        return self.report
+
+    def reject(self, line, message, row=None):
+        self.report["rows_rejected"] += 1
+        if len(self.report["rejected"]) < self.max_reported:
+            self.report["rejected"].append({"line": line, "message": message})
+        if self.on_reject is not None:
+            self.on_reject(self.table, line, message, row)
+
+    def check_chunk(self, chunk):
+        """
+        The rows of chunk that may be written, after running check.
+        """
+        if self.check is None:
+            return chunk
+        kept = []
+        for row, conflicts in zip(chunk, self.check([values for _, _, values in chunk])):
+            if conflicts and self.reject_conflicts:
+                self.reject(row[0], describe_conflicts(conflicts))
+                continue
+            if conflicts:
+                self.report["rows_conflicting"] += 1
+                if len(self.report["conflicts"]) < self.max_reported:
+                    self.report["conflicts"].append({"line": row[0], "conflicts": conflicts})
+            kept.append(row)
+        return kept
+
+    def flush(self, chunk):
+        # Rows with and without an explicit id need different column lists.
+        for with_key in (True, False):
+            rows = [(line, key, values) for line, key, values in chunk if (key is not None) == with_key]
+            if not rows:
+                continue
+            columns = self.columns(with_key)
+            params = [tuple(([key] if with_key else []) + values) for _, key, values in rows]
+            cur = self.conn.cursor()
+            try:
+                try:
+                    if self.load_data:
+                        self.load_chunk(cur, columns, params)
+                    else:
+                        cur.executemany(self.insert_query(columns), params)
+                    self.conn.commit()
+                    self.report["rows_imported"] += len(rows)
+                    continue
+                except Exception as e:
+                    self.conn.rollback()
+                    if self.load_data and e.args and e.args[0] in LOAD_DATA_UNAVAILABLE:
+                        raise RuntimeError(f"LOAD DATA LOCAL INFILE is not available: {e.args[-1]}. "
+                                           "Enable local_infile on the server and MYSQL_LOCAL_INFILE, "
+                                           "or import with INSERTs") from e
+
+                query = self.insert_query(columns)
+                for (line, key, _), values in zip(rows, params):
+                    try:
+                        cur.execute(query, values)
+                        self.report["rows_imported"] += 1
+                    except Exception as e:
+                        if key is not None and self.table in self.ids:
+                            self.ids[self.table].discard(key)
+                        self.reject(line, str(e))
+                self.conn.commit()
+            finally:
+                cur.close()
+
+    def columns(self, with_key):
+        pk, columns = IMPORT_SPECS[self.table]
+        return ([pk] if with_key else []) + [column for column, _, _, _ in columns]
+
+    def insert_query(self, columns):
+        return f"INSERT INTO {self.table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+
+    def load_chunk(self, cur, columns, params):
+        fd, path = tempfile.mkstemp(suffix=".tsv")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                for values in params:
+                    f.write("\t".join(load_data_field(value) for value in values) + "\n")
+            cur.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {self.table} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({', '.join(columns)})",
+                (path,))
+        finally:
+            os.remove(path)
+
+
+def load_data_field(value):
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+def describe_conflicts(conflicts):
+    """
+    A reject message for conflicts, dicts of {"type", "id", "period",
+    "classes"}.
+    """
+    return "double booking: " + "; ".join(
+        f"{c['type']} {c['id']} already in class {', '.join(str(idclass) for idclass in c['classes'])} "
+        f"in {c['period']}" for c in conflicts)
@@ -0,0 +1,108 @@
+import logging
+import re
+import threading
+from collections import deque
+
+slow_query_logger = logging.getLogger("roster.slow_query")
+
+WHITESPACE = re.compile(r"\s+")
+LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+\b")
+PLACEHOLDER_LISTS = re.compile(r"%s(?:\s*,\s*%s)+")
+
+
+def normalize_sql(query):
+    """
+    Collapses a statement to its shape so every call of the same query
+    lands in one bucket: whitespace folded, literals and IN lists replaced.
+    """
+    query = WHITESPACE.sub(" ", query).strip().rstrip(";")
+    query = LITERALS.sub("?", query)
+    return PLACEHOLDER_LISTS.sub("%s, ...", query)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class QueryStats:
+    """
+    Per-endpoint and per-statement timings of every query. Each bucket
+    keeps totals plus its most recent `samples` durations, from which
+    p50/p95/p99 are computed on read. Queries slower than slow_threshold
+    seconds are written to the roster.slow_query logger.
+    """
+
+    def __init__(self, enabled=True, samples=1000, slow_threshold=0.5):
+        self.enabled = enabled
+        self.samples = samples
+        self.slow_threshold = slow_threshold
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._statements = {}
+
+    def record(self, endpoint, query, seconds, rows_returned=0, rows_affected=0):
+        statement = normalize_sql(query)
+        with self._lock:
+            for buckets, key in ((self._endpoints, endpoint or "-"), (self._statements, statement)):
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = {
+                        "count": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+                        "rows_returned": 0, "rows_affected": 0,
+                        "durations": deque(maxlen=self.samples),
+                    }
+                bucket["count"] += 1
+                bucket["total_seconds"] += seconds
+                bucket["max_seconds"] = max(bucket["max_seconds"], seconds)
+                bucket["rows_returned"] += rows_returned
+                bucket["rows_affected"] += rows_affected
+                bucket["durations"].append(seconds)
+        if self.slow_threshold is not None and seconds >= self.slow_threshold:
+            slow_query_logger.warning(
+                "slow query %.3fs endpoint=%s rows_returned=%d rows_affected=%d sql=%s",
+                seconds, endpoint, rows_returned, rows_affected, statement
+            )
+
+    def summary(self):
+        with self._lock:
+            return {
+                "endpoints": {key: self._summarize(bucket) for key, bucket in self._endpoints.items()},
+                "statements": {key: self._summarize(bucket) for key, bucket in self._statements.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._statements.clear()
+
+    @staticmethod
+    def _summarize(bucket):
+        durations = bucket["durations"]
+        return {
+            "count": bucket["count"],
+            "total_seconds": bucket["total_seconds"],
+            "mean_seconds": bucket["total_seconds"] / bucket["count"],
+            "max_seconds": bucket["max_seconds"],
+            "p50_seconds": percentile(durations, 0.50),
+            "p95_seconds": percentile(durations, 0.95),
+            "p99_seconds": percentile(durations, 0.99),
+            "rows_returned": bucket["rows_returned"],
+            "rows_affected": bucket["rows_affected"],
+        }
+
+
+def create_query_stats(config):
+    """
+    Builds QueryStats from QUERY_STATS_* / SLOW_QUERY_* settings and, when
+    SLOW_QUERY_LOG names a file, points the slow query logger at it.
+    """
+    if config.get("SLOW_QUERY_LOG"):
+        handler = logging.FileHandler(config["SLOW_QUERY_LOG"])
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        slow_query_logger.addHandler(handler)
+    return QueryStats(
+        enabled=config.get("QUERY_STATS_ENABLED", True),
+        samples=config.get("QUERY_STATS_SAMPLES", 1000),
+        slow_threshold=config.get("SLOW_QUERY_THRESHOLD", 0.5),
+    )
@@ -0,0 +1,226 @@
+import json
+import os
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    """
+    Request counters, latency histograms and the in-flight gauge.
+
+    Every thread writes only to its own shard, so recording a request
+    takes no lock; shards are summed when the metrics are read, and the
+    shards of finished threads are folded into one. When a
+    directory is given, each worker process also drops a snapshot there
+    (at most every flush_interval seconds) and a scrape served by any
+    worker adds up the snapshots of all of them. Snapshots of exited
+    workers, or not rewritten for snapshot_ttl seconds, are deleted.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, directory=None, flush_interval=1.0, snapshot_ttl=300):
+        self.buckets = tuple(buckets)
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.snapshot_ttl = snapshot_ttl
+        self._local = threading.local()
+        self._shards = []
+        self._retired = new_shard()
+        self._shards_lock = threading.Lock()
+        self._flushed_at = 0.0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def request_started(self):
+        self._shard()["in_flight"] += 1
+
+    def request_finished(self, method, route, status, seconds):
+        shard = self._shard()
+        shard["in_flight"] -= 1
+        key = (method, route, str(status))
+        shard["requests"][key] = shard["requests"].get(key, 0) + 1
+
+        key = (method, route)
+        histogram = shard["latency"].get(key)
+        if histogram is None:
+            histogram = shard["latency"][key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                histogram["buckets"][i] += 1
+                break
+        else:
+            histogram["buckets"][-1] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+
+    def snapshot(self, gauges=None):
+        """
+        This process' totals as a JSON-friendly dict.
+        """
+        total = new_shard()
+        with self._shards_lock:
+            self._fold_finished_threads()
+            merge_shard(total, self._retired)
+            for _, shard in self._shards:
+                merge_shard(total, shard)
+        return {
+            "pid": os.getpid(),
+            "requests": {"\t".join(key): count for key, count in total["requests"].items()},
+            "latency": {"\t".join(key): histogram for key, histogram in total["latency"].items()},
+            "in_flight": total["in_flight"],
+            "gauges": dict(gauges or {}),
+        }
+
+    def flush(self, gauges=None, force=False):
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._flushed_at < self.flush_interval:
+            return
+        self._flushed_at = now
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(gauges), f)
+        os.replace(tmp, path)
+
+    def collect(self, gauges=None):
+        """
+        Totals across every worker: this process' live numbers plus the
+        latest snapshot of every other running process. Gauges are kept
+        per process, as {name: {pid: value}}. Snapshots of exited workers,
+        and ones older than snapshot_ttl (their PID may have been reused),
+        are deleted rather than counted.
+        """
+        snapshots = [self.snapshot(gauges)]
+        if self.directory:
+            now = time.time()
+            for name in os.listdir(self.directory):
+                if not (name.startswith("metrics-") and name.endswith(".json")):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    with open(path) as f:
+                        snapshot = json.load(f)
+                    modified = os.path.getmtime(path)
+                except (OSError, ValueError):
+                    continue
+                if snapshot["pid"] == os.getpid():
+                    continue
+                if not pid_alive(snapshot["pid"]) or now - modified > self.snapshot_ttl:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                snapshots.append(snapshot)
+
+        total = {"requests": {}, "latency": {}, "in_flight": 0, "gauges": {}}
+        for snapshot in snapshots:
+            total["in_flight"] += snapshot["in_flight"]
+            for key, count in snapshot["requests"].items():
+                total["requests"][key] = total["requests"].get(key, 0) + count
+            for key, histogram in snapshot["latency"].items():
+                if key not in total["latency"]:
+                    total["latency"][key] = {"buckets": [0] * len(histogram["buckets"]), "sum": 0.0, "count": 0}
+                merge_histogram(total["latency"][key], histogram)
+            for name, value in snapshot["gauges"].items():
+                total["gauges"].setdefault(name, {})[snapshot["pid"]] = value
+        return total
+
+    def render(self, gauges=None):
+        """
+        Prometheus text exposition format.
+        """
+        total = self.collect(gauges)
+        lines = [
+            "# HELP roster_http_requests_total HTTP requests by route and status.",
+            "# TYPE roster_http_requests_total counter",
+        ]
+        for key, count in sorted(total["requests"].items()):
+            method, route, status = key.split("\t")
+            lines.append(f"roster_http_requests_total{labels(method=method, route=route, status=status)} {count}")
+
+        lines += [
+            "# HELP roster_http_request_duration_seconds HTTP request latency.",
+            "# TYPE roster_http_request_duration_seconds histogram",
+        ]
+        for key, histogram in sorted(total["latency"].items()):
+            method, route = key.split("\t")
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), histogram["buckets"]):
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                lines.append(f"roster_http_request_duration_seconds_bucket{labels(method=method, route=route, le=le)} {cumulative}")
+            lines.append(f"roster_http_request_duration_seconds_sum{labels(method=method, route=route)} {histogram['sum']}")
+            lines.append(f"roster_http_request_duration_seconds_count{labels(method=method, route=route)} {histogram['count']}")
+
+        lines += [
+            "# HELP roster_http_requests_in_flight HTTP requests being served.",
+            "# TYPE roster_http_requests_in_flight gauge",
+            f"roster_http_requests_in_flight {total['in_flight']}",
+        ]
+        for name, values in sorted(total["gauges"].items()):
+            lines.append(f"# TYPE roster_{name} gauge")
+            for pid, value in sorted(values.items()):
+                lines.append(f"roster_{name}{labels(pid=pid)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = new_shard()
+            with self._shards_lock:
+                self._fold_finished_threads()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _fold_finished_threads(self):
+        # Must be called with _shards_lock held. A finished thread no
+        # longer writes to its shard, so it can be merged safely.
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                merge_shard(self._retired, shard)
+        self._shards = alive
+
+
+def new_shard():
+    return {"requests": {}, "latency": {}, "in_flight": 0}
+
+
+def merge_shard(into, shard):
+    into["in_flight"] += shard["in_flight"]
+    for key, count in list(shard["requests"].items()):
+        into["requests"][key] = into["requests"].get(key, 0) + count
+    for key, histogram in list(shard["latency"].items()):
+        if key not in into["latency"]:
+            into["latency"][key] = {"buckets": [0] * len(histogram["buckets"]), "sum": 0.0, "count": 0}
+        merge_histogram(into["latency"][key], histogram)
+
+
+def merge_histogram(into, histogram):
+    into["buckets"] = [a + b for a, b in zip(into["buckets"], histogram["buckets"])]
+    into["sum"] += histogram["sum"]
+    into["count"] += histogram["count"]
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def labels(**values):
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in values.items()) + "}"
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,264 @@
+import importlib.util
+import os
+import re
+import time
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.(sql|py)$")
+
+# MySQL error codes worth retrying a DDL statement for: lock wait timeout
+# and deadlock.
+RETRY_ERRORS = {1205, 1213}
+
+TRACKING_TABLES = [
+    """CREATE TABLE IF NOT EXISTS schema_migrations (
+      version int(11) NOT NULL,
+      name varchar(255) NOT NULL,
+      applied_at datetime NOT NULL,
+      seconds double NOT NULL,
+      PRIMARY KEY (version)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8""",
+    """CREATE TABLE IF NOT EXISTS schema_migration_steps (
+      version int(11) NOT NULL,
+      step int(11) NOT NULL,
+      last_key bigint(20) DEFAULT NULL,
+      done tinyint(1) NOT NULL DEFAULT 0,
+      PRIMARY KEY (version, step)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8""",
+]
+
+
+def split_statements(sql):
+    """
+    Splits a mysqldump file or SQL migration into statements (every
+    statement ends a line with ';'). Comment lines between statements
+    are dropped.
+    """
+    statement = []
+    for line in sql.splitlines():
+        if not statement and (not line.strip() or line.startswith("--")):
+            continue
+        statement.append(line)
+        if line.rstrip().endswith(";"):
+            yield "\n".join(statement)
+            statement = []
+
+def discover(directory=MIGRATIONS_DIR):
+    """
+    (version, name, path) of every NNNN_name.sql / NNNN_name.py file in
+    directory, by version. Raises ValueError when two share a version.
+    """
+    migrations = {}
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if match is None:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Migrations {migrations[version][1]} and {filename} share version {version}")
+        migrations[version] = (version, filename, os.path.join(directory, filename))
+    return [migrations[version] for version in sorted(migrations)]
+
+def replica_lag(conn):
+    """
+    Seconds the replica behind conn is behind its source, or None when
+    conn is not replicating (or the SQL thread is stopped).
+    """
+    cur = conn.cursor()
+    try:
+        try:
+            cur.execute("SHOW REPLICA STATUS")
+        except Exception:
+            cur.execute("SHOW SLAVE STATUS")
+        row = cur.fetchone()
+        if row is None:
+            return None
+        if not isinstance(row, dict):
+            row = dict(zip([column[0] for column in cur.description], row))
+        lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+        return None if lag is None else float(lag)
+    finally:
+        cur.close()
+
+
+class MigrationRunner:
+    """
+    Applies the migrations in directory that schema_migrations does not
+    list yet, in version order. A .sql file is run statement by
+    statement; a .py file defines upgrade(migration) and calls
+    migration.execute() and migration.backfill() on this runner.
+
+    Every statement and backfill is a numbered step of its migration and
+    is checkpointed in schema_migration_steps as it completes (a backfill
+    after every batch), so a migration that fails or is stopped resumes
+    where it left off. Steps must therefore run in the same order every
+    time.
+
+    Backfills walk the table in primary key ranges of batch_size rows,
+    one short transaction each, sleeping sleep seconds in between and
+    waiting while replica (an optional connection to a replica) is more
+    than max_lag seconds behind. DDL waits at most lock_wait_timeout
+    seconds for its metadata lock, so it never queues the application's
+    queries behind it for long, and is retried ddl_retries times.
+    """
+
+    def __init__(self, conn, directory=MIGRATIONS_DIR, batch_size=1000, sleep=0.0, replica=None,
+                 max_lag=1.0, lock_wait_timeout=5, ddl_retries=3, log=None):
+        self.conn = conn
+        self.directory = directory
+        self.batch_size = batch_size
+        self.sleep = sleep
+        self.replica = replica
+        self.max_lag = max_lag
+        self.lock_wait_timeout = lock_wait_timeout
+        self.ddl_retries = ddl_retries
+        self.log = log or (lambda message: None)
+        self.version = None
+        self.step = 0
+
+    def prepare(self):
+        for query in TRACKING_TABLES:
+            self._run(query)
+        self._run("SET SESSION lock_wait_timeout = %s", (self.lock_wait_timeout,))
+        self.conn.commit()
+
+    def status(self):
+        """
+        (version, filename, applied_at or None) for every migration file.
+        """
+        self.prepare()
+        applied = dict(self._run("SELECT version, applied_at FROM schema_migrations"))
+        return [(version, filename, applied.get(version)) for version, filename, _ in discover(self.directory)]
+
+    def pending(self):
+        return [(version, filename) for version, filename, applied_at in self.status() if applied_at is None]
+
+    def run(self, target=None):
+        """
+        Applies every pending migration up to and including target, and
+        returns their versions. Raises RuntimeError when another runner
+        holds the migration lock.
+        """
+        self.prepare()
+        if self._run("SELECT GET_LOCK('schema_migrations', 0)")[0][0] != 1:
+            raise RuntimeError("Another migration run is in progress")
+        try:
+            applied = []
+            paths = {version: path for version, _, path in discover(self.directory)}
+            for version, filename in self.pending():
+                if target is not None and version > target:
+                    break
+                self.apply(version, filename, paths[version])
+                applied.append(version)
+            return applied
+        finally:
+            self._run("SELECT RELEASE_LOCK('schema_migrations')")
+
+    def apply(self, version, filename, path):
+        self.version, self.step = version, 0
+        started = time.perf_counter()
+        self.log(f"{filename}: applying")
+        if path.endswith(".sql"):
+            with open(path, encoding="utf-8") as f:
+                for statement in split_statements(f.read()):
+                    self.execute(statement)
+        else:
+            spec = importlib.util.spec_from_file_location(f"migration_{version}", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            module.upgrade(self)
+        seconds = time.perf_counter() - started
+        self._run("INSERT INTO schema_migrations (version, name, applied_at, seconds) VALUES (%s, %s, NOW(), %s)",
+                  (version, filename, seconds))
+        self._run("DELETE FROM schema_migration_steps WHERE version = %s", (version,))
+        self.conn.commit()
+        self.log(f"{filename}: done in {seconds:.1f}s")
+
+    def execute(self, query, args=None):
+        """
+        Runs one statement as the next step, unless an earlier run
+        already completed it.
+        """
+        self.step += 1
+        if self._step_state()[1]:
+            return
+        for attempt in range(self.ddl_retries + 1):
+            try:
+                self._run(query, args)
+                break
+            except Exception as e:
+                self.conn.rollback()
+                if attempt == self.ddl_retries or not e.args or e.args[0] not in RETRY_ERRORS:
+                    raise
+                self.log(f"step {self.step}: {e.args[-1]}, retrying")
+                time.sleep(2 ** attempt)
+        self._save_step(None, True)
+        self.conn.commit()
+
+    def backfill(self, table, pk, query, batch_size=None):
+        """
+        Runs query (an UPDATE or INSERT ... SELECT with two placeholders,
+        for pk > %s AND pk <= %s) over the rows that exist now, batch_size
+        keys at a time. Returns the rows affected by this run. Rows
+        written after it starts are the application's job.
+        """
+        self.step += 1
+        last_key, done = self._step_state()
+        if done:
+            return 0
+        batch_size = batch_size or self.batch_size
+        end = self._run(f"SELECT MAX({pk}) FROM {table}")[0][0]
+        if last_key is None:
+            first = self._run(f"SELECT MIN({pk}) FROM {table}")[0][0]
+            last_key = None if first is None else first - 1
+        affected = 0
+        while end is not None and last_key < end:
+            upper = self._run(f"SELECT {pk} FROM {table} WHERE {pk} > %s ORDER BY {pk} LIMIT 1 OFFSET %s",
+                              (last_key, batch_size - 1))
+            upper = min(upper[0][0], end) if upper else end
+            cur = self.conn.cursor()
+            try:
+                cur.execute(query, (last_key, upper))
+                affected += cur.rowcount
+            finally:
+                cur.close()
+            last_key = upper
+            # The checkpoint commits with the batch it describes.
+            self._save_step(last_key, False)
+            self.conn.commit()
+            self.log(f"{table}: backfilled up to {pk} {last_key} of {end}")
+            self.throttle()
+        self._save_step(last_key, True)
+        self.conn.commit()
+        return affected
+
+    def throttle(self):
+        if self.sleep:
+            time.sleep(self.sleep)
+        if self.replica is None:
+            return
+        while True:
+            lag = replica_lag(self.replica)
+            if lag is None or lag <= self.max_lag:
+                return
+            self.log(f"replica {lag:.0f}s behind, waiting")
+            time.sleep(min(lag, 5))
+
+    def _step_state(self):
+        rows = self._run("SELECT last_key, done FROM schema_migration_steps WHERE version = %s AND step = %s",
+                         (self.version, self.step))
+        return (rows[0][0], bool(rows[0][1])) if rows else (None, False)
+
+    def _save_step(self, last_key, done):
+        self._run("""INSERT INTO schema_migration_steps (version, step, last_key, done) VALUES (%s, %s, %s, %s)
+                     ON DUPLICATE KEY UPDATE last_key=VALUES(last_key), done=VALUES(done)""",
+                  (self.version, self.step, last_key, done))
+
+    def _run(self, query, args=None):
+        cur = self.conn.cursor()
+        try:
+            cur.execute(query, args)
+            rows = cur.fetchall()
+            return [tuple(row.values()) if isinstance(row, dict) else row for row in rows or ()]
+        finally:
+            cur.close()
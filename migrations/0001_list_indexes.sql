@@ -0,0 +1,18 @@
+-- Indexes matching the app's query shapes. InnoDB secondary indexes end
+-- with the primary key, so (firstname) already orders firstname, idstudents
+-- the way the keyset pagination of the list pages reads it.
+-- Every statement builds in place without blocking writes.
+
+-- /students, /teachers, /rooms and /courses: ORDER BY <name>, <pk> LIMIT n
+ALTER TABLE students ADD INDEX idx_students_firstname (firstname), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE teachers ADD INDEX idx_teachers_firstname (firstname), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE rooms ADD INDEX idx_rooms_location (location), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE courses ADD INDEX idx_courses_name (name), ALGORITHM=INPLACE, LOCK=NONE;
+
+-- /api/students?lastname=...&sort=-birthdate
+ALTER TABLE students ADD INDEX idx_students_lastname_birthdate (lastname, birthdate), ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Class student lists join roster on idclass and then students on
+-- idstudent; (idclass, idstudent) covers that join and replaces the
+-- single-column foreign key index.
+ALTER TABLE roster ADD INDEX idx_roster_class_student (idclass, idstudent), DROP INDEX fk_roster_classes1_idx, ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,304 @@
+import threading
+import time
+from collections import deque
+from flask import current_app, g
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections.
+
+    Connections are handed out LIFO so the warm ones get reused and the
+    rest age out after idle_timeout. Every connection is retired after
+    max_lifetime seconds and, when ping is on, health-checked on checkout.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, idle_timeout=300,
+                 max_lifetime=3600, timeout=10, ping=True):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Invalid pool size")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.ping = ping
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._born = {}
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+        self._counters = {
+            "checkouts": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "health_check_failures": 0,
+            "timeouts": 0,
+        }
+
+    def fill(self):
+        """
+        Opens connections until min_size is reached.
+        """
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn = self._new_connection()
+            self.release(conn)
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = self._checkout(deadline)
+            if conn is None:
+                conn = self._new_connection()
+            elif not self._healthy(conn):
+                self._discard(conn)
+                continue
+            with self._cond:
+                self._counters["checkouts"] += 1
+            return conn
+
+    def release(self, conn, discard=False):
+        if discard or self._closed or self._expired(conn, time.monotonic()):
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._counters)
+            stats.update({
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiting": self._waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            })
+        return stats
+
+    def _checkout(self, deadline):
+        """
+        Returns an idle connection, or None once a slot for a new one has
+        been reserved.
+        """
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Pool is closed")
+                expired = self._prune(time.monotonic())
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters["timeouts"] += 1
+                    raise PoolTimeout(f"No connection available within {self.timeout}s")
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+        for stale in expired:
+            self._close(stale)
+        return conn
+
+    def _prune(self, now):
+        """
+        Drops idle connections past idle_timeout (down to min_size) or past
+        max_lifetime. Must be called with the lock held; the caller closes
+        the returned connections outside of it.
+        """
+        expired = []
+        kept = deque()
+        for conn, idle_since in self._idle:
+            too_idle = now - idle_since > self.idle_timeout and self._size - len(expired) > self.min_size
+            if too_idle or self._expired(conn, now):
+                expired.append(conn)
+            else:
+                kept.append((conn, idle_since))
+        if expired:
+            self._idle = kept
+            self._size -= len(expired)
+            self._cond.notify(len(expired))
+        return expired
+
+    def _expired(self, conn, now):
+        born = self._born.get(id(conn))
+        return born is not None and now - born > self.max_lifetime
+
+    def _healthy(self, conn):
+        if not self.ping:
+            return True
+        try:
+            conn.ping()
+            return True
+        except Exception:
+            with self._cond:
+                self._counters["health_check_failures"] += 1
+            return False
+
+    def _new_connection(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._born[id(conn)] = time.monotonic()
+            self._counters["connections_created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        self._close(conn)
+
+    def _close(self, conn):
+        with self._cond:
+            self._born.pop(id(conn), None)
+            self._counters["connections_closed"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def mysql_connector(config):
+    """
+    A function opening a new MySQLdb connection from the MYSQL_* settings
+    in config (a Flask config or any mapping with the same keys).
+    """
+    import MySQLdb
+    import MySQLdb.cursors
+
+    kwargs = {
+        "host": config["MYSQL_HOST"],
+        "port": config["MYSQL_PORT"],
+        "connect_timeout": config["MYSQL_CONNECT_TIMEOUT"],
+        "charset": config["MYSQL_CHARSET"],
+    }
+    if config["MYSQL_USER"]:
+        kwargs["user"] = config["MYSQL_USER"]
+    if config["MYSQL_PASSWORD"]:
+        kwargs["passwd"] = config["MYSQL_PASSWORD"]
+    if config["MYSQL_DB"]:
+        kwargs["db"] = config["MYSQL_DB"]
+    if config["MYSQL_UNIX_SOCKET"]:
+        kwargs["unix_socket"] = config["MYSQL_UNIX_SOCKET"]
+    if config["MYSQL_CURSORCLASS"]:
+        kwargs["cursorclass"] = getattr(MySQLdb.cursors, config["MYSQL_CURSORCLASS"])
+    if config["MYSQL_LOCAL_INFILE"]:
+        kwargs["local_infile"] = 1
+
+    def connect():
+        return MySQLdb.connect(**kwargs)
+    return connect
+
+
+class MySQLPool:
+    """
+    Drop-in replacement for flask_mysqldb.MySQL: mysql.connection is
+    borrowed from a shared ConnectionPool for the life of the app context
+    and handed back (rolled back, so no transaction leaks) at teardown.
+    """
+
+    def __init__(self, app=None, connect=None):
+        self._connect = connect
+        self._pool = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("MYSQL_HOST", "localhost")
+        app.config.setdefault("MYSQL_USER", None)
+        app.config.setdefault("MYSQL_PASSWORD", None)
+        app.config.setdefault("MYSQL_DB", None)
+        app.config.setdefault("MYSQL_PORT", 3306)
+        app.config.setdefault("MYSQL_UNIX_SOCKET", None)
+        app.config.setdefault("MYSQL_CONNECT_TIMEOUT", 10)
+        app.config.setdefault("MYSQL_CHARSET", "utf8")
+        app.config.setdefault("MYSQL_CURSORCLASS", None)
+        app.config.setdefault("MYSQL_LOCAL_INFILE", False)
+        app.config.setdefault("MYSQL_POOL_MIN_SIZE", 1)
+        app.config.setdefault("MYSQL_POOL_MAX_SIZE", 10)
+        app.config.setdefault("MYSQL_POOL_IDLE_TIMEOUT", 300)
+        app.config.setdefault("MYSQL_POOL_MAX_LIFETIME", 3600)
+        app.config.setdefault("MYSQL_POOL_TIMEOUT", 10)
+        app.config.setdefault("MYSQL_POOL_PING", True)
+        app.teardown_appcontext(self.teardown)
+        app.extensions["mysql"] = self
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    config = current_app.config
+                    self._pool = ConnectionPool(
+                        self._connect or mysql_connector(config),
+                        min_size=config["MYSQL_POOL_MIN_SIZE"],
+                        max_size=config["MYSQL_POOL_MAX_SIZE"],
+                        idle_timeout=config["MYSQL_POOL_IDLE_TIMEOUT"],
+                        max_lifetime=config["MYSQL_POOL_MAX_LIFETIME"],
+                        timeout=config["MYSQL_POOL_TIMEOUT"],
+                        ping=config["MYSQL_POOL_PING"],
+                    )
+                    # Pre-warm MYSQL_POOL_MIN_SIZE connections. If the database
+                    # is unreachable, acquire() raises the error to the caller.
+                    try:
+                        self._pool.fill()
+                    except Exception:
+                        current_app.logger.warning("Could not open the minimum pool connections", exc_info=True)
+        return self._pool
+
+    @property
+    def connection(self):
+        if "mysql_db" not in g:
+            g.mysql_db = self.pool.acquire()
+        return g.mysql_db
+
+    def stats(self):
+        if self._pool is None:
+            return {}
+        return self._pool.stats()
+
+    def teardown(self, exception):
+        conn = g.pop("mysql_db", None)
+        if conn is None:
+            return
+        try:
+            conn.rollback()
+        except Exception:
+            self._pool.release(conn, discard=True)
+            return
+        self._pool.release(conn)
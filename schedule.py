@@ -0,0 +1,130 @@
+import threading
+
+
+class ScheduleSummary:
+    """
+    Precomputed form of the home page query: for every class the distinct
+    (period, course, teacher, room) it meets in. Roster rows are only
+    reference-counted per (class, period, teacher), so the rendered list
+    depends on the number of distinct groups, not on the roster size, and
+    a single roster or lookup write is applied without rescanning.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.classes = {}
+        self.rooms = {}
+        self.courses = {}
+        self.teachers = {}
+        self.roster = {}
+        self.groups = {}
+        self._rows = None
+
+    def load(self, classes=(), rooms=(), courses=(), teachers=(), roster=()):
+        """
+        Replaces the summary with full table contents, given as rows of
+        (idclasses, description, idroom, idcourse), (idrooms, location),
+        (idcourses, name), (idteachers, name) and
+        (idroster, idclass, idteacher, class_period).
+        """
+        with self._lock:
+            self.classes = {row[0]: (row[1], row[2], row[3]) for row in classes}
+            self.rooms = {row[0]: row[1] for row in rooms}
+            self.courses = {row[0]: row[1] for row in courses}
+            self.teachers = {row[0]: row[1] for row in teachers}
+            self.roster, self.groups = {}, {}
+            for idroster, idclass, idteacher, period in roster:
+                self._add_roster(idroster, idclass, idteacher, period)
+            self._rows = None
+
+    def set_class(self, idclasses, description, idroom, idcourse):
+        with self._lock:
+            self.classes[idclasses] = (description, idroom, idcourse)
+            self._rows = None
+
+    def remove_class(self, idclasses):
+        with self._lock:
+            self.classes.pop(idclasses, None)
+            self._rows = None
+
+    def set_room(self, idrooms, location):
+        with self._lock:
+            self.rooms[idrooms] = location
+            self._rows = None
+
+    def remove_room(self, idrooms):
+        with self._lock:
+            self.rooms.pop(idrooms, None)
+            self._rows = None
+
+    def set_course(self, idcourses, name):
+        with self._lock:
+            self.courses[idcourses] = name
+            self._rows = None
+
+    def remove_course(self, idcourses):
+        with self._lock:
+            self.courses.pop(idcourses, None)
+            self._rows = None
+
+    def set_teacher(self, idteachers, name):
+        with self._lock:
+            self.teachers[idteachers] = name
+            self._rows = None
+
+    def remove_teacher(self, idteachers):
+        with self._lock:
+            self.teachers.pop(idteachers, None)
+            self._rows = None
+
+    def set_roster(self, idroster, idclass, idteacher, period):
+        with self._lock:
+            self._remove_roster(idroster)
+            self._add_roster(idroster, idclass, idteacher, period)
+
+    def remove_roster(self, idroster):
+        with self._lock:
+            self._remove_roster(idroster)
+
+    def rows(self):
+        """
+        Same rows and order as the home page query.
+        """
+        with self._lock:
+            if self._rows is None:
+                self._rows = self._build_rows()
+            return self._rows
+
+    def _add_roster(self, idroster, idclass, idteacher, period):
+        group = (idclass, period, idteacher)
+        self.roster[idroster] = group
+        count = self.groups.get(group, 0)
+        self.groups[group] = count + 1
+        if not count:
+            self._rows = None
+
+    def _remove_roster(self, idroster):
+        group = self.roster.pop(idroster, None)
+        if group is None:
+            return
+        self.groups[group] -= 1
+        if not self.groups[group]:
+            del self.groups[group]
+            self._rows = None
+
+    def _build_rows(self):
+        # Mirrors the INNER JOINs (rows with a missing class, room, course
+        # or teacher drop out) and the GROUP BY on the displayed values.
+        seen = set()
+        for idclass, period, idteacher in self.groups:
+            cls = self.classes.get(idclass)
+            if cls is None:
+                continue
+            description, idroom, idcourse = cls
+            if idroom not in self.rooms or idcourse not in self.courses or idteacher not in self.teachers:
+                continue
+            seen.add((description, period, self.courses[idcourse], self.teachers[idteacher], self.rooms[idroom]))
+        return [
+            {"class": description, "period": period, "course": course, "teacher": teacher, "room": room}
+            for description, period, course, teacher, room in sorted(seen)
+        ]
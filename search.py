@@ -0,0 +1,199 @@
+import bisect
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# Tokens sharing the most trigrams with a mistyped term that are checked
+# for edit distance. Bounds the cost of a fuzzy lookup.
+FUZZY_CANDIDATES = 50
+# Fuzzy expansions remembered per term until the set of tokens changes.
+FUZZY_CACHE_SIZE = 1024
+
+
+def normalize(text):
+    """
+    Lower-cased, accent-free form of text, with apostrophes dropped so
+    "O'Brien" is one token.
+    """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return text.casefold().replace("'", "").replace("’", "")
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(normalize(text))
+
+def trigrams(token):
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def prefix_distance(term, token, limit):
+    """
+    Smallest optimal string alignment distance (adjacent swaps count as
+    one edit) between term and any prefix of token, or limit + 1 as soon
+    as it must exceed limit.
+    """
+    token = token[:len(term) + limit]
+    previous, current = None, list(range(len(token) + 1))
+    for i in range(1, len(term) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(token)
+        for j in range(1, len(token) + 1):
+            cost = term[i - 1] != token[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if cost and i > 1 and j > 1 and term[i - 1] == token[j - 2] and term[i - 2] == token[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return min(current)
+
+
+class PeopleIndex:
+    """
+    In-memory name index for type-ahead search. Every distinct name token
+    is kept in a sorted list, so the tokens starting with a prefix are one
+    bisect away, and in a trigram index for typo-tolerant matches. People
+    are keyed on (kind, id) and updated one at a time as writes commit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.people = {}
+        self.postings = {}
+        self.tokens = []
+        self.trigrams = {}
+        self._fuzzy_cache = OrderedDict()
+
+    def load(self, people):
+        """
+        Replaces the index with people, rows of
+        (kind, id, firstname, middlename, lastname).
+        """
+        with self._lock:
+            self.people, self.postings, self.trigrams = {}, {}, {}
+            self._fuzzy_cache.clear()
+            for kind, key, *names in people:
+                self._add((kind, key), names, insort=False)
+            self.tokens = sorted(self.postings)
+
+    def set(self, kind, key, firstname, middlename, lastname):
+        with self._lock:
+            self._remove((kind, key))
+            self._add((kind, key), [firstname, middlename, lastname])
+
+    def remove(self, kind, key):
+        with self._lock:
+            self._remove((kind, key))
+
+    def __len__(self):
+        return len(self.people)
+
+    def search(self, query, limit=10, kinds=None):
+        """
+        Up to limit people matching every term of query, each term as a
+        name prefix. Exact tokens rank first, then prefixes in
+        alphabetical order. When that finds fewer than limit people, terms
+        of three or more characters also match names within one or two
+        typos.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            seen = set()
+            results = self._match([self._prefixed(term) for term in terms], limit, kinds, seen)
+            if len(results) < limit:
+                matches = [self._prefixed(term) + self._fuzzy(term) for term in terms]
+                results += self._match(matches, limit - len(results), kinds, seen)
+            return [dict(self.people[key]["record"]) for key in results]
+
+    def _add(self, key, names, insort=True):
+        firstname, middlename, lastname = names
+        tokens = set()
+        for name in names:
+            tokens.update(tokenize(name))
+        self.people[key] = {
+            "tokens": tokens,
+            "record": {"type": key[0], "id": key[1], "firstname": firstname,
+                       "middlename": middlename, "lastname": lastname},
+        }
+        for token in tokens:
+            keys = self.postings.get(token)
+            if keys is None:
+                keys = self.postings[token] = set()
+                self._fuzzy_cache.clear()
+                if insort:
+                    bisect.insort(self.tokens, token)
+                for trigram in trigrams(token):
+                    self.trigrams.setdefault(trigram, set()).add(token)
+            keys.add(key)
+
+    def _remove(self, key):
+        person = self.people.pop(key, None)
+        if person is None:
+            return
+        for token in person["tokens"]:
+            keys = self.postings[token]
+            keys.discard(key)
+            if keys:
+                continue
+            del self.postings[token]
+            self._fuzzy_cache.clear()
+            del self.tokens[bisect.bisect_left(self.tokens, token)]
+            for trigram in trigrams(token):
+                self.trigrams[trigram].discard(token)
+                if not self.trigrams[trigram]:
+                    del self.trigrams[trigram]
+
+    def _prefixed(self, term):
+        start = bisect.bisect_left(self.tokens, term)
+        end = bisect.bisect_left(self.tokens, term + "\U0010ffff", start)
+        return self.tokens[start:end]
+
+    def _fuzzy(self, term):
+        if len(term) < 3:
+            return []
+        found = self._fuzzy_cache.get(term)
+        if found is None:
+            found = self._fuzzy_cache[term] = self._fuzzy_tokens(term)
+            if len(self._fuzzy_cache) > FUZZY_CACHE_SIZE:
+                self._fuzzy_cache.popitem(last=False)
+        else:
+            self._fuzzy_cache.move_to_end(term)
+        return found
+
+    def _fuzzy_tokens(self, term):
+        limit = 1 if len(term) < 6 else 2
+        # Each edit breaks at most three of the term's trigrams, and the
+        # last one (with the end padding) is lost against a longer token.
+        needed = max(1, len(term) - 1 - 3 * limit)
+        shared = Counter()
+        for trigram in trigrams(term):
+            shared.update(self.trigrams.get(trigram, ()))
+        candidates = [token for token, count in shared.most_common(2 * FUZZY_CANDIDATES)
+                      if count >= needed and not token.startswith(term)]
+        found = []
+        for token in candidates[:FUZZY_CANDIDATES]:
+            distance = prefix_distance(term, token, limit)
+            if distance <= limit:
+                found.append((distance, token))
+        return [token for _, token in sorted(found)]
+
+    def _match(self, matches, limit, kinds, seen):
+        # Walk the people of the most selective term in token order and
+        # keep the ones every other term matches too.
+        driver = min(range(len(matches)), key=lambda i: len(matches[i]))
+        others = [set(tokens) for i, tokens in enumerate(matches) if i != driver]
+        results = []
+        for token in matches[driver]:
+            for key in sorted(self.postings[token]):
+                if key in seen or (kinds and key[0] not in kinds):
+                    continue
+                tokens = self.people[key]["tokens"]
+                if all(not tokens.isdisjoint(other) for other in others):
+                    seen.add(key)
+                    results.append(key)
+                    if len(results) >= limit:
+                        return results
+        return results
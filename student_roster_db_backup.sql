@@ -184,6 +184,28 @@ LOCK TABLES `teachers` WRITE;
 INSERT INTO `teachers` VALUES (1,'Anne','Marie','Baker','1980-01-15','Female'),(2,'John','Andrew','Doe','1982-03-22','Male'),(3,'Karen','Elizabeth','White','1975-07-30','Female'),(4,'Michael','David','Black','1990-11-18','Male'),(5,'Susan','Grace','Green','1985-05-27','Female'),(6,'Robert','James','Brown','1978-09-12','Male'),(7,'Emily','Rose','Adams','1987-04-05','Female'),(8,'William','Thomas','Carter','1983-06-14','Male'),(9,'Jessica','Lynn','Evans','1976-10-25','Female'),(10,'Thomas','Daniel','Turner','1992-08-30','Male'),(11,'Rachel','Claire','Taylor','1981-12-19','Female'),(12,'Chris','Edward','Hughes','1974-02-10','Male'),(13,'Olivia','Sophia','Scott','1995-03-09','Female'),(14,'Andrew','Nicholas','Morris','1989-07-21','Male'),(15,'Natalie','Alice','Hall','1977-11-16','Female'),(16,'James','Alexander','Allen','1984-01-02','Male'),(17,'Victoria','Grace','Wright','1973-09-18','Female'),(18,'Peter','Samuel','King','1991-05-13','Male'),(19,'Sarah','Marie','Hill','1988-06-25','Female'),(20,'Kevin','Patrick','Moore','1979-10-07','Male'),(21,'Lucy','Ella','Parker','1986-12-03','Female'),(22,'Mark','Logan','Harris','1980-04-28','Male'),(23,'Chloe','Faith','Ward','1975-08-15','Female'),(24,'Ryan','Jacob','Reed','1993-02-07','Male'),(25,'Mia','Isabelle','Bennett','1982-09-30','Female');
 /*!40000 ALTER TABLE `teachers` ENABLE KEYS */;
 UNLOCK TABLES;
+--
+-- Table structure for table `users`
+--
+
+DROP TABLE IF EXISTS `users`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `users` (
+  `idusers` int(11) NOT NULL AUTO_INCREMENT,
+  `username` varchar(100) NOT NULL,
+  `password_hash` varchar(255) NOT NULL,
+  `role` varchar(20) NOT NULL,
+  `idteacher` int(11) DEFAULT NULL,
+  `idstudent` int(11) DEFAULT NULL,
+  PRIMARY KEY (`idusers`),
+  UNIQUE KEY `username_UNIQUE` (`username`),
+  KEY `fk_users_teachers1_idx` (`idteacher`),
+  KEY `fk_users_students1_idx` (`idstudent`),
+  CONSTRAINT `fk_users_students1` FOREIGN KEY (`idstudent`) REFERENCES `students` (`idstudents`) ON DELETE CASCADE ON UPDATE NO ACTION,
+  CONSTRAINT `fk_users_teachers1` FOREIGN KEY (`idteacher`) REFERENCES `teachers` (`idteachers`) ON DELETE CASCADE ON UPDATE NO ACTION
+) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_general_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
 
 /*!40101 SET SQL_MODE=@OLD_SQL_MODE */;
@@ -0,0 +1,89 @@
+from unittest.mock import MagicMock
+from advisor import ACCEPTED, LIST_SHAPES, advise, collect_queries, explainable, list_queries, problems
+
+SOURCE = '''
+LOOKUP_QUERY = """SELECT id FROM things WHERE name = %s"""
+ALL_QUERY = "SELECT id, name FROM things"
+
+def get_things():
+    query = """SELECT * FROM things"""
+    results, next_cursor = paginate_template(query, [("name", "name"), ("id", "id")])
+
+def find_thing():
+    return execute_template("SELECT * FROM things WHERE id IN ({})", 1)
+'''
+
+
+def test_collect_queries_builds_page_shapes_and_skips_bulk_reads():
+    queries = collect_queries(SOURCE)
+
+    assert queries == [
+        ("LOOKUP_QUERY", "SELECT id FROM things WHERE name = %s"),
+        ("get_things", "SELECT * FROM things ORDER BY name, id LIMIT %s"),
+        ("get_things", "SELECT * FROM things WHERE ((name > %s) OR (name = %s AND id > %s)) ORDER BY name, id LIMIT %s"),
+        ("find_thing", "SELECT * FROM things WHERE id IN ({})"),
+    ]
+
+def test_list_queries_cover_api_filters_and_sorts():
+    queries = list_queries([("students", "lastname=Smith&sort=-birthdate"), ("rooms", "")])
+
+    assert queries == [
+        ("/api/students?lastname=Smith&sort=-birthdate",
+         "SELECT * FROM students WHERE lastname = %s ORDER BY birthdate DESC, idstudents LIMIT %s"),
+        ("/api/students?lastname=Smith&sort=-birthdate",
+         "SELECT * FROM students WHERE lastname = %s AND ((birthdate < %s) OR (birthdate = %s AND idstudents > %s)) "
+         "ORDER BY birthdate DESC, idstudents LIMIT %s"),
+        ("/api/rooms", "SELECT * FROM rooms ORDER BY idrooms LIMIT %s"),
+        ("/api/rooms", "SELECT * FROM rooms WHERE idrooms > %s ORDER BY idrooms LIMIT %s"),
+    ]
+    assert ("students", "lastname=Smith&sort=-birthdate") in LIST_SHAPES
+    assert len(list_queries()) == 2 * len(LIST_SHAPES)
+
+def test_explainable_fills_placeholders():
+    assert explainable("SELECT * FROM t WHERE a > %s AND b IN ({}) LIMIT %s") == \
+        "SELECT * FROM t WHERE a > '1' AND b IN ('1') LIMIT 51"
+
+def test_problems_reports_scans_and_sorts_above_min_rows():
+    plan = [
+        {"table": "students", "type": "ALL", "rows": 100000, "extra": "Using where; Using filesort"},
+        {"table": "roster", "type": "ref", "rows": 20, "extra": "Using temporary"},
+    ]
+
+    assert problems(plan) == [
+        ("students", "full scan", "full scan of students (~100000 rows)"),
+        ("students", "filesort", "filesort on students (~100000 rows)"),
+    ]
+    assert [message for _, _, message in problems(plan, min_rows=1)] == [
+        "full scan of students (~100000 rows)", "filesort on students (~100000 rows)",
+        "temporary table on roster (~20 rows)",
+    ]
+
+def test_advise_counts_unaccepted_findings(capsys):
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.description = [("id",), ("table",), ("type",), ("rows",), ("Extra",)]
+    cursor.fetchall.return_value = [(1, "classes", "ALL", 5000, "Using filesort")]
+
+    cursor.fetchall.return_value = [(1, "classes", "ref", 5000, "Using filesort")]
+    accepted = next(iter(ACCEPTED))[0]
+
+    failed = advise(conn, [("get_things", "SELECT 1 LIMIT %s"), (accepted, "SELECT 2 LIMIT %s")])
+
+    assert failed == 1
+    assert cursor.execute.call_args_list[0][0][0] == "EXPLAIN SELECT 1 LIMIT 51"
+    out = capsys.readouterr().out
+    assert "filesort on classes" in out
+    assert accepted not in out
+
+def test_accepted_finding_does_not_hide_others(capsys):
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.description = [("id",), ("table",), ("type",), ("rows",), ("Extra",)]
+    cursor.fetchall.return_value = [(1, "classes", "ALL", 5000, "Using filesort")]
+
+    failed = advise(conn, [("get_classes", "SELECT 2 LIMIT %s")])
+
+    assert failed == 1
+    out = capsys.readouterr().out
+    assert "full scan of classes" in out
+    assert "filesort on classes" not in out
@@ -1,8 +1,14 @@
+import base64
+import gzip
+import io
+import json
 import pytest
+import threading
+import time
 from unittest.mock import patch, MagicMock
 from flask import Flask
 from flask_jwt_extended import create_access_token
-from app import app
+from app import app, conflict_state, index_refresher, query_stats, response_cache, schedule_state, schedule_sync, search_state, timetable_state
 
 @pytest.fixture
 def client():
@@ -12,6 +18,8 @@ def client():
     app.config['MYSQL_PASSWORD'] = 'mock_password'
     app.config['MYSQL_DB'] = 'mock_db'
     app.config['JWT_SECRET_KEY'] = "auth_key_1001"  
+    app.config['ROSTER_CONFLICTS'] = 'off'
+    response_cache.clear()
 
     with patch('app.mysql') as mock_mysql:
         mock_connection = MagicMock()
@@ -800,4 +808,1327 @@ def test_get_roster_html(client):
     with patch('app.execute_template', return_value=[]):
         response = client.get('/roster')
         assert response.status_code == 200
-        
\ No newline at end of file
+        
+# Test for pagination
+@patch('app.mysql.connection')
+def test_get_roster_api_next_cursor(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [
+        {'idroster': 1, 'idclass': 1, 'idstudent': 1, 'idteacher': 1, 'class_period': 'Morning'},
+        {'idroster': 2, 'idclass': 1, 'idstudent': 2, 'idteacher': 1, 'class_period': 'Morning'},
+        {'idroster': 3, 'idclass': 2, 'idstudent': 3, 'idteacher': 2, 'class_period': 'Afternoon'}
+    ]
+
+    response = client.get('/api/roster?limit=2')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [row['idroster'] for row in data] == [1, 2]
+    cursor = response.headers['X-Next-Cursor']
+    assert 'rel="next"' in response.headers['Link']
+
+    query, params = mock_cursor.execute.call_args[0]
+    assert 'ORDER BY idroster LIMIT %s' in query
+    assert params == (3,)
+
+    client.get(f'/api/roster?limit=2&cursor={cursor}')
+    query, params = mock_cursor.execute.call_args[0]
+    assert 'WHERE idroster > %s' in query
+    assert params == (2, 3)
+
+@patch('app.mysql.connection')
+def test_get_roster_api_last_page(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [
+        {'idroster': 1, 'idclass': 1, 'idstudent': 1, 'idteacher': 1, 'class_period': 'Morning'}
+    ]
+
+    response = client.get('/api/roster?limit=2')
+
+    assert response.status_code == 200
+    assert 'X-Next-Cursor' not in response.headers
+
+def test_get_roster_api_invalid_limit(client):
+    response = client.get('/api/roster?limit=abc')
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == "400 Bad Request: 'limit' must be an integer"
+
+def test_get_roster_api_invalid_cursor(client):
+    response = client.get('/api/roster?cursor=!!!')
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == "400 Bad Request: Invalid cursor"
+
+@patch('app.mysql.connection')
+def test_get_rooms_api_max_page_size(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [{'idrooms': 1, 'location': 'A', 'description': None}]
+
+    client.get('/api/rooms?limit=1000000')
+
+    query, params = mock_cursor.execute.call_args[0]
+    assert params == (app.config['API_MAX_PAGE_SIZE'] + 1,)
+
+# Test for NDJSON streaming
+@patch('app.mysql.connection')
+def test_get_students_api_ndjson(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.description = (('idstudents',), ('firstname',), ('lastname',))
+    mock_cursor.fetchmany.side_effect = [
+        [(1, 'John', 'Doe'), (2, 'Jane', 'Smith')],
+        [(3, 'Mark', 'Lee')],
+        []
+    ]
+
+    token = generate_token('admin')
+    response = client.get('/api/students?format=ndjson', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)['idstudents'] for line in lines] == [1, 2, 3]
+    assert json.loads(lines[0]) == {'idstudents': 1, 'firstname': 'John', 'lastname': 'Doe'}
+    mock_cursor.execute.assert_called_once_with('SELECT * FROM students ORDER BY idstudents', ())
+    mock_cursor.close.assert_called_once()
+
+@patch('app.mysql.connection')
+def test_get_roster_api_ndjson_accept_header(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.description = (('idroster',), ('class_period',))
+    mock_cursor.fetchmany.side_effect = [[(5, 'Morning')], []]
+
+    response = client.get('/api/roster?limit=5000', headers={'Accept': 'application/x-ndjson'})
+
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == '{"class_period":"Morning","idroster":5}\n'
+    mock_cursor.execute.assert_called_once_with('SELECT * FROM roster ORDER BY idroster LIMIT %s', (5000,))
+
+@patch('app.mysql.connection')
+def test_get_roster_api_ndjson_database_error(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.execute.side_effect = Exception('connection lost')
+
+    response = client.get('/api/roster?format=ndjson')
+
+    assert response.status_code == 500
+    assert response.get_json()['error'] == 'Database error'
+
+# Test for connection pool stats
+def test_get_pool_stats(client):
+    with patch('app.mysql.stats', return_value={'size': 2, 'idle': 1, 'in_use': 1}):
+        token = generate_token('admin')
+        response = client.get('/api/pool', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 200
+    assert response.get_json()['in_use'] == 1
+
+def test_get_pool_stats_forbidden(client):
+    token = generate_token('teacher')
+    response = client.get('/api/pool', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 403
+
+# Test for bulk inserts
+@patch('app.mysql.connection')
+def test_add_students_bulk(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 2
+
+    token = generate_token('admin')
+    response = client.post(
+        '/api/students',
+        json=[
+            {'firstname': 'Jane', 'lastname': 'Smith', 'birthdate': '1999-12-31', 'gender': 'F'},
+            {'firstname': 'John', 'middlename': 'K', 'lastname': 'Doe', 'birthdate': '2000-01-01', 'gender': 'M'}
+        ],
+        headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data['rows_affected'] == 2
+    assert data['errors'] == []
+    query, rows = mock_cursor.executemany.call_args[0]
+    assert rows == [
+        ('Jane', None, 'Smith', '1999-12-31', 'F'),
+        ('John', 'K', 'Doe', '2000-01-01', 'M')
+    ]
+    mock_connection.commit.assert_called_once()
+
+@patch('app.mysql.connection')
+def test_add_roster_bulk_chunks(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 2
+    app.config['BULK_CHUNK_SIZE'] = 2
+
+    token = generate_token('admin')
+    try:
+        response = client.post(
+            '/api/roster',
+            json=[{'idclass': 1, 'idstudent': i, 'idteacher': 1, 'class_period': 'Morning'} for i in range(4)],
+            headers={'Authorization': f'Bearer {token}'}
+        )
+    finally:
+        app.config['BULK_CHUNK_SIZE'] = 1000
+
+    assert response.status_code == 201
+    assert response.get_json()['rows_affected'] == 4
+    assert mock_cursor.executemany.call_count == 2
+    assert mock_connection.commit.call_count == 2
+
+@patch('app.mysql.connection')
+def test_add_teachers_bulk_invalid_rows(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+
+    token = generate_token('admin')
+    response = client.post(
+        '/api/teachers',
+        json=[
+            {'firstname': 'Roy', 'lastname': 'Smith', 'birthdate': '1980-01-01', 'gender': 'Male'},
+            {'firstname': 'Ann', 'lastname': 'Lee'},
+            'not a row'
+        ],
+        headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [
+        {'index': 1, 'message': "'birthdate' is required"},
+        {'index': 2, 'message': 'Row must be a JSON object'}
+    ]
+    mock_cursor.executemany.assert_not_called()
+
+@patch('app.mysql.connection')
+def test_add_roster_bulk_partial_failure(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 1
+    mock_cursor.executemany.side_effect = Exception('foreign key constraint fails')
+    mock_cursor.execute.side_effect = [None, Exception('foreign key constraint fails')]
+
+    token = generate_token('admin')
+    response = client.post(
+        '/api/roster',
+        json=[
+            {'idclass': 1, 'idstudent': 1, 'idteacher': 1, 'class_period': 'Morning'},
+            {'idclass': 99, 'idstudent': 1, 'idteacher': 1, 'class_period': 'Morning'}
+        ],
+        headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == 207
+    data = response.get_json()
+    assert data['rows_affected'] == 1
+    assert data['errors'] == [{'index': 1, 'message': 'foreign key constraint fails'}]
+    mock_connection.rollback.assert_called_once()
+
+# Test for response cache
+@patch('app.mysql.connection')
+def test_get_rooms_api_cached(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [{'idrooms': 1, 'location': 'Building A', 'description': None}]
+
+    first = client.get('/api/rooms?limit=10')
+    second = client.get('/api/rooms?limit=10')
+
+    assert first.status_code == second.status_code == 200
+    assert second.get_json() == first.get_json()
+    assert second.headers['Content-Type'] == 'application/json'
+    assert mock_cursor.execute.call_count == 1
+
+    client.get('/api/rooms?limit=20')
+    assert mock_cursor.execute.call_count == 2
+
+@patch('app.mysql.connection')
+def test_room_write_invalidates_cache(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 1
+    mock_cursor.fetchall.return_value = [{'idrooms': 1, 'location': 'Building A', 'description': None}]
+    client.get('/api/rooms')
+
+    token = generate_token('admin')
+    client.put('/api/rooms/1', json={'location': 'Building B'}, headers={'Authorization': f'Bearer {token}'})
+    mock_cursor.fetchall.return_value = [{'idrooms': 1, 'location': 'Building B', 'description': None}]
+    response = client.get('/api/rooms')
+
+    assert response.get_json()[0]['location'] == 'Building B'
+
+@patch('app.mysql.connection')
+def test_course_write_keeps_rooms_cached(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 1
+    mock_cursor.fetchall.return_value = [{'idrooms': 1, 'location': 'Building A', 'description': None}]
+    client.get('/api/rooms')
+
+    token = generate_token('admin')
+    client.delete('/api/courses/1', headers={'Authorization': f'Bearer {token}'})
+    client.get('/api/rooms')
+
+    assert mock_cursor.fetchall.call_count == 1
+
+def test_get_cache_stats(client):
+    token = generate_token('admin')
+    response = client.get('/api/cache', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 200
+    assert response.get_json()['backend'] == 'memory'
+
+# Test for conditional GET
+@patch('app.mysql.connection')
+def test_get_roster_api_etag_not_modified(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [
+        {'idroster': 1, 'idclass': 1, 'idstudent': 1, 'idteacher': 1, 'class_period': 'Morning'}
+    ]
+
+    first = client.get('/api/roster')
+    etag = first.headers['ETag']
+    assert 'Last-Modified' in first.headers
+
+    second = client.get('/api/roster', headers={'If-None-Match': etag})
+
+    assert second.status_code == 304
+    assert second.headers['ETag'] == etag
+    assert second.data == b''
+    assert mock_cursor.execute.call_count == 1
+
+@patch('app.mysql.connection')
+def test_roster_write_changes_etag(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 1
+    mock_cursor.fetchall.return_value = [
+        {'idroster': 1, 'idclass': 1, 'idstudent': 1, 'idteacher': 1, 'class_period': 'Morning'}
+    ]
+    etag = client.get('/api/roster').headers['ETag']
+
+    token = generate_token('admin')
+    client.delete('/api/roster/1', headers={'Authorization': f'Bearer {token}'})
+    response = client.get('/api/roster', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+@patch('app.mysql.connection')
+def test_get_students_api_no_data_has_no_etag(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = []
+
+    token = generate_token('admin')
+    response = client.get('/api/students', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+
+# Test for filtering, sorting and projection
+@patch('app.mysql.connection')
+def test_get_students_api_filters(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [{'idstudents': 1, 'lastname': 'Smith'}]
+
+    token = generate_token('admin')
+    response = client.get(
+        '/api/students?fields=idstudents,lastname&gender=Female&lastname__startswith=Sm_',
+        headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == 200
+    query, params = mock_cursor.execute.call_args[0]
+    assert query == (
+        'SELECT idstudents, lastname FROM students WHERE gender = %s AND lastname LIKE %s '
+        'ORDER BY idstudents LIMIT %s'
+    )
+    assert params == ('Female', 'Sm\\_%', 101)
+
+@patch('app.mysql.connection')
+def test_get_students_api_sort_cursor(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [
+        {'idstudents': 4, 'firstname': 'Ann', 'lastname': 'Young'},
+        {'idstudents': 2, 'firstname': 'Bob', 'lastname': 'Smith'}
+    ]
+
+    token = generate_token('admin')
+    response = client.get(
+        '/api/students?fields=firstname&sort=-lastname&limit=1',
+        headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.get_json() == [{'firstname': 'Ann'}]
+    query, params = mock_cursor.execute.call_args[0]
+    assert query == (
+        'SELECT firstname, lastname, idstudents FROM students '
+        'ORDER BY lastname DESC, idstudents LIMIT %s'
+    )
+
+    cursor = response.headers['X-Next-Cursor']
+    client.get(
+        f'/api/students?fields=firstname&sort=-lastname&limit=1&cursor={cursor}',
+        headers={'Authorization': f'Bearer {token}'}
+    )
+    query, params = mock_cursor.execute.call_args[0]
+    assert 'WHERE ((lastname < %s) OR (lastname = %s AND idstudents > %s))' in query
+    assert params == ('Young', 'Young', 4, 2)
+
+@patch('app.mysql.connection')
+def test_get_roster_api_in_filter(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [{'idroster': 1}]
+
+    client.get('/api/roster?idclass__in=1,2,3')
+
+    query, params = mock_cursor.execute.call_args[0]
+    assert 'WHERE idclass IN (%s, %s, %s)' in query
+    assert params == ('1', '2', '3', 101)
+
+def test_get_roster_api_unknown_filter(client):
+    response = client.get('/api/roster?password=x')
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == "400 Bad Request: Unknown filter 'password'"
+
+def test_get_rooms_api_unknown_field(client):
+    response = client.get('/api/rooms?fields=idrooms,secret')
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == "400 Bad Request: Unknown field 'secret'"
+
+@pytest.mark.parametrize('fields', [',', '', ' , '])
+def test_get_rooms_api_empty_fields(client, fields):
+    response = client.get(f'/api/rooms?fields={fields}')
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == "400 Bad Request: 'fields' needs at least one field"
+
+@patch('app.mysql.connection')
+def test_get_rooms_api_ignores_underscore_params(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [{'idrooms': 1, 'location': 'A', 'description': 'Lab'}]
+
+    response = client.get('/api/rooms?_=1718000000000&location=A',
+                          headers={'Authorization': f'Bearer {generate_token("admin")}'})
+
+    assert response.status_code == 200
+    assert mock_cursor.execute.call_args[0][1] == ('A', 101)
+
+def test_get_roster_api_unsortable_column(client):
+    response = client.get('/api/roster?sort=idclass')
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == "400 Bad Request: Cannot sort by 'idclass'"
+
+def test_get_roster_api_cursor_sort_mismatch(client):
+    response = client.get('/api/roster?sort=class_period&cursor=MQ')
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == "400 Bad Request: Invalid cursor"
+
+@pytest.mark.parametrize('value', [{"a": 1}, [1, [2]], None, True])
+def test_get_roster_api_cursor_values_must_be_scalars(client, value):
+    cursor = base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+    response = client.get(f'/api/roster?cursor={cursor}')
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == "400 Bad Request: Invalid cursor"
+
+# Test for class students
+CLASS_STUDENT_ROWS = [
+    {'idclasses': 1, 'class description': 'Algebra basics class', 'idstudents': 1, 'student': 'Alice Johnson'},
+    {'idclasses': 1, 'class description': 'Algebra basics class', 'idstudents': 2, 'student': 'Brian Smith'},
+    {'idclasses': 3, 'class description': 'Introductory biology', 'idstudents': None, 'student': None}
+]
+
+def test_get_classes_students_api(client):
+    with patch('app.execute_template', return_value=CLASS_STUDENT_ROWS) as mock_execute:
+        token = generate_token('teacher')
+        response = client.get('/api/classes/students?ids=3,1,1,7', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 200
+    assert response.get_json() == [
+        {'idclasses': 3, 'description': 'Introductory biology', 'students': []},
+        {'idclasses': 1, 'description': 'Algebra basics class', 'students': [
+            {'idstudents': 1, 'student': 'Alice Johnson'},
+            {'idstudents': 2, 'student': 'Brian Smith'}
+        ]}
+    ]
+    mock_execute.assert_called_once()
+    assert mock_execute.call_args[0][1:] == (3, 1, 7)
+    assert 'IN (%s, %s, %s)' in mock_execute.call_args[0][0]
+
+def test_get_class_students_api(client):
+    with patch('app.execute_template', return_value=CLASS_STUDENT_ROWS[:2]):
+        token = generate_token('admin')
+        response = client.get('/api/classes/1/students', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 200
+    assert len(response.get_json()['students']) == 2
+
+def test_get_class_students_api_not_found(client):
+    with patch('app.execute_template', return_value=[]):
+        token = generate_token('admin')
+        response = client.get('/api/classes/99/students', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 404
+
+def test_get_classes_students_api_invalid_ids(client):
+    token = generate_token('admin')
+    response = client.get('/api/classes/students?ids=1,x', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 400
+
+def test_get_class_html_single_query(client):
+    with patch('app.execute_template', return_value=CLASS_STUDENT_ROWS[:2]) as mock_execute:
+        response = client.get('/classes/1')
+
+    assert response.status_code == 200
+    assert b'Students in Algebra basics class' in response.data
+    assert b'Brian Smith' in response.data
+    mock_execute.assert_called_once()
+
+def test_get_class_html_empty_class(client):
+    with patch('app.execute_template', return_value=CLASS_STUDENT_ROWS[2:]):
+        response = client.get('/classes/3')
+
+    assert b'No students in this class' in response.data
+
+# Test for the home page schedule summary
+SCHEDULE_TABLES = {
+    'FROM classes': [{'idclasses': 1, 'description': 'Algebra basics class', 'idroom': 1, 'idcourse': 1}],
+    'FROM rooms': [{'idrooms': 1, 'location': 'Building A, Room 101'}],
+    'FROM courses': [{'idcourses': 1, 'name': 'Mathematics 101'}],
+    'FROM teachers': [{'idteachers': 1, 'name': 'Anne Baker'}, {'idteachers': 2, 'name': 'John Doe'}],
+    'FROM roster': [{'idroster': 1, 'idclass': 1, 'idteacher': 1, 'class_period': 'Morning'}],
+}
+
+def fake_schedule_query(query, *args):
+    for table, rows in SCHEDULE_TABLES.items():
+        if table in query:
+            if args:
+                # A key, or (for "pk > %s") the highest key already loaded.
+                key = args[0] + 1 if '> %s' in query else args[0]
+                return [{'idroster': key, 'idclass': 1, 'idteacher': 2, 'class_period': 'Evening'}]
+            return rows
+
+@pytest.fixture
+def fresh_schedule():
+    schedule_state['loaded'] = False
+    yield
+    schedule_state['loaded'] = False
+
+def test_home_renders_from_summary(client, fresh_schedule):
+    with patch('app.execute_template', side_effect=fake_schedule_query) as mock_execute:
+        first = client.get('/')
+        second = client.get('/')
+
+    assert first.status_code == second.status_code == 200
+    assert b'Anne Baker' in second.data
+    assert mock_execute.call_count == 5
+
+@patch('app.mysql.connection')
+def test_roster_write_updates_summary_incrementally(mock_connection, client, fresh_schedule):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 1
+    mock_cursor.lastrowid = 2
+
+    token = generate_token('admin')
+    with patch('app.execute_template', side_effect=fake_schedule_query) as mock_execute:
+        client.get('/')
+        client.post(
+            '/api/roster',
+            json={'idclass': 1, 'idstudent': 1, 'idteacher': 2, 'class_period': 'Evening'},
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        response = client.get('/')
+
+    assert b'John Doe' in response.data
+    assert b'Evening' in response.data
+    assert mock_execute.call_count == 6
+    assert mock_execute.call_args_list[5][0][1:] == (2,)
+
+@patch('app.mysql.connection')
+def test_bulk_write_updates_summary_incrementally(mock_connection, client, fresh_schedule):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 1
+
+    token = generate_token('admin')
+    with patch('app.execute_template', side_effect=fake_schedule_query) as mock_execute:
+        client.get('/')
+        client.post(
+            '/api/roster',
+            json=[{'idclass': 1, 'idstudent': 1, 'idteacher': 2, 'class_period': 'Evening'}],
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        response = client.get('/')
+
+    assert b'Anne Baker' in response.data and b'John Doe' in response.data
+    assert mock_execute.call_count == 6
+    assert mock_execute.call_args_list[5][0] == ("SELECT idroster, idclass, idteacher, class_period FROM roster WHERE idroster > %s", 1)
+
+def test_concurrent_home_requests_rebuild_summary_once(client, fresh_schedule):
+    def slow_query(query, *args):
+        time.sleep(0.02)
+        return fake_schedule_query(query, *args)
+
+    statuses = []
+    def get_home():
+        statuses.append(app.test_client().get('/').status_code)
+
+    with patch('app.execute_template', side_effect=slow_query) as mock_execute:
+        threads = [threading.Thread(target=get_home) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert statuses == [200] * 4
+    assert mock_execute.call_count == 5
+
+def test_stale_summary_rebuilt_in_background(client, fresh_schedule):
+    with patch('app.execute_template', side_effect=fake_schedule_query) as mock_execute, \
+            patch.object(index_refresher, 'thread', object()), patch.object(index_refresher, 'wakeup') as mock_wakeup, \
+            patch.object(index_refresher, 'indexes', [schedule_sync]):
+        client.get('/')
+        schedule_state['loaded_at'] = 0
+        response = client.get('/')
+        assert response.status_code == 200
+        assert b'Anne Baker' in response.data
+        assert mock_execute.call_count == 5
+        mock_wakeup.set.assert_called_once()
+
+        index_refresher.refresh_stale()
+        assert mock_execute.call_count == 10
+        assert schedule_state['loaded_at'] > 0
+
+# Test for the rendered page cache
+STUDENT_PAGE_ROWS = [
+    {'idstudents': 1, 'firstname': 'Alice', 'middlename': 'May', 'lastname': 'Johnson', 'birthdate': '2005-03-21', 'gender': 'Female'}
+]
+
+def test_get_students_html_cached(client):
+    with patch('app.execute_template', return_value=STUDENT_PAGE_ROWS) as mock_execute:
+        first = client.get('/students')
+        second = client.get('/students')
+
+    assert first.status_code == second.status_code == 200
+    assert second.data == first.data
+    assert b'Johnson' in second.data
+    assert second.mimetype == 'text/html'
+    assert mock_execute.call_count == 1
+
+def test_get_students_html_gzip(client):
+    with patch('app.execute_template', return_value=STUDENT_PAGE_ROWS):
+        plain = client.get('/students')
+        compressed = client.get('/students', headers={'Accept-Encoding': 'gzip'})
+
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.data) == plain.data
+
+@patch('app.mysql.connection')
+def test_student_write_invalidates_page(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 1
+
+    token = generate_token('admin')
+    with patch('app.execute_template', return_value=STUDENT_PAGE_ROWS) as mock_execute:
+        client.get('/students')
+        client.delete('/api/students/1', headers={'Authorization': f'Bearer {token}'})
+        client.get('/students')
+
+    assert mock_execute.call_count == 2
+
+@patch('app.mysql.connection')
+def test_unrelated_write_keeps_page(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 1
+
+    token = generate_token('admin')
+    with patch('app.execute_template', return_value=STUDENT_PAGE_ROWS) as mock_execute:
+        client.get('/students')
+        client.delete('/api/rooms/1', headers={'Authorization': f'Bearer {token}'})
+        client.get('/students')
+
+    assert mock_execute.call_count == 1
+
+# Test for paginated list pages
+ROSTER_PAGE_ROWS = [
+    {'idroster': i, 'idclass': 1, 'idstudent': i, 'idteacher': 1, 'class_period': 'Morning',
+     'teacher': 'Anne Baker', 'student': f'Student {i}', 'description': 'Algebra basics class'}
+    for i in range(1, 4)
+]
+
+def test_get_roster_html_paginated(client):
+    with patch('app.execute_template', return_value=ROSTER_PAGE_ROWS) as mock_execute:
+        response = client.get('/roster?limit=2')
+
+    assert response.status_code == 200
+    assert b'Student 2' in response.data
+    assert b'Student 3' not in response.data
+    assert b'Next page' in response.data
+    assert b'Load more' in response.data
+    query = mock_execute.call_args[0][0]
+    assert query.endswith('ORDER BY idroster LIMIT %s')
+    assert mock_execute.call_args[0][1:] == (3,)
+
+def test_get_students_html_next_page(client):
+    with patch('app.execute_template', return_value=STUDENT_PAGE_ROWS) as mock_execute:
+        cursor = app.json.dumps(['Alice', 1])
+        response = client.get(f'/students?cursor={base64.urlsafe_b64encode(cursor.encode()).decode()}')
+
+    assert response.status_code == 200
+    assert b'First page' in response.data
+    assert b'Next page' not in response.data
+    query = mock_execute.call_args[0][0]
+    assert 'WHERE ((firstname > %s) OR (firstname = %s AND idstudents > %s)) ORDER BY firstname, idstudents' in query
+    assert mock_execute.call_args[0][1:] == ('Alice', 'Alice', 1, app.config['PAGE_SIZE'] + 1)
+
+def test_get_roster_html_load_more(client):
+    with patch('app.execute_template', return_value=ROSTER_PAGE_ROWS):
+        response = client.get('/roster?limit=2&format=json')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['html'].count('<tr') == 2
+    assert '<html' not in data['html']
+    assert data['next']
+
+# Test for query instrumentation
+@patch('app.mysql.connection')
+def test_get_query_stats(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [{'idroster': 1}]
+    query_stats.reset()
+
+    client.get('/api/roster')
+    token = generate_token('admin')
+    response = client.get('/api/query-stats', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['endpoints']['get_roster_api']['count'] == 1
+    assert data['endpoints']['get_roster_api']['rows_returned'] == 1
+    assert 'SELECT * FROM roster ORDER BY idroster LIMIT %s' in data['statements']
+
+def test_get_query_stats_forbidden(client):
+    token = generate_token('teacher')
+    response = client.get('/api/query-stats', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 403
+
+@patch('app.mysql.connection')
+def test_query_stats_disabled(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [{'idroster': 1}]
+    query_stats.reset()
+    query_stats.enabled = False
+    try:
+        client.get('/api/roster')
+    finally:
+        query_stats.enabled = True
+
+    assert query_stats.summary()['endpoints'] == {}
+
+# Test for request metrics
+def metric_value(body, prefix):
+    for line in body.splitlines():
+        if line.startswith(prefix + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0
+
+def test_metrics_count_requests_by_route_and_status(client):
+    forbidden = 'roster_http_requests_total{method="GET",route="/api/pool",status="403"}'
+    missing = 'roster_http_requests_total{method="GET",route="<unmatched>",status="404"}'
+    before = client.get('/metrics').get_data(as_text=True)
+
+    token = generate_token('teacher')
+    client.get('/api/pool', headers={'Authorization': f'Bearer {token}'})
+    client.get('/no-such-page')
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert metric_value(body, forbidden) == metric_value(before, forbidden) + 1
+    assert metric_value(body, missing) == metric_value(before, missing) + 1
+    assert 'roster_http_request_duration_seconds_bucket{method="GET",route="/api/pool",le="+Inf"}' in body
+    assert 'roster_http_requests_in_flight 1' in body
+
+@patch('app.mysql.connection')
+def test_metrics_count_database_errors(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.execute.side_effect = Exception('Database error')
+    failed = 'roster_http_requests_total{method="GET",route="/api/roster",status="500"}'
+    before = client.get('/metrics').get_data(as_text=True)
+
+    client.get('/api/roster')
+    body = client.get('/metrics').get_data(as_text=True)
+
+    assert metric_value(body, failed) == metric_value(before, failed) + 1
+
+# Test for CSV import
+def import_cursor(mock_connection, ids):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.fetchmany.side_effect = [batch for table_ids in ids for batch in ([(i,) for i in table_ids], [])]
+    return mock_cursor
+
+@patch('app.mysql.connection')
+def test_import_csv(mock_connection, client):
+    # Ids are loaded for classes, students and teachers, in that order.
+    mock_cursor = import_cursor(mock_connection, [[1], [1, 2], [1]])
+    roster = b"idclass,idstudent,idteacher,class_period\n1,1,1,Morning\n1,2,1,Evening\n1,3,1,Morning\n"
+
+    token = generate_token('admin')
+    response = client.post(
+        '/api/import',
+        data={'roster': (io.BytesIO(roster), 'roster.csv')},
+        headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == 207
+    data = response.get_json()
+    assert data['rows_imported'] == 2
+    assert data['rows_rejected'] == 1
+    assert data['files'][0]['rejected'] == [{'line': 4, 'message': "'idstudent' 3 does not exist in students"}]
+    query, rows = mock_cursor.executemany.call_args[0]
+    assert rows == [(1, 1, 1, 'Morning'), (1, 2, 1, 'Evening')]
+
+@patch('app.mysql.connection')
+def test_import_csv_parents_first_with_progress(mock_connection, client):
+    import_cursor(mock_connection, [[1], [1], [1]])
+    students = b"idstudents,firstname,lastname,birthdate,gender\n5,Jane,Smith,2001-01-01,F\n"
+    roster = b"idclass,idstudent,idteacher,class_period\n1,5,1,Morning\n"
+
+    token = generate_token('admin')
+    response = client.post(
+        '/api/import?format=ndjson',
+        data={'roster': (io.BytesIO(roster), 'roster.csv'), 'students': (io.BytesIO(students), 'students.csv')},
+        headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    reports = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(r['table'], r['rows_imported'], r['rows_rejected']) for r in reports] == [('students', 1, 0), ('roster', 1, 0)]
+
+@patch('app.mysql.connection')
+def test_import_csv_rejects_bad_uploads(mock_connection, client):
+    import_cursor(mock_connection, [[], [], []])
+    token = generate_token('admin')
+
+    response = client.post('/api/import', data={'parents': (io.BytesIO(b"a\n"), 'p.csv')},
+                           headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 400
+    response = client.post('/api/import', data={'roster': (io.BytesIO(b"idclass\n1\n"), 'roster.csv')},
+                           headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 400
+    assert 'missing class_period' in response.get_json()['message']
+    response = client.post('/api/import', headers={'Authorization': f'Bearer {generate_token("teacher")}'})
+    assert response.status_code == 403
+
+@patch('app.mysql')
+def test_import_csv_command(mock_mysql, tmp_path):
+    mock_cursor = import_cursor(mock_mysql.connection, [[1], [1], [1]])
+    roster = tmp_path / 'roster.csv'
+    roster.write_text("idclass,idstudent,idteacher,class_period\n1,1,1,Morning\n1,1,1,\n")
+    rejects = tmp_path / 'rejects.csv'
+
+    result = app.test_cli_runner().invoke(args=['import-csv', '--roster', str(roster), '--rejects', str(rejects)])
+
+    assert result.exit_code == 0
+    assert 'roster: 2 read, 1 imported, 1 rejected' in result.output
+    assert rejects.read_text().splitlines() == ['table,line,message', "roster,3,'class_period' is required"]
+    mock_cursor.executemany.assert_called_once()
+
+    with patch.dict(app.config, {'MYSQL_LOCAL_INFILE': False}):
+        result = app.test_cli_runner().invoke(args=['import-csv', '--roster', str(roster), '--load-data'])
+    assert result.exit_code != 0
+    assert 'needs MYSQL_LOCAL_INFILE' in result.output
+
+# Test for roster export
+ROSTER_EXPORT_ROWS = [
+    (1, 1, 1, 1, 'Morning', 'Ann Lee', 'Jane Smith', 'Algebra'),
+    (2, 1, 2, 1, 'Morning', 'Ann Lee', 'John Doe', 'Algebra'),
+]
+
+def export_cursor(mock_connection):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.fetchmany.side_effect = [ROSTER_EXPORT_ROWS[:1], ROSTER_EXPORT_ROWS[1:], []]
+    return mock_cursor
+
+@patch('app.mysql.connection')
+def test_export_roster_csv(mock_connection, client):
+    mock_cursor = export_cursor(mock_connection)
+
+    token = generate_token('admin')
+    response = client.get('/api/export/roster', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="roster.csv"'
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == 'idroster,idclass,idstudent,idteacher,class_period,teacher,student,description'
+    assert lines[2] == '2,1,2,1,Morning,Ann Lee,John Doe,Algebra'
+    query, args = mock_cursor.execute.call_args[0]
+    assert query.endswith('ORDER BY idroster')
+    mock_cursor.close.assert_called_once()
+
+@patch('app.mysql.connection')
+def test_export_class_list_gzip(mock_connection, client):
+    mock_cursor = export_cursor(mock_connection)
+
+    token = generate_token('admin')
+    response = client.get('/api/export/roster?idclass=1&compress=gzip', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="class-1.csv.gz"'
+    assert gzip.decompress(response.data).decode().count('\r\n') == 3
+    query, args = mock_cursor.execute.call_args[0]
+    assert 'WHERE idclass = %s' in query
+    assert args == (1,)
+
+@patch('app.mysql.connection')
+def test_export_roster_bad_requests(mock_connection, client):
+    export_cursor(mock_connection)
+    headers = {'Authorization': f'Bearer {generate_token("admin")}'}
+
+    assert client.get('/api/export/roster?format=xml', headers=headers).status_code == 400
+    assert client.get('/api/export/roster?compress=zip', headers=headers).status_code == 400
+    bad_class = client.get('/api/export/roster?idclass=abc', headers=headers)
+    assert bad_class.status_code == 400
+    assert "'idclass' must be an integer" in bad_class.get_json()['message']
+    with patch('exporter.pyarrow', None):
+        response = client.get('/api/export/roster?format=parquet', headers=headers)
+    assert response.status_code == 501
+    mock_connection.cursor.assert_not_called()
+    response = client.get('/api/export/roster', headers={'Authorization': f'Bearer {generate_token("teacher")}'})
+    assert response.status_code == 403
+
+@patch('app.mysql')
+def test_export_roster_command(mock_mysql, tmp_path):
+    export_cursor(mock_mysql.connection)
+    output = tmp_path / 'roster.csv.gz'
+
+    result = app.test_cli_runner().invoke(args=['export-roster', '--gzip', '--output', str(output)])
+
+    assert result.exit_code == 0
+    assert gzip.decompress(output.read_bytes()).decode().splitlines()[1] == '1,1,1,1,Morning,Ann Lee,Jane Smith,Algebra'
+
+# Test for batch writes
+@patch('app.mysql.connection')
+def test_batch_commits_once_and_resolves_references(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 1
+    mock_cursor.lastrowid = 42
+
+    token = generate_token('admin')
+    response = client.post(
+        '/api/batch',
+        json={'operations': [
+            {'op': 'create', 'table': 'classes', 'data': {'description': 'Algebra', 'idroom': 1}},
+            {'op': 'create', 'table': 'roster', 'data': {'idclass': {'$ref': 0}, 'idstudent': 5, 'class_period': 'Morning'}},
+            {'op': 'update', 'table': 'rooms', 'id': 3, 'data': {'location': 'B12'}},
+            {'op': 'delete', 'table': 'students', 'id': 9},
+        ]},
+        headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['id'] for result in results] == [42, 42, 3, 9]
+    calls = [call[0] for call in mock_cursor.execute.call_args_list]
+    assert calls[0] == ('INSERT INTO classes (description, idroom, idcourse) VALUES (%s, %s, %s)', ('Algebra', 1, None))
+    assert calls[1][1] == (42, 5, None, 'Morning')
+    assert calls[2] == ('UPDATE rooms SET location=%s, description=%s WHERE idrooms=%s', ('B12', None, 3))
+    assert calls[3] == ('DELETE FROM students WHERE idstudents=%s', (9,))
+    mock_connection.commit.assert_called_once()
+
+@patch('app.mysql.connection')
+def test_batch_rolls_back_on_database_error(mock_connection, client):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.execute.side_effect = [None, Exception('foreign key constraint fails')]
+
+    token = generate_token('admin')
+    response = client.post(
+        '/api/batch',
+        json={'operations': [
+            {'op': 'create', 'table': 'courses', 'data': {'name': 'Physics', 'code': 'PHY'}},
+            {'op': 'create', 'table': 'roster', 'data': {'idclass': 999, 'class_period': 'Morning'}},
+        ]},
+        headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [{'index': 1, 'message': 'foreign key constraint fails'}]
+    mock_connection.rollback.assert_called_once()
+    mock_connection.commit.assert_not_called()
+
+@patch('app.mysql.connection')
+def test_batch_validates_before_running(mock_connection, client):
+    token = generate_token('admin')
+    response = client.post(
+        '/api/batch',
+        json={'operations': [
+            {'op': 'create', 'table': 'rooms', 'data': {}},
+            {'op': 'update', 'table': 'rooms', 'id': {'$ref': 1}, 'data': {'location': 'A'}},
+            {'op': 'merge', 'table': 'rooms'},
+            {'op': 'delete', 'table': 'parents', 'id': 1},
+        ]},
+        headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [
+        {'index': 0, 'message': "'location' is required"},
+        {'index': 1, 'message': 'A reference must point at an earlier operation'},
+        {'index': 2, 'message': "'op' must be create, update or delete"},
+        {'index': 3, 'message': "Unknown table 'parents'"},
+    ]
+    mock_connection.cursor.assert_not_called()
+    assert client.post('/api/batch', json={'operations': []},
+                       headers={'Authorization': f'Bearer {token}'}).status_code == 400
+
+# Test for people search
+SEARCH_TABLES = {
+    'students': [{'idstudents': 1, 'firstname': 'John', 'middlename': None, 'lastname': 'Smith'},
+                 {'idstudents': 2, 'firstname': 'Jane', 'middlename': None, 'lastname': 'Doe'}],
+    'teachers': [{'idteachers': 1, 'firstname': 'Johanna', 'middlename': None, 'lastname': 'Baker'}],
+}
+
+def fake_search_query(query, *args):
+    for table, rows in SEARCH_TABLES.items():
+        if f'FROM {table}' in query:
+            if args:
+                return [{'idstudents': args[0], 'firstname': 'Joan', 'middlename': None, 'lastname': 'Smithson'}]
+            return rows
+
+@pytest.fixture
+def fresh_search():
+    search_state['loaded'] = False
+    yield
+    search_state['loaded'] = False
+
+def test_search_people(client, fresh_search):
+    headers = {'Authorization': f'Bearer {generate_token("teacher")}'}
+    with patch('app.execute_template', side_effect=fake_search_query) as mock_execute:
+        response = client.get('/api/search?q=jo', headers=headers)
+        typo = client.get('/api/search?q=smiht', headers=headers)
+        teachers = client.get('/api/search?q=jo&type=teacher&limit=5', headers=headers)
+
+    assert response.status_code == 200
+    assert [(p['type'], p['id']) for p in response.get_json()] == [('teacher', 1), ('student', 1)]
+    assert typo.get_json()[0]['lastname'] == 'Smith'
+    assert [p['firstname'] for p in teachers.get_json()] == ['Johanna']
+    assert mock_execute.call_count == 2
+
+def test_search_bad_requests(client):
+    headers = {'Authorization': f'Bearer {generate_token("teacher")}'}
+
+    assert client.get('/api/search', headers=headers).status_code == 400
+    assert client.get('/api/search?q=jo&type=parent', headers=headers).status_code == 400
+    assert client.get('/api/search?q=jo&limit=0', headers=headers).status_code == 400
+    assert client.get('/api/search?q=jo', headers={'Authorization': f'Bearer {generate_token("student")}'}).status_code == 403
+
+@patch('app.mysql.connection')
+def test_student_write_updates_search_index(mock_connection, client, fresh_search):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 1
+    mock_cursor.lastrowid = 3
+
+    admin = {'Authorization': f'Bearer {generate_token("admin")}'}
+    with patch('app.execute_template', side_effect=fake_search_query) as mock_execute:
+        client.get('/api/search?q=jo', headers=admin)
+        client.post('/api/students', json={'firstname': 'Joan', 'lastname': 'Smithson', 'birthdate': '2001-01-01', 'gender': 'F'},
+                    headers=admin)
+        added = client.get('/api/search?q=smithson', headers=admin)
+        client.delete('/api/students/3', headers=admin)
+        removed = client.get('/api/search?q=smithson', headers=admin)
+
+    assert [p['id'] for p in added.get_json()] == [3]
+    assert removed.get_json() == []
+    # Two table scans, then only the inserted row.
+    assert mock_execute.call_count == 3
+
+# Test for roster conflicts
+CONFLICT_TABLES = {
+    'classes': [{'idclasses': 1, 'idroom': 10}, {'idclasses': 2, 'idroom': 11}],
+    'roster': [{'idroster': 1, 'idclass': 1, 'idstudent': 100, 'idteacher': 7, 'class_period': 'Morning'}],
+}
+
+def fake_conflict_query(query, *args):
+    for table, rows in CONFLICT_TABLES.items():
+        if f'FROM {table}' in query:
+            if args:
+                key = args[0] + 1 if '> %s' in query else args[0]
+                return [{'idroster': key, 'idclass': 2, 'idstudent': 101, 'idteacher': 7, 'class_period': 'Morning'}]
+            return rows
+
+@pytest.fixture
+def conflict_mode():
+    conflict_state['loaded'] = False
+    def enable(mode):
+        app.config['ROSTER_CONFLICTS'] = mode
+    yield enable
+    app.config['ROSTER_CONFLICTS'] = 'off'
+    conflict_state['loaded'] = False
+
+@patch('app.mysql.connection')
+def test_add_roster_flags_double_booking(mock_connection, client, conflict_mode):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 1
+    mock_cursor.lastrowid = 2
+    conflict_mode('flag')
+
+    token = generate_token('admin')
+    with patch('app.execute_template', side_effect=fake_conflict_query):
+        response = client.post(
+            '/api/roster',
+            json={'idclass': 2, 'idstudent': 101, 'idteacher': 7, 'class_period': 'Morning'},
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        report = client.get('/api/conflicts', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 201
+    assert response.get_json()['conflicts'] == [{'type': 'teacher', 'id': 7, 'period': 'Morning', 'classes': [1]}]
+    # The committed row was applied to the index.
+    assert report.get_json() == [{'type': 'teacher', 'id': 7, 'period': 'Morning', 'classes': [1, 2]}]
+
+@patch('app.mysql.connection')
+def test_roster_writes_rejected_on_conflict(mock_connection, client, conflict_mode):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 1
+    conflict_mode('reject')
+
+    token = generate_token('admin')
+    with patch('app.execute_template', side_effect=fake_conflict_query):
+        single = client.put(
+            '/api/roster/5',
+            json={'idclass': 2, 'idstudent': 100, 'class_period': 'Morning'},
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        bulk = client.post(
+            '/api/roster',
+            json=[{'idclass': 2, 'idstudent': 200, 'idteacher': 8, 'class_period': 'Morning'},
+                  {'idclass': 1, 'idstudent': 200, 'class_period': 'Morning'}],
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        free = client.post(
+            '/api/roster',
+            json={'idclass': 2, 'idstudent': 200, 'idteacher': 8, 'class_period': 'Evening'},
+            headers={'Authorization': f'Bearer {token}'}
+        )
+
+    assert single.status_code == 409
+    assert single.get_json()['conflicts'] == [{'type': 'student', 'id': 100, 'period': 'Morning', 'classes': [1]}]
+    assert bulk.status_code == 409
+    assert bulk.get_json()['conflicts'] == [{'index': 1, 'conflicts': [
+        {'type': 'student', 'id': 200, 'period': 'Morning', 'classes': [2]},
+    ]}]
+    assert free.status_code == 201
+    assert 'conflicts' not in free.get_json()
+    mock_cursor.executemany.assert_not_called()
+
+@patch('app.mysql.connection')
+def test_batch_roster_writes_checked_for_conflicts(mock_connection, client, conflict_mode):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 1
+    mock_cursor.lastrowid = 9
+    conflict_mode('reject')
+
+    admin = {'Authorization': f'Bearer {generate_token("admin")}'}
+    with patch('app.execute_template', side_effect=fake_conflict_query):
+        rejected = client.post('/api/batch', json={'operations': [
+            {'op': 'create', 'table': 'classes', 'data': {'description': 'New'}},
+            {'op': 'create', 'table': 'roster', 'data': {'idclass': {'$ref': 0}, 'idteacher': 8, 'class_period': 'Evening'}},
+            {'op': 'update', 'table': 'roster', 'id': {'$ref': 1}, 'data': {'idclass': {'$ref': 0}, 'idteacher': 8, 'class_period': 'Noon'}},
+            {'op': 'create', 'table': 'roster', 'data': {'idclass': 2, 'idstudent': 100, 'class_period': 'Morning'}},
+        ]}, headers=admin)
+        conflict_mode('flag')
+        flagged = client.post('/api/batch', json={'operations': [
+            {'op': 'create', 'table': 'roster', 'data': {'idclass': 2, 'idteacher': 7, 'class_period': 'Morning'}},
+        ]}, headers=admin)
+
+    assert rejected.status_code == 409
+    # The update replaces the row created in the same batch, so only the
+    # student booked into class 1 conflicts.
+    assert rejected.get_json()['conflicts'] == [{'index': 3, 'conflicts': [
+        {'type': 'student', 'id': 100, 'period': 'Morning', 'classes': [1]},
+    ]}]
+    assert flagged.status_code == 200
+    assert flagged.get_json()['conflicts'] == [{'index': 0, 'conflicts': [
+        {'type': 'teacher', 'id': 7, 'period': 'Morning', 'classes': [1]},
+    ]}]
+    assert mock_cursor.execute.call_count == 1
+
+@patch('app.mysql.connection')
+def test_import_checks_roster_conflicts(mock_connection, client, conflict_mode):
+    roster = b"idclass,idstudent,idteacher,class_period\n2,101,7,Morning\n2,102,8,Evening\n1,102,9,Evening\n"
+    admin = {'Authorization': f'Bearer {generate_token("admin")}'}
+    reports = {}
+    for mode in ('flag', 'reject'):
+        # Both imports run against the same seeded tables.
+        conflict_state['loaded'] = False
+        conflict_mode(mode)
+        mock_cursor = import_cursor(mock_connection, [[1, 2], [101, 102], [7, 8, 9]])
+        with patch('app.execute_template', side_effect=fake_conflict_query):
+            response = client.post('/api/import', data={'roster': (io.BytesIO(roster), 'roster.csv')}, headers=admin)
+        reports[mode] = (response.status_code, response.get_json()['files'][0], mock_cursor.executemany.call_args[0][1])
+
+    status, report, rows = reports['flag']
+    assert status == 201
+    assert report['rows_conflicting'] == 2
+    assert [c['line'] for c in report['conflicts']] == [2, 4]
+    assert len(rows) == 3
+    status, report, rows = reports['reject']
+    assert status == 207
+    assert report['rejected'] == [
+        {'line': 2, 'message': 'double booking: teacher 7 already in class 1 in Morning'},
+        {'line': 4, 'message': 'double booking: student 102 already in class 2 in Evening'},
+    ]
+    assert rows == [(2, 102, 8, 'Evening')]
+
+def test_conflicts_report_type_filter(client, conflict_mode):
+    conflict_mode('flag')
+    token = generate_token('admin')
+    with patch('app.execute_template', side_effect=fake_conflict_query) as mock_execute:
+        response = client.get('/api/conflicts?type=room', headers={'Authorization': f'Bearer {token}'})
+        bad = client.get('/api/conflicts?type=parent', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.get_json() == []
+    assert bad.status_code == 400
+    assert mock_execute.call_count == 2
+
+# Test for timetables
+TIMETABLE_TABLES = {
+    'students': [{'idstudents': 100}, {'idstudents': 101}],
+    'teachers': [{'idteachers': 7, 'name': 'Anne Baker'}],
+    'classes': [{'idclasses': 1, 'description': 'Algebra basics class', 'idroom': 10, 'idcourse': 20}],
+    'rooms': [{'idrooms': 10, 'location': 'Building A, Room 101'}],
+    'courses': [{'idcourses': 20, 'name': 'Mathematics 101'}],
+    'roster': [{'idroster': 1, 'idclass': 1, 'idstudent': 100, 'idteacher': 7, 'class_period': 'Morning'}],
+}
+
+def fake_timetable_query(query, *args):
+    for table, rows in TIMETABLE_TABLES.items():
+        if f'FROM {table}' in query:
+            if args:
+                return [{'idroster': args[0], 'idclass': 1, 'idstudent': 101, 'idteacher': 7, 'class_period': 'Afternoon'}]
+            return rows
+
+@pytest.fixture
+def fresh_timetable():
+    timetable_state['loaded'] = False
+    yield
+    timetable_state['loaded'] = False
+
+def test_student_and_teacher_schedule(client, fresh_timetable):
+    headers = {'Authorization': f'Bearer {generate_token("teacher")}'}
+    with patch('app.execute_template', side_effect=fake_timetable_query) as mock_execute:
+        student = client.get('/api/students/100/schedule', headers=headers)
+        teacher = client.get('/api/teachers/7/schedule', headers=headers)
+        empty = client.get('/api/students/101/schedule', headers=headers)
+        missing = client.get('/api/students/999/schedule', headers=headers)
+
+    assert student.status_code == 200
+    assert student.get_json() == [{
+        'period': 'Morning', 'idclass': 1, 'class': 'Algebra basics class',
+        'idcourse': 20, 'course': 'Mathematics 101', 'idroom': 10, 'room': 'Building A, Room 101',
+        'idteacher': 7, 'teacher': 'Anne Baker'}]
+    assert [entry['class'] for entry in teacher.get_json()] == ['Algebra basics class']
+    assert empty.get_json() == []
+    assert missing.status_code == 404
+    # One scan per table, then every lookup is served from the index.
+    assert mock_execute.call_count == len(TIMETABLE_TABLES)
+    assert client.get('/api/teachers/7/schedule',
+                      headers={'Authorization': f'Bearer {generate_token("student")}'}).status_code == 403
+
+@patch('app.mysql.connection')
+def test_roster_write_updates_timetables(mock_connection, client, fresh_timetable):
+    mock_cursor = MagicMock()
+    mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 1
+    mock_cursor.lastrowid = 2
+
+    admin = {'Authorization': f'Bearer {generate_token("admin")}'}
+    with patch('app.execute_template', side_effect=fake_timetable_query) as mock_execute:
+        client.get('/api/teachers/7/schedule', headers=admin)
+        client.post('/api/roster', json={'idclass': 1, 'idstudent': 101, 'idteacher': 7, 'class_period': 'Afternoon'},
+                    headers=admin)
+        added = client.get('/api/students/101/schedule', headers=admin)
+        teacher = client.get('/api/teachers/7/schedule', headers=admin)
+        client.delete('/api/roster/2', headers=admin)
+        removed = client.get('/api/students/101/schedule', headers=admin)
+
+    assert [entry['period'] for entry in added.get_json()] == ['Afternoon']
+    assert [entry['period'] for entry in teacher.get_json()] == ['Afternoon', 'Morning']
+    assert removed.get_json() == []
+    assert mock_execute.call_count == len(TIMETABLE_TABLES) + 1
+
+# Test for migrations
+@patch('app.MigrationRunner')
+@patch('app.mysql')
+def test_migrate_command(mock_mysql, mock_runner):
+    runner = mock_runner.return_value
+    runner.replica = None
+    runner.run.return_value = [1, 2]
+    runner.status.return_value = [(1, '0001_list_indexes.sql', '2026-01-01 00:00:00'), (2, '0002_x.py', None)]
+
+    result = app.test_cli_runner().invoke(args=['migrate', '--target', '2', '--batch-size', '500'])
+    status = app.test_cli_runner().invoke(args=['migrate', '--status'])
+    runner.run.side_effect = RuntimeError('Another migration run is in progress')
+    locked = app.test_cli_runner().invoke(args=['migrate'])
+
+    assert result.exit_code == 0
+    runner.run.assert_any_call(2)
+    assert mock_runner.call_args_list[0].kwargs['batch_size'] == 500
+    assert mock_runner.call_args.kwargs['sleep'] == app.config['MIGRATION_SLEEP']
+    assert '0002_x.py' in status.output and 'pending' in status.output
+    assert locked.exit_code == 1
+    assert 'in progress' in locked.output
+
+@patch('app.mysql_connector')
+@patch('app.MigrationRunner')
+@patch('app.mysql')
+def test_migrate_command_connects_to_replica(mock_mysql, mock_runner, mock_connector):
+    mock_runner.return_value.run.return_value = []
+    with patch.dict(app.config, {'MIGRATION_REPLICA_HOST': 'replica1'}):
+        result = app.test_cli_runner().invoke(args=['migrate'])
+
+    assert result.exit_code == 0
+    config = mock_connector.call_args[0][0]
+    assert config['MYSQL_HOST'] == 'replica1' and config['MYSQL_DB'] == app.config['MYSQL_DB']
+    assert mock_runner.call_args.kwargs['replica'] is mock_connector.return_value.return_value
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import patch
+from flask_jwt_extended import create_access_token
+import asgi
+from app import app, response_cache
+
+
+class FakeAsyncDB:
+    """Stand-in for AsyncMySQLPool recording every statement."""
+
+    def __init__(self, rows=()):
+        self.pool = object()
+        self.rows = list(rows)
+        self.queries = []
+
+    async def fetchall(self, query, args=()):
+        self.queries.append((query, args))
+        return self.rows
+
+    async def commit(self, query, args=()):
+        self.queries.append((query, args))
+        return 1, 42
+
+
+@pytest.fixture
+def db():
+    app.config['TESTING'] = True
+    response_cache.clear()
+    fake = FakeAsyncDB()
+    with patch('asgi.db', fake):
+        yield fake
+
+def token(role):
+    with app.app_context():
+        return create_access_token(identity='test_user', additional_claims={'role': role})
+
+def call(method, path, query=b"", headers=(), body=b""):
+    """Runs one request through the ASGI app; returns (status, headers, body)."""
+    scope = {
+        "type": "http", "method": method, "path": path, "query_string": query, "root_path": "",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers],
+        "server": ("testserver", 80), "client": ("127.0.0.1", 5000), "scheme": "http", "http_version": "1.1",
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.application(scope, receive, send))
+    start = sent[0]
+    return (start["status"], {k.decode(): v.decode() for k, v in start["headers"]},
+            b"".join(message.get("body", b"") for message in sent[1:]))
+
+def test_list_runs_async(db):
+    db.rows = [{'idroster': 1, 'idclass': 1, 'idstudent': 1, 'idteacher': 1, 'class_period': 'Morning'}]
+    status, headers, body = call("GET", "/api/roster", b"limit=5")
+
+    assert status == 200
+    assert json.loads(body) == db.rows
+    assert db.queries == [("SELECT * FROM roster ORDER BY idroster LIMIT %s", (6,))]
+    assert headers['etag']
+
+def test_list_matches_wsgi_response(db):
+    db.rows = [{'idrooms': i, 'location': f'Room {i}', 'description': None} for i in range(1, 4)]
+    status, headers, body = call("GET", "/api/rooms", b"limit=2&sort=-idrooms")
+
+    with patch('app.mysql') as mock_mysql:
+        cursor = mock_mysql.connection.cursor.return_value
+        cursor.fetchall.return_value = db.rows
+        response_cache.clear()
+        wsgi = app.test_client().get('/api/rooms?limit=2&sort=-idrooms')
+
+    assert status == wsgi.status_code
+    assert json.loads(body) == wsgi.get_json()
+    assert headers['x-next-cursor'] == wsgi.headers['X-Next-Cursor']
+    assert db.queries[0][0] == cursor.execute.call_args[0][0]
+
+def test_list_not_modified(db):
+    db.rows = [{'idcourses': 1, 'name': 'Math', 'code': 'M1'}]
+    _, headers, _ = call("GET", "/api/courses")
+    status, _, body = call("GET", "/api/courses", headers=[("If-None-Match", headers['etag'])])
+
+    assert status == 304
+    assert len(db.queries) == 1
+
+def test_list_requires_role(db):
+    status, _, body = call("GET", "/api/teachers", headers=[("Authorization", f"Bearer {token('teacher')}")])
+
+    assert status == 403
+    assert json.loads(body) == {"error": "Access forbidden: Insufficient role"}
+    assert db.queries == []
+
+def test_list_bad_filter(db):
+    status, _, body = call("GET", "/api/roster", b"nope=1")
+
+    assert status == 400
+    assert json.loads(body)["error"] == "Bad Request"
+
+def test_write_runs_async(db):
+    status, _, body = call("PUT", "/api/courses/7", headers=[
+        ("Authorization", f"Bearer {token('admin')}"), ("Content-Type", "application/json")],
+        body=json.dumps({"name": "Physics", "code": "PHYS1"}).encode())
+
+    assert status == 200
+    assert json.loads(body) == {"message": "data updated successfully", "rows_affected": 1}
+    assert db.queries == [("UPDATE courses SET name=%s, code=%s WHERE idcourses=%s", ("Physics", "PHYS1", 7))]
+
+def test_write_matches_wsgi_sql(db):
+    payload = {"firstname": "Ann", "lastname": "Lee", "birthdate": "2005-01-01", "gender": "Female"}
+    headers = {"Authorization": f"Bearer {token('admin')}"}
+    call("POST", "/api/students", headers=[*headers.items(), ("Content-Type", "application/json")],
+         body=json.dumps(payload).encode())
+
+    with patch('app.mysql') as mock_mysql:
+        cursor = mock_mysql.connection.cursor.return_value
+        cursor.rowcount = 1
+        app.test_client().post('/api/students', json=payload, headers=headers)
+
+    query, args = cursor.execute.call_args[0]
+    assert db.queries == [(query, args)]
+
+def test_write_invalidates_cache(db):
+    with patch('asgi.notify_write') as mock_notify:
+        call("DELETE", "/api/rooms/3", headers=[("Authorization", f"Bearer {token('admin')}")])
+
+    mock_notify.assert_called_once_with("DELETE FROM rooms WHERE idrooms=%s", (3,), 42)
+
+def test_other_routes_served_by_flask(db):
+    status, headers, body = call("GET", "/api")
+
+    assert status == 200
+    assert b"<html" in body.lower()
+    assert db.queries == []
+
+def test_unknown_route(db):
+    status, _, body = call("GET", "/no-such-page")
+
+    assert status == 404
+    assert json.loads(body)["error"] == "Not Found"
+
+def test_lifespan_without_driver():
+    sent = []
+    messages = [{"type": "lifespan.startup"}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    with patch('asgi.aiomysql', None):
+        asyncio.run(asgi.application({"type": "lifespan"}, receive, send))
+
+    assert sent[0]["type"] == "lifespan.startup.failed"
+    assert "aiomysql" in sent[0]["message"]
+
+def test_async_views_match_flask_endpoints():
+    assert set(asgi.ASYNC_VIEWS) <= set(app.view_functions)
+
+def test_roster_write_checks_conflicts(db):
+    from app import conflict_state
+    rows = {
+        'classes': [{'idclasses': 1, 'idroom': 10}, {'idclasses': 2, 'idroom': 10}],
+        'roster': [{'idroster': 1, 'idclass': 1, 'idstudent': 5, 'idteacher': 7, 'class_period': 'Morning'}],
+    }
+    headers = [("Authorization", f"Bearer {token('admin')}"), ("Content-Type", "application/json")]
+    body = json.dumps({'idclass': 2, 'idstudent': 6, 'class_period': 'Morning'}).encode()
+    app.config['ROSTER_CONFLICTS'] = 'reject'
+    conflict_state['loaded'] = False
+    try:
+        with patch('app.execute_template', side_effect=lambda query: rows['classes' if 'classes' in query else 'roster']):
+            status, _, response = call("POST", "/api/roster", headers=headers, body=body)
+    finally:
+        app.config['ROSTER_CONFLICTS'] = 'flag'
+        conflict_state['loaded'] = False
+
+    assert status == 409
+    assert json.loads(response)['conflicts'] == [{'type': 'room', 'id': 10, 'period': 'Morning', 'classes': [1]}]
+    assert db.queries == []
+
+@pytest.mark.parametrize('query, headers', [
+    (b"format=ndjson", ()),
+    (b"", (("Accept", "application/x-ndjson"),)),
+])
+def test_ndjson_list_streams_through_flask(db, query, headers):
+    rows = [(1, 1, 1, 1, 'Morning'), (2, 1, 2, 1, 'Afternoon')]
+    with patch('app.mysql') as mock_mysql:
+        cursor = mock_mysql.connection.cursor.return_value
+        cursor.description = [('idroster',), ('idclass',), ('idstudent',), ('idteacher',), ('class_period',)]
+        cursor.fetchmany.side_effect = [rows[:1], rows[1:], []]
+        status, response_headers, body = call("GET", "/api/roster", query, headers=headers)
+
+    assert status == 200
+    assert response_headers['content-type'] == 'application/x-ndjson'
+    assert [json.loads(line)['idroster'] for line in body.decode().splitlines()] == [1, 2]
+    assert db.queries == []
+    cursor.close.assert_called_once()
@@ -1,15 +1,26 @@
+import time
 import pytest
+from datetime import timedelta
 from unittest.mock import patch, MagicMock
-from flask import Flask
+from flask import Flask, g
 from app import app  
+from auth import VerifiedTokenCache, login_state, verified_claims
+from users import hash_password
+from flask_jwt_extended import (create_access_token, decode_token, get_jwt, get_jwt_header, get_jwt_identity,
+                                get_jwt_request_location, verify_jwt_in_request)
+from flask_jwt_extended.default_callbacks import default_blocklist_callback
+from flask_jwt_extended.internal_utils import get_jwt_manager
 from flask_jwt_extended.exceptions import JWTDecodeError
 
 @pytest.fixture
 def client():
     app.config['TESTING'] = True
     app.config['JWT_SECRET_KEY'] = "auth_key_1001"    
+    app.config['AUTH_DEMO_ACCOUNTS'] = True
+    app.extensions.pop('auth_login', None)
     with app.test_client() as client:
         yield client
+    app.config['AUTH_DEMO_ACCOUNTS'] = False
 
 @patch('flask_jwt_extended.create_access_token')
 @patch('flask_jwt_extended.get_jwt_identity')
@@ -114,3 +125,232 @@ def test_role_required_decorator(mock_get_jwt_identity, mock_jwt_required, clien
     assert response.status_code == 200
     data = response.get_json()
     assert data["message"] == "Welcome, admin!"
+
+# Test for the verified token cache
+def test_token_cache_lru_and_expiry():
+    cache = VerifiedTokenCache(max_entries=2, max_age=300)
+    cache.set(b'a', 'claims a')
+    cache.set(b'b', 'claims b')
+    cache.get(b'a')
+    cache.set(b'c', 'claims c')
+
+    assert cache.get(b'a') == 'claims a'
+    assert cache.get(b'b') is None
+    cache.set(b'old', 'claims old', expires_at=time.time() - 1)
+    assert cache.get(b'old') is None
+    stats = cache.stats()
+    assert stats['evictions'] == 2
+    assert stats['expired'] == 1
+
+def test_repeated_token_verified_once(client):
+    with app.app_context():
+        token = create_access_token(identity='cache_admin', additional_claims={'role': 'admin'})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with patch('flask_jwt_extended.view_decorators.decode_token', wraps=decode_token) as mock_decode:
+        for _ in range(3):
+            response = client.get('/api/token-cache', headers=headers)
+            assert response.status_code == 200
+
+    assert mock_decode.call_count == 1
+    assert response.get_json()['hits'] >= 2
+
+def test_cached_token_role_still_checked(client):
+    with app.app_context():
+        token = create_access_token(identity='cache_teacher', additional_claims={'role': 'teacher'})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get('/api/token-cache', headers=headers).status_code == 403
+    assert client.get('/api/token-cache', headers=headers).status_code == 403
+
+def test_token_reverified_after_expiry(client):
+    with app.app_context():
+        token = create_access_token(identity='cache_admin', additional_claims={'role': 'admin'},
+                                    expires_delta=timedelta(seconds=60))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with patch('flask_jwt_extended.view_decorators.decode_token', wraps=decode_token) as mock_decode:
+        assert client.get('/api/token-cache', headers=headers).status_code == 200
+        with patch('auth.time.time', return_value=time.time() + 120):
+            client.get('/api/token-cache', headers=headers)
+
+    assert mock_decode.call_count == 2
+
+def test_token_cache_internals(client):
+    """
+    verified_claims() depends on these Flask-JWT-Extended internals; an
+    upgrade that drops them has to fail here, not in production.
+    """
+    with app.app_context():
+        token = create_access_token(identity='cache_admin', additional_claims={'role': 'admin'})
+    headers = {"Authorization": f"Bearer {token}"}
+    app.extensions.pop('jwt_verify_cache', None)
+
+    with app.test_request_context(headers=headers):
+        manager = get_jwt_manager()
+        assert manager._token_in_blocklist_callback is default_blocklist_callback
+        assert manager._user_lookup_callback is None
+        verify_jwt_in_request()
+        for name in ("_jwt_extended_jwt", "_jwt_extended_jwt_header", "_jwt_extended_jwt_user",
+                     "_jwt_extended_jwt_location"):
+            assert name in g
+        assert verified_claims()["role"] == 'admin'
+
+    with app.test_request_context(headers=headers), \
+            patch('flask_jwt_extended.view_decorators.decode_token') as mock_decode:
+        assert verified_claims()["sub"] == 'cache_admin'
+        assert get_jwt()["role"] == 'admin'
+        assert get_jwt_header()["alg"] == 'HS256'
+        assert get_jwt_identity() == 'cache_admin'
+        assert get_jwt_request_location() == 'headers'
+        mock_decode.assert_not_called()
+
+def test_invalid_token_not_cached(client):
+    headers = {"Authorization": "Bearer invalid_token"}
+    assert client.get('/api/token-cache', headers=headers).status_code == 422
+    assert client.get('/api/token-cache', headers=headers).status_code == 422
+
+# Test for database users and login throttling
+FAST = "pbkdf2:sha256:1000"
+
+@pytest.fixture
+def fast_hashing():
+    app.config['PASSWORD_HASH_METHOD'] = FAST
+    yield
+    app.config['PASSWORD_HASH_METHOD'] = "pbkdf2:sha256:600000"
+
+def test_login_database_user(client, fast_hashing):
+    user = {'idusers': 7, 'password_hash': hash_password('bell', FAST), 'role': 'student'}
+    with patch('auth.fetch_user', return_value=user) as mock_fetch:
+        for _ in range(2):
+            response = client.post('/auth/login', json={"username": "s1001", "password": "bell"})
+            assert response.status_code == 200
+
+    assert mock_fetch.call_count == 1
+    token = response.get_json()["access_token"]
+    with app.app_context():
+        assert decode_token(token)["role"] == "student"
+
+def test_login_unknown_user(client, fast_hashing):
+    with patch('auth.fetch_user', return_value=None) as mock_fetch:
+        for _ in range(2):
+            response = client.post('/auth/login', json={"username": "nobody", "password": "x"})
+            assert response.status_code == 401
+
+    assert mock_fetch.call_count == 1
+
+def test_login_rehashes_with_new_work_factor(client, fast_hashing):
+    user = {'idusers': 7, 'password_hash': hash_password('bell', "pbkdf2:sha256:500"), 'role': 'student'}
+    with patch('auth.fetch_user', return_value=user), patch('auth.save_password_hash') as mock_save:
+        response = client.post('/auth/login', json={"username": "s1001", "password": "bell"})
+
+    assert response.status_code == 200
+    username, new_hash = mock_save.call_args[0]
+    assert username == "s1001"
+    assert new_hash.startswith(FAST + "$")
+
+    with patch('auth.fetch_user', return_value=user), patch('auth.save_password_hash', side_effect=Exception("gone")), \
+            patch.object(app.logger, 'warning') as mock_warning:
+        app.extensions.pop('auth_login', None)
+        response = client.post('/auth/login', json={"username": "s1001", "password": "bell"})
+
+    assert response.status_code == 200
+    assert mock_warning.call_args[0][1] == "s1001"
+
+def test_demo_accounts_are_opt_in(client, fast_hashing):
+    app.config['AUTH_DEMO_ACCOUNTS'] = False
+    with patch('auth.fetch_user', return_value=None) as mock_fetch:
+        response = client.post('/auth/login', json={"username": "admin", "password": "roster_admin"})
+    assert response.status_code == 401
+    mock_fetch.assert_called_once_with("admin")
+
+    token = generate_admin_token()
+    with patch.dict(app.extensions, {'mysql': MagicMock()}):
+        response = client.post('/auth/users', headers={"Authorization": f"Bearer {token}"},
+                               json={"username": "admin", "password": "new", "role": "admin"})
+    assert response.status_code == 201
+
+    app.config['AUTH_DEMO_ACCOUNTS'] = True
+    response = client.post('/auth/users', headers={"Authorization": f"Bearer {token}"},
+                           json={"username": "admin", "password": "new", "role": "admin"})
+    assert response.status_code == 400
+    assert "demo account" in response.get_json()["message"]
+
+def test_login_throttled_after_failures(client, fast_hashing):
+    user = {'idusers': 7, 'password_hash': hash_password('bell', FAST), 'role': 'student'}
+    with patch('auth.fetch_user', return_value=user):
+        for _ in range(5):
+            response = client.post('/auth/login', json={"username": "s1001", "password": "wrong"})
+            assert response.status_code == 401
+        response = client.post('/auth/login', json={"username": "s1001", "password": "bell"})
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+def test_login_failures_elsewhere_do_not_lock_user_out(client, fast_hashing):
+    user = {'idusers': 7, 'password_hash': hash_password('bell', FAST), 'role': 'student'}
+    with patch('auth.fetch_user', return_value=user):
+        for _ in range(5):
+            response = client.post('/auth/login', json={"username": "s1001", "password": "wrong"},
+                                   environ_base={'REMOTE_ADDR': '203.0.113.9'})
+            assert response.status_code == 401
+        response = client.post('/auth/login', json={"username": "s1001", "password": "bell"},
+                               environ_base={'REMOTE_ADDR': '198.51.100.4'})
+
+    assert response.status_code == 200
+
+def test_add_users(client, fast_hashing):
+    token = generate_admin_token()
+    with patch.dict(app.extensions, {'mysql': MagicMock()}):
+        cursor = app.extensions['mysql'].connection.cursor.return_value
+        response = client.post('/auth/users', headers={"Authorization": f"Bearer {token}"}, json=[
+            {"username": "s1", "password": "one", "role": "student", "idstudent": 1},
+            {"username": "t1", "password": "two", "role": "teacher", "idteacher": 1},
+        ])
+
+    assert response.status_code == 201
+    values = cursor.executemany.call_args[0][1]
+    assert [row[0] for row in values] == ["s1", "t1"]
+    assert values[0][1].startswith(FAST + "$")
+    assert "one" not in values[0][1]
+
+def test_add_users_batch_is_capped(client, fast_hashing):
+    token = generate_admin_token()
+    app.config['AUTH_MAX_USERS_PER_REQUEST'] = 2
+    try:
+        with patch('auth.hash_password') as mock_hash:
+            response = client.post('/auth/users', headers={"Authorization": f"Bearer {token}"},
+                                   json=[{"username": f"s{n}", "password": "x", "role": "student"} for n in range(3)])
+    finally:
+        app.config['AUTH_MAX_USERS_PER_REQUEST'] = 100
+
+    assert response.status_code == 400
+    assert "at most 2" in response.get_json()["message"]
+    mock_hash.assert_not_called()
+
+def test_add_users_waits_for_hashing_slot(client, fast_hashing):
+    token = generate_admin_token()
+    app.config['LOGIN_QUEUE_TIMEOUT'] = 0.01
+    with app.app_context():
+        hashing = login_state()["hashing"]
+    while hashing.acquire(blocking=False):
+        pass
+    try:
+        response = client.post('/auth/users', headers={"Authorization": f"Bearer {token}"},
+                               json={"username": "s1", "password": "one", "role": "student"})
+    finally:
+        app.config['LOGIN_QUEUE_TIMEOUT'] = 5
+        app.extensions.pop('auth_login', None)
+
+    assert response.status_code == 503
+
+def test_add_users_invalid_role(client):
+    token = generate_admin_token()
+    response = client.post('/auth/users', headers={"Authorization": f"Bearer {token}"},
+                           json={"username": "x", "password": "y", "role": "principal"})
+
+    assert response.status_code == 400
+
+def generate_admin_token():
+    with app.app_context():
+        return create_access_token(identity='admin', additional_claims={'role': 'admin'})
@@ -0,0 +1,81 @@
+import random
+import pytest
+from benchmark import SCHEMA_FILE, compare_reports, generate_rows, scenarios, split_statements, summarize
+from app import app
+
+IDS = {"rooms": (1, 50), "courses": (1, 50), "teachers": (1, 50),
+       "students": (1, 1000), "classes": (1, 100), "roster": (1, 5000), "users": (1, 100)}
+
+
+def test_generated_rows_are_deterministic():
+    first = list(generate_rows("students", 50, random.Random(7), IDS))
+    second = list(generate_rows("students", 50, random.Random(7), IDS))
+
+    assert first == second
+    assert len(first) == 50
+    assert all(len(row) == 5 and row[4] in ("Male", "Female") for row in first)
+
+def test_generated_references_resolve():
+    for idclass, idstudent, idteacher, period in generate_rows("roster", 1000, random.Random(1), IDS):
+        assert 1 <= idclass <= 100
+        assert 1 <= idstudent <= 1000
+        assert 1 <= idteacher <= 50
+        assert period in ("Morning", "Afternoon", "Evening")
+
+def test_generated_course_codes_unique():
+    codes = [code for _, code in generate_rows("courses", 5000, random.Random(1), IDS)]
+    assert len(set(codes)) == len(codes)
+
+def test_generated_users_share_hash():
+    refs = dict(IDS, users=(0, 0), password_hash="pbkdf2:sha256:1000$salt$hash")
+    rows = list(generate_rows("users", 100, random.Random(1), refs))
+
+    assert [row[0] for row in rows[:2]] == ["user1", "user2"]
+    assert {row[1] for row in rows} == {refs["password_hash"]}
+    assert all((row[3] is None) != (row[4] is None) for row in rows)
+
+def test_unknown_table():
+    with pytest.raises(ValueError):
+        list(generate_rows("parents", 1, random.Random(1), IDS))
+
+def test_split_schema_dump():
+    with open(SCHEMA_FILE, encoding="utf-8") as f:
+        statements = list(split_statements(f.read()))
+
+    assert sum(statement.startswith("CREATE TABLE") for statement in statements) == 7
+    assert all(statement.rstrip().endswith(";") for statement in statements)
+
+def test_scenarios_cover_every_route():
+    adapter = app.url_map.bind("localhost")
+    rng = random.Random(1)
+    covered = set()
+    for name, method, path, role, body in scenarios(IDS):
+        endpoint, _ = adapter.match(path(rng).split("?")[0], method)
+        covered.add((endpoint, method))
+
+    routes = {(rule.endpoint, method) for rule in app.url_map.iter_rules()
+              for method in rule.methods - {"HEAD", "OPTIONS"}
+              if rule.endpoint != "static" and not rule.endpoint.startswith("auth.")}
+    assert routes <= covered
+
+def test_summarize():
+    result = summarize("home", [i / 1000 for i in range(1, 101)], {200: 98, 500: 1, 0: 1}, 2.0)
+
+    assert result["throughput"] == 50.0
+    assert result["p50_ms"] == pytest.approx(51)
+    assert result["p99_ms"] == pytest.approx(100)
+    assert result["errors"] == 2
+    assert result["statuses"] == {"0": 1, "200": 98, "500": 1}
+
+def test_compare_flags_regressions():
+    old = {"scenarios": [{"name": "home", "throughput": 100.0, "p95_ms": 10.0},
+                         {"name": "roster_api", "throughput": 100.0, "p95_ms": 10.0}]}
+    new = {"scenarios": [{"name": "home", "throughput": 105.0, "p95_ms": 10.5},
+                         {"name": "roster_api", "throughput": 70.0, "p95_ms": 10.0},
+                         {"name": "metrics", "throughput": 10.0, "p95_ms": 1.0}]}
+
+    rows = {row["name"]: row for row in compare_reports(old, new, threshold=10)}
+    assert set(rows) == {"home", "roster_api"}
+    assert not rows["home"]["regressed"]
+    assert rows["roster_api"]["regressed"]
+    assert rows["roster_api"]["throughput_change"] == pytest.approx(-30)
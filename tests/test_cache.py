@@ -0,0 +1,98 @@
+import pytest
+from unittest.mock import patch
+from cache import MemoryCache, RedisCache, create_cache
+
+
+class FakeRedis:
+    """Stand-in for a redis.Redis client."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+
+    def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+def test_memory_cache_hit_and_miss():
+    cache = MemoryCache()
+
+    assert cache.get('rooms') is None
+    cache.set('rooms', [1, 2])
+    assert cache.get('rooms') == [1, 2]
+
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['size'] == 1
+
+def test_memory_cache_ttl():
+    cache = MemoryCache(ttl=10)
+    with patch('cache.time.monotonic', return_value=0):
+        cache.set('rooms', 'value')
+    with patch('cache.time.monotonic', return_value=5):
+        assert cache.get('rooms') == 'value'
+    with patch('cache.time.monotonic', return_value=11):
+        assert cache.get('rooms') is None
+    assert cache.stats()['size'] == 0
+
+def test_memory_cache_lru_eviction():
+    cache = MemoryCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+def test_memory_cache_invalidate_tag():
+    cache = MemoryCache()
+    cache.set('rooms?', 1, tags=['rooms'])
+    cache.set('rooms?limit=5', 2, tags=['rooms'])
+    cache.set('courses?', 3, tags=['courses'])
+
+    cache.invalidate('rooms')
+
+    assert cache.get('rooms?') is None
+    assert cache.get('rooms?limit=5') is None
+    assert cache.get('courses?') == 3
+
+def test_memory_cache_rejects_stale_set():
+    cache = MemoryCache()
+    versions = cache.tag_versions(['rooms'])
+    cache.invalidate('rooms')
+
+    assert not cache.set('rooms?', 'stale', tags=['rooms'], versions=versions)
+    assert cache.get('rooms?') is None
+
+def test_redis_cache_round_trip_and_invalidate():
+    cache = RedisCache(FakeRedis())
+    cache.set('rooms?', {'body': '[]'}, tags=['rooms'])
+
+    assert cache.get('rooms?') == {'body': '[]'}
+    cache.invalidate('rooms')
+    assert cache.get('rooms?') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+def test_create_cache_unknown_backend():
+    with pytest.raises(ValueError):
+        create_cache({'CACHE_BACKEND': 'memcached'})
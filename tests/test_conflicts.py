@@ -0,0 +1,58 @@
+from conflicts import ConflictIndex
+
+CLASSES = [(1, 10), (2, 10), (3, 11)]
+ROSTER = [
+    (1, 1, 100, 7, "Morning"),
+    (2, 1, 101, 7, "Morning"),
+    (3, 2, 102, 8, "Afternoon"),
+    (4, 3, 103, 9, "Morning"),
+]
+
+
+def loaded():
+    index = ConflictIndex()
+    index.load(CLASSES, ROSTER)
+    return index
+
+def test_same_class_is_not_a_conflict():
+    index = loaded()
+
+    assert index.check(1, 104, 7, "Morning") == []
+    assert index.report() == []
+
+def test_check_finds_teacher_student_and_room_double_bookings():
+    index = loaded()
+
+    assert index.check(2, 100, 9, "Morning") == [
+        {"type": "teacher", "id": 9, "period": "Morning", "classes": [3]},
+        {"type": "student", "id": 100, "period": "Morning", "classes": [1]},
+        {"type": "room", "id": 10, "period": "Morning", "classes": [1]},
+    ]
+    assert index.check(None, 100, 9, "Morning") == []
+
+def test_check_ignores_the_row_being_updated():
+    index = loaded()
+
+    assert index.check(3, 103, 9, "Afternoon", ignore=4) == []
+    # Moving row 4 into the morning slot of class 1's room is a conflict.
+    assert index.check(2, 103, 9, "Morning", ignore=4) == [
+        {"type": "room", "id": 10, "period": "Morning", "classes": [1]},
+    ]
+
+def test_report_and_incremental_updates():
+    index = loaded()
+    index.set_roster(5, 2, 100, 8, "Morning")
+
+    assert index.report() == [
+        {"type": "student", "id": 100, "period": "Morning", "classes": [1, 2]},
+        {"type": "room", "id": 10, "period": "Morning", "classes": [1, 2]},
+    ]
+    assert index.report(["teacher"]) == []
+
+    index.set_class(2, 11)
+    assert index.report(["room"]) == [{"type": "room", "id": 11, "period": "Morning", "classes": [2, 3]}]
+    index.remove_class(3)
+    assert index.report(["room"]) == []
+    index.remove_roster(5)
+    assert index.report() == []
+    assert index.class_periods == {1: {"Morning": 2}, 2: {"Afternoon": 1}, 3: {"Morning": 1}}
@@ -0,0 +1,56 @@
+import gzip
+import io
+import pytest
+from unittest.mock import MagicMock, patch
+from exporter import ChunkSink, csv_chunks, export_writer, fetch_batches, gzip_chunks
+
+COLUMNS = [("id", "int"), ("name", "str")]
+
+
+def test_fetch_batches_converts_dict_rows():
+    cur = MagicMock()
+    cur.fetchmany.side_effect = [[(1, "a"), (2, "b")], [{"id": 3, "name": "c"}], []]
+
+    assert list(fetch_batches(cur, 2, ["id", "name"])) == [[(1, "a"), (2, "b")], [(3, "c")]]
+    cur.fetchmany.assert_called_with(2)
+
+def test_csv_chunks_one_chunk_per_batch():
+    chunks = list(csv_chunks(COLUMNS, iter([[(1, "a")], [(2, "b, c")]])))
+
+    assert chunks == [b"id,name\r\n1,a\r\n", b'2,"b, c"\r\n']
+    assert list(csv_chunks(COLUMNS, iter([]))) == [b"id,name\r\n"]
+
+def test_gzip_chunks_round_trip():
+    data = [b"id,name\r\n", b"1,a\r\n" * 1000]
+
+    assert gzip.decompress(b"".join(gzip_chunks(iter(data)))) == b"".join(data)
+
+def test_export_writer_errors():
+    with pytest.raises(ValueError, match="Unknown export format 'xml'"):
+        export_writer("xml", COLUMNS)
+    with patch("exporter.pyarrow", None):
+        with pytest.raises(RuntimeError, match="requires the pyarrow package"):
+            export_writer("parquet", COLUMNS)
+
+def test_chunk_sink_drains():
+    sink = ChunkSink()
+    sink.write(b"ab")
+    sink.write(memoryview(b"cd"))
+
+    assert sink.tell() == 4
+    assert sink.drain() == b"abcd"
+    assert sink.drain() == b""
+
+def test_parquet_and_arrow_round_trip():
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    import pyarrow.parquet
+    batches = [[(1, "a"), (2, None)], [(3, "c")]]
+
+    data = b"".join(export_writer("parquet", COLUMNS)(iter(batches)))
+    table = pyarrow.parquet.read_table(io.BytesIO(data))
+    assert table.to_pylist() == [{"id": 1, "name": "a"}, {"id": 2, "name": None}, {"id": 3, "name": "c"}]
+    assert table.num_rows == 3
+
+    data = b"".join(export_writer("arrow", COLUMNS)(iter(batches)))
+    assert pyarrow.ipc.open_stream(data).read_all().column("id").to_pylist() == [1, 2, 3]
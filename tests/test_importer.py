@@ -0,0 +1,149 @@
+import io
+import pytest
+from unittest.mock import MagicMock
+from importer import CSVImport, describe_conflicts, load_data_field, load_ids, parse_row, referenced_tables
+
+IDS = {"students": {1, 2}, "teachers": {1}, "classes": {1}, "rooms": {1}, "courses": {1}}
+
+
+def fake_connection(fail_on=None):
+    """
+    A connection whose executemany fails when a row contains fail_on, so
+    the row by row retry runs.
+    """
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+
+    def executemany(query, rows):
+        if any(fail_on in row for row in rows):
+            raise Exception("Duplicate entry")
+
+    def execute(query, row=None):
+        if fail_on in (row or ()):
+            raise Exception("Duplicate entry")
+
+    cursor.executemany.side_effect = executemany
+    cursor.execute.side_effect = execute
+    return conn, cursor
+
+def test_referenced_tables():
+    assert referenced_tables(["roster"]) == ["classes", "students", "teachers"]
+    assert referenced_tables(["students", "classes"]) == ["classes", "courses", "rooms", "students"]
+
+def test_load_ids_reads_in_batches():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.fetchmany.side_effect = [[(1,), (2,)], [], [{"idteachers": 7}], []]
+
+    assert load_ids(conn, ["students", "teachers"]) == {"students": {1, 2}, "teachers": {7}}
+    cursor.execute.assert_any_call("SELECT idstudents FROM students")
+    cursor.close.assert_called_once()
+
+def test_parse_row_validates_columns():
+    row = {"idclass": "1", "idstudent": "2", "idteacher": "", "class_period": "Morning"}
+    assert parse_row("roster", row, IDS) == (None, [1, 2, None, "Morning"])
+
+    with pytest.raises(ValueError, match="'idstudent' 9 does not exist in students"):
+        parse_row("roster", dict(row, idstudent="9"), IDS)
+    with pytest.raises(ValueError, match="'idclass' must be an integer"):
+        parse_row("roster", dict(row, idclass="x"), IDS)
+    with pytest.raises(ValueError, match="'class_period' is required"):
+        parse_row("roster", dict(row, class_period=" "), IDS)
+
+def test_parse_row_dates_lengths_and_ids():
+    row = {"idstudents": "3", "firstname": "Jane", "lastname": "Smith", "birthdate": "2001-02-03", "gender": "F"}
+    assert parse_row("students", row, IDS) == (3, ["Jane", None, "Smith", "2001-02-03", "F"])
+
+    with pytest.raises(ValueError, match="YYYY-MM-DD"):
+        parse_row("students", dict(row, birthdate="03/02/2001"), IDS)
+    with pytest.raises(ValueError, match="longer than 10"):
+        parse_row("students", dict(row, gender="x" * 11), IDS)
+    with pytest.raises(ValueError, match="'idstudents' 1 already exists"):
+        parse_row("students", dict(row, idstudents="1"), IDS)
+
+def test_import_writes_chunks_and_reports_rejects():
+    conn, cursor = fake_connection()
+    rejected = []
+    csv_text = "idclass,idstudent,idteacher,class_period\n" + "".join(
+        f"1,{1 + i % 2},1,Morning\n" for i in range(5)) + "1,9,1,Morning\n"
+
+    job = CSVImport(conn, "roster", {k: set(v) for k, v in IDS.items()}, chunk_size=2,
+                    on_reject=lambda *args: rejected.append(args[:3]))
+    job.start(io.StringIO(csv_text))
+    reports = [dict(report) for report in job.chunks()]
+
+    assert [report["rows_read"] for report in reports] == [2, 4, 6]
+    assert job.report["rows_imported"] == 5
+    assert job.report["rows_rejected"] == 1
+    assert job.report["rejected"] == [{"line": 7, "message": "'idstudent' 9 does not exist in students"}]
+    assert rejected == [("roster", 7, "'idstudent' 9 does not exist in students")]
+    assert cursor.executemany.call_count == 3
+    query, rows = cursor.executemany.call_args_list[0][0]
+    assert query == "INSERT INTO roster (idclass, idstudent, idteacher, class_period) VALUES (%s, %s, %s, %s)"
+    assert rows == [(1, 1, 1, "Morning"), (1, 2, 1, "Morning")]
+
+def test_import_retries_failed_chunk_row_by_row():
+    conn, cursor = fake_connection(fail_on="Bad")
+    ids = {k: set(v) for k, v in IDS.items()}
+    csv_text = ("idstudents,firstname,lastname,birthdate,gender\n"
+                "10,Ann,Lee,2001-01-01,F\n11,Bad,Lee,2001-01-01,F\n12,Bo,Lee,2001-01-01,M\n")
+
+    report = CSVImport(conn, "students", ids, chunk_size=10).run(io.StringIO(csv_text))
+
+    assert report["rows_imported"] == 2
+    assert report["rejected"] == [{"line": 3, "message": "Duplicate entry"}]
+    conn.rollback.assert_called_once()
+    assert ids["students"] == {1, 2, 10, 12}
+
+def test_import_requires_header_columns():
+    job = CSVImport(MagicMock(), "students", IDS)
+    with pytest.raises(ValueError, match="missing birthdate, gender"):
+        job.start(io.StringIO("firstname,lastname\nJane,Smith\n"))
+
+def test_import_with_load_data():
+    conn, cursor = fake_connection()
+    written = []
+    cursor.execute.side_effect = lambda query, args: written.append(open(args[0]).read())
+    csv_text = "description,idroom,idcourse\nLab\\1,1,\n"
+
+    report = CSVImport(conn, "classes", {k: set(v) for k, v in IDS.items()}, load_data=True).run(io.StringIO(csv_text))
+
+    assert report["rows_imported"] == 1
+    assert cursor.execute.call_args[0][0].startswith("LOAD DATA LOCAL INFILE %s INTO TABLE classes")
+    assert written == ["Lab\\\\1\t1\t\\N\n"]
+
+def test_load_data_disabled_fails_instead_of_inserting():
+    conn, cursor = fake_connection()
+    cursor.execute.side_effect = Exception(3948, "Loading local data is disabled")
+    csv_text = "description,idroom,idcourse\nLab,1,\n"
+    job = CSVImport(conn, "classes", {k: set(v) for k, v in IDS.items()}, load_data=True)
+
+    with pytest.raises(RuntimeError, match="Loading local data is disabled"):
+        job.run(io.StringIO(csv_text))
+    cursor.executemany.assert_not_called()
+
+    conn, cursor = fake_connection()
+    cursor.execute.side_effect = [Exception(1452, "foreign key constraint fails"), None]
+    report = CSVImport(conn, "classes", {k: set(v) for k, v in IDS.items()}, load_data=True).run(io.StringIO(csv_text))
+    assert report["rows_imported"] == 1
+
+def test_import_checks_chunks_for_conflicts():
+    conflict = {"type": "room", "id": 4, "period": "Morning", "classes": [1, 2]}
+    check = lambda rows: [[conflict] if row[1] == 2 else [] for row in rows]
+    csv_text = "idclass,idstudent,idteacher,class_period\n1,1,1,Morning\n1,2,1,Morning\n"
+    ids = {k: set(v) for k, v in IDS.items()}
+
+    conn, cursor = fake_connection()
+    flagged = CSVImport(conn, "roster", ids, check=check).run(io.StringIO(csv_text))
+    assert flagged["rows_imported"] == 2
+    assert flagged["conflicts"] == [{"line": 3, "conflicts": [conflict]}]
+
+    conn, cursor = fake_connection()
+    rejected = CSVImport(conn, "roster", ids, check=check, reject_conflicts=True).run(io.StringIO(csv_text))
+    assert rejected["rows_imported"] == 1
+    assert rejected["rejected"] == [{"line": 3, "message": describe_conflicts([conflict])}]
+    assert describe_conflicts([conflict]) == "double booking: room 4 already in class 1, 2 in Morning"
+
+def test_load_data_field_escapes():
+    assert load_data_field(None) == "\\N"
+    assert load_data_field("a\tb\nc") == "a\\tb\\nc"
@@ -0,0 +1,49 @@
+import logging
+from instrumentation import QueryStats, normalize_sql
+
+
+def test_normalize_sql():
+    assert normalize_sql("""
+        SELECT * FROM roster
+        WHERE idclass IN (%s, %s, %s) AND class_period = 'Morning' LIMIT 10;
+    """) == "SELECT * FROM roster WHERE idclass IN (%s, ...) AND class_period = ? LIMIT ?"
+
+def test_record_aggregates_by_endpoint_and_statement():
+    stats = QueryStats(slow_threshold=None)
+    for seconds in range(1, 101):
+        stats.record('get_roster_api', 'SELECT * FROM roster LIMIT %s', seconds / 1000, rows_returned=2)
+    stats.record('delete_roster', 'DELETE FROM roster WHERE idroster=%s', 0.002, rows_affected=1)
+
+    summary = stats.summary()
+    roster = summary['endpoints']['get_roster_api']
+    assert roster['count'] == 100
+    assert roster['rows_returned'] == 200
+    assert roster['p50_seconds'] == 0.051
+    assert roster['p95_seconds'] == 0.096
+    assert roster['p99_seconds'] == 0.1
+    assert roster['max_seconds'] == 0.1
+    assert summary['statements']['DELETE FROM roster WHERE idroster=%s']['rows_affected'] == 1
+
+def test_samples_are_bounded():
+    stats = QueryStats(samples=10, slow_threshold=None)
+    for _ in range(100):
+        stats.record('home', 'SELECT 1', 0.001)
+
+    assert stats.summary()['endpoints']['home']['count'] == 100
+    assert len(stats._endpoints['home']['durations']) == 10
+
+def test_slow_query_logged(caplog):
+    stats = QueryStats(slow_threshold=0.1)
+    with caplog.at_level(logging.WARNING, logger='roster.slow_query'):
+        stats.record('home', 'SELECT 1', 0.05)
+        stats.record('home', 'SELECT   2', 0.25)
+
+    assert len(caplog.records) == 1
+    assert 'slow query 0.250s endpoint=home' in caplog.records[0].getMessage()
+
+def test_reset():
+    stats = QueryStats()
+    stats.record('home', 'SELECT 1', 0.001)
+    stats.reset()
+
+    assert stats.summary() == {'endpoints': {}, 'statements': {}}
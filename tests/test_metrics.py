@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+from metrics import RequestMetrics
+
+
+def test_requests_and_histogram():
+    metrics = RequestMetrics(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 2.0):
+        metrics.request_started()
+        metrics.request_finished('GET', '/api/rooms', 200, seconds)
+    metrics.request_started()
+    metrics.request_finished('POST', '/api/rooms', 403, 0.01)
+
+    body = metrics.render({'db_pool_in_use': 3})
+    assert 'roster_http_requests_total{method="GET",route="/api/rooms",status="200"} 3' in body
+    assert 'roster_http_requests_total{method="POST",route="/api/rooms",status="403"} 1' in body
+    assert 'roster_http_request_duration_seconds_bucket{method="GET",route="/api/rooms",le="0.1"} 1' in body
+    assert 'roster_http_request_duration_seconds_bucket{method="GET",route="/api/rooms",le="1.0"} 2' in body
+    assert 'roster_http_request_duration_seconds_bucket{method="GET",route="/api/rooms",le="+Inf"} 3' in body
+    assert 'roster_http_request_duration_seconds_count{method="GET",route="/api/rooms"} 3' in body
+    assert 'roster_http_requests_in_flight 0' in body
+    assert f'roster_db_pool_in_use{{pid="{os.getpid()}"}} 3' in body
+
+def test_threads_are_summed():
+    metrics = RequestMetrics()
+
+    def serve():
+        for _ in range(500):
+            metrics.request_started()
+            metrics.request_finished('GET', '/', 200, 0.001)
+
+    threads = [threading.Thread(target=serve) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = metrics.snapshot()
+    assert snapshot['requests']['GET\t/\t200'] == 4000
+    assert snapshot['latency']['GET\t/']['count'] == 4000
+    assert snapshot['in_flight'] == 0
+    assert metrics._shards == []
+
+def test_label_values_escaped():
+    metrics = RequestMetrics()
+    metrics.request_started()
+    metrics.request_finished('GET', '/a"b\\c', 200, 0.001)
+
+    assert 'route="/a\\"b\\\\c"' in metrics.render()
+
+def test_processes_aggregated_through_directory(tmp_path):
+    metrics = RequestMetrics(directory=str(tmp_path))
+    metrics.request_started()
+    metrics.request_finished('GET', '/api/rooms', 200, 0.001)
+    metrics.flush({'db_pool_size': 2}, force=True)
+
+    other = metrics.snapshot({'db_pool_size': 5})
+    other['pid'] = os.getpid() + 1_000_000
+    other['in_flight'] = 4
+    with open(tmp_path / f"metrics-{other['pid']}.json", 'w') as f:
+        json.dump(other, f)
+
+    live = metrics.snapshot({'db_pool_size': 3})
+    live['pid'] = os.getppid()
+    with open(tmp_path / f"metrics-{live['pid']}.json", 'w') as f:
+        json.dump(live, f)
+
+    total = metrics.collect({'db_pool_size': 2})
+    assert total['requests']['GET\t/api/rooms\t200'] == 2
+    assert total['latency']['GET\t/api/rooms']['count'] == 2
+    assert total['in_flight'] == 0
+    assert total['gauges'] == {'db_pool_size': {os.getpid(): 2, os.getppid(): 3}}
+    # The other worker has exited, so its snapshot is deleted.
+    assert not (tmp_path / f"metrics-{other['pid']}.json").exists()
+    assert f'roster_db_pool_size{{pid="{os.getppid()}"}} 3' in metrics.render({'db_pool_size': 2})
+
+def test_stale_snapshots_pruned(tmp_path):
+    metrics = RequestMetrics(directory=str(tmp_path), snapshot_ttl=60)
+    metrics.request_started()
+    metrics.request_finished('GET', '/api/rooms', 200, 0.001)
+    stale = metrics.snapshot()
+    stale['pid'] = os.getppid()
+    path = tmp_path / f"metrics-{stale['pid']}.json"
+    with open(path, 'w') as f:
+        json.dump(stale, f)
+    old = os.path.getmtime(path) - 120
+    os.utime(path, (old, old))
+
+    total = metrics.collect()
+    assert total['requests']['GET\t/api/rooms\t200'] == 1
+    assert not path.exists()
+
+def test_flush_is_throttled(tmp_path):
+    metrics = RequestMetrics(directory=str(tmp_path), flush_interval=60)
+    metrics.flush()
+    metrics.request_started()
+    metrics.request_finished('GET', '/', 200, 0.001)
+    metrics.flush()
+
+    with open(tmp_path / f'metrics-{os.getpid()}.json') as f:
+        assert json.load(f)['requests'] == {}
@@ -0,0 +1,141 @@
+import pytest
+from unittest.mock import MagicMock
+from migrate import MigrationRunner, discover, replica_lag, split_statements
+
+
+class FakeDatabase:
+    """
+    Just enough of MySQL for the runner: the two tracking tables, the
+    migration lock and a table "things" with ids 1..10.
+    """
+
+    def __init__(self, ids=range(1, 11), fail_on=None):
+        self.ids = list(ids)
+        self.applied = {}
+        self.steps = {}
+        self.executed = []
+        self.updates = []
+        self.fail_on = fail_on
+        self.locked = False
+        self.conn = MagicMock()
+        self.conn.cursor.side_effect = self.cursor
+
+    def cursor(self):
+        cur = MagicMock()
+        cur.execute.side_effect = lambda query, args=None: self.execute(cur, " ".join(query.split()), args)
+        return cur
+
+    def execute(self, cur, query, args):
+        rows = []
+        if self.fail_on and self.fail_on in query:
+            raise Exception(1064, "syntax error")
+        if query.startswith("SELECT version, applied_at"):
+            rows = list(self.applied.items())
+        elif query.startswith("SELECT GET_LOCK"):
+            rows = [(0 if self.locked else 1,)]
+        elif query.startswith("INSERT INTO schema_migrations"):
+            self.applied[args[0]] = "now"
+        elif query.startswith("DELETE FROM schema_migration_steps"):
+            self.steps = {key: value for key, value in self.steps.items() if key[0] != args[0]}
+        elif query.startswith("SELECT last_key, done"):
+            rows = [self.steps[args]] if args in self.steps else []
+        elif query.startswith("INSERT INTO schema_migration_steps"):
+            self.steps[args[:2]] = args[2:]
+        elif query.startswith("SELECT MIN(id)"):
+            rows = [(min(self.ids),)]
+        elif query.startswith("SELECT MAX(id)"):
+            rows = [(max(self.ids),)]
+        elif query.startswith("SELECT id FROM things"):
+            later = [i for i in self.ids if i > args[0]]
+            rows = [(later[args[1]],)] if len(later) > args[1] else []
+        elif query.startswith("UPDATE things"):
+            self.updates.append(args)
+            cur.rowcount = len([i for i in self.ids if args[0] < i <= args[1]])
+        elif not query.startswith(("CREATE TABLE IF NOT EXISTS", "SET SESSION", "SELECT RELEASE_LOCK")):
+            self.executed.append(query)
+        cur.fetchall.return_value = rows
+        cur.fetchone.return_value = rows[0] if rows else None
+
+@pytest.fixture
+def migrations(tmp_path):
+    (tmp_path / "0001_indexes.sql").write_text(
+        "-- Indexes\nALTER TABLE things ADD INDEX a (a);\n\nALTER TABLE things\n  ADD INDEX b (b);\n")
+    (tmp_path / "0002_backfill.py").write_text(
+        "def upgrade(migration):\n"
+        "    migration.execute('ALTER TABLE things ADD COLUMN c int')\n"
+        "    migration.backfill('things', 'id', 'UPDATE things SET c = a WHERE id > %s AND id <= %s')\n")
+    (tmp_path / "notes.txt").write_text("not a migration")
+    return tmp_path
+
+def test_discover_orders_by_version(migrations):
+    assert [filename for _, filename, _ in discover(migrations)] == ["0001_indexes.sql", "0002_backfill.py"]
+
+    (migrations / "1_duplicate.sql").write_text("SELECT 1;\n")
+    with pytest.raises(ValueError, match="share version 1"):
+        discover(migrations)
+
+def test_split_statements_skips_comments():
+    assert list(split_statements("-- note\nSELECT 1;\n\nSELECT\n  2;\n")) == ["SELECT 1;", "SELECT\n  2;"]
+
+def test_run_applies_pending_migrations_in_order(migrations):
+    db = FakeDatabase()
+    runner = MigrationRunner(db.conn, migrations, batch_size=4)
+
+    assert runner.run() == [1, 2]
+    assert db.executed == ["ALTER TABLE things ADD INDEX a (a);", "ALTER TABLE things ADD INDEX b (b);",
+                           "ALTER TABLE things ADD COLUMN c int"]
+    assert db.updates == [(0, 4), (4, 8), (8, 10)]
+    assert set(db.applied) == {1, 2}
+    assert db.steps == {}
+    assert runner.run() == []
+
+def test_target_and_status(migrations):
+    db = FakeDatabase()
+    runner = MigrationRunner(db.conn, migrations)
+
+    assert runner.run(target=1) == [1]
+    assert runner.status() == [(1, "0001_indexes.sql", "now"), (2, "0002_backfill.py", None)]
+
+def test_interrupted_migration_resumes(migrations):
+    db = FakeDatabase(fail_on="ADD INDEX b")
+    runner = MigrationRunner(db.conn, migrations)
+    with pytest.raises(Exception):
+        runner.run()
+    assert db.applied == {}
+
+    db.fail_on = None
+    db.steps[(2, 1)] = (None, True)
+    db.steps[(2, 2)] = (6, False)
+    assert MigrationRunner(db.conn, migrations, batch_size=10).run() == [1, 2]
+    # Statement 1 of 0001 is not run again, and the backfill resumes after id 6.
+    assert db.executed == ["ALTER TABLE things ADD INDEX a (a);", "ALTER TABLE things ADD INDEX b (b);"]
+    assert db.updates == [(6, 10)]
+
+def test_run_refuses_when_locked(migrations):
+    db = FakeDatabase()
+    db.locked = True
+
+    with pytest.raises(RuntimeError, match="in progress"):
+        MigrationRunner(db.conn, migrations).run()
+
+def test_backfill_waits_for_replica(migrations, monkeypatch):
+    lags = iter([30.0, 0.5])
+    monkeypatch.setattr("migrate.replica_lag", lambda conn: next(lags))
+    monkeypatch.setattr("migrate.time.sleep", MagicMock())
+    db = FakeDatabase(ids=[5])
+    runner = MigrationRunner(db.conn, migrations, replica=MagicMock(), max_lag=1.0)
+    runner.version = 2
+
+    assert runner.backfill("things", "id", "UPDATE things SET c = 1 WHERE id > %s AND id <= %s") == 1
+    assert db.updates == [(4, 5)]
+    assert next(lags, None) is None
+
+def test_replica_lag():
+    conn = MagicMock()
+    cur = conn.cursor.return_value
+    cur.description = [("Replica_IO_State",), ("Seconds_Behind_Source",)]
+    cur.fetchone.return_value = ("Waiting", 12)
+    assert replica_lag(conn) == 12.0
+
+    cur.fetchone.return_value = None
+    assert replica_lag(conn) is None
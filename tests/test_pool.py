@@ -0,0 +1,167 @@
+import threading
+import pytest
+from unittest.mock import patch
+from flask import Flask
+from pool import ConnectionPool, MySQLPool, PoolTimeout
+
+
+class FakeConnection:
+    """Stand-in for a MySQLdb connection."""
+
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+        self.rollbacks = 0
+
+    def ping(self):
+        if not self.alive:
+            raise Exception("MySQL server has gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connections():
+    return []
+
+@pytest.fixture
+def connect(connections):
+    def factory():
+        conn = FakeConnection()
+        connections.append(conn)
+        return conn
+    return factory
+
+def test_acquire_reuses_released_connection(connect, connections):
+    pool = ConnectionPool(connect, min_size=0, max_size=2)
+
+    conn = pool.acquire()
+    pool.release(conn)
+
+    assert pool.acquire() is conn
+    assert len(connections) == 1
+    assert pool.stats()["checkouts"] == 2
+
+def test_fill_opens_min_size(connect, connections):
+    pool = ConnectionPool(connect, min_size=3, max_size=5)
+    pool.fill()
+
+    stats = pool.stats()
+    assert stats["size"] == 3
+    assert stats["idle"] == 3
+    assert stats["in_use"] == 0
+
+def test_acquire_times_out_when_exhausted(connect):
+    pool = ConnectionPool(connect, min_size=0, max_size=1, timeout=0.05)
+    pool.acquire()
+
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+
+def test_waiter_gets_released_connection(connect):
+    pool = ConnectionPool(connect, min_size=0, max_size=1, timeout=2)
+    conn = pool.acquire()
+    result = []
+
+    waiter = threading.Thread(target=lambda: result.append(pool.acquire()))
+    waiter.start()
+    pool.release(conn)
+    waiter.join()
+
+    assert result == [conn]
+
+def test_failed_health_check_replaces_connection(connect, connections):
+    pool = ConnectionPool(connect, min_size=0, max_size=1)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.alive = False
+
+    fresh = pool.acquire()
+
+    assert fresh is not conn
+    assert conn.closed
+    assert pool.stats()["health_check_failures"] == 1
+    assert pool.stats()["size"] == 1
+
+def test_idle_timeout_prunes_down_to_min_size(connect):
+    pool = ConnectionPool(connect, min_size=1, max_size=3, idle_timeout=10)
+    first, second = pool.acquire(), pool.acquire()
+    with patch("pool.time.monotonic", return_value=0):
+        pool.release(first)
+        pool.release(second)
+
+    with patch("pool.time.monotonic", return_value=100):
+        conn = pool.acquire()
+
+    assert first.closed
+    assert conn is second
+    assert pool.stats()["size"] == 1
+
+def test_max_lifetime_retires_connection(connect):
+    pool = ConnectionPool(connect, min_size=0, max_size=1, max_lifetime=60)
+    with patch("pool.time.monotonic", return_value=0):
+        conn = pool.acquire()
+
+    with patch("pool.time.monotonic", return_value=120):
+        pool.release(conn)
+
+    assert conn.closed
+    assert pool.stats()["size"] == 0
+
+def test_failed_connect_frees_slot(connections):
+    def broken():
+        raise Exception("Access denied")
+    pool = ConnectionPool(broken, min_size=0, max_size=1)
+
+    with pytest.raises(Exception):
+        pool.acquire()
+    assert pool.stats()["size"] == 0
+
+def test_invalid_pool_size(connect):
+    with pytest.raises(ValueError):
+        ConnectionPool(connect, min_size=5, max_size=2)
+
+def test_mysql_pool_borrows_per_app_context(connect, connections):
+    flask_app = Flask(__name__)
+    mysql = MySQLPool(flask_app, connect=connect)
+
+    with flask_app.app_context():
+        conn = mysql.connection
+        assert mysql.connection is conn
+        assert mysql.stats()["in_use"] == 1
+
+    assert conn.rollbacks == 1
+    assert not conn.closed
+    assert mysql.stats()["idle"] == 1
+
+    with flask_app.app_context():
+        assert mysql.connection is conn
+    assert len(connections) == 1
+
+def test_mysql_pool_prewarms_min_size(connect, connections):
+    flask_app = Flask(__name__)
+    flask_app.config["MYSQL_POOL_MIN_SIZE"] = 3
+    mysql = MySQLPool(flask_app, connect=connect)
+
+    with flask_app.app_context():
+        conn = mysql.connection
+        assert len(connections) == 3
+        assert mysql.stats()["idle"] == 2
+    assert conn in connections
+
+def test_mysql_pool_prewarm_failure_surfaces_on_use():
+    def broken():
+        raise Exception("Access denied")
+    flask_app = Flask(__name__)
+    mysql = MySQLPool(flask_app, connect=broken)
+
+    with flask_app.app_context(), patch.object(flask_app.logger, "warning") as mock_warning:
+        with pytest.raises(Exception, match="Access denied"):
+            mysql.connection
+    mock_warning.assert_called_once()
+    assert mysql.stats()["size"] == 0
@@ -0,0 +1,65 @@
+from schedule import ScheduleSummary
+
+
+def make_summary():
+    summary = ScheduleSummary()
+    summary.load(
+        classes=[(1, 'Algebra basics class', 1, 1), (2, 'Physics mechanics lecture', 2, 2)],
+        rooms=[(1, 'Building A, Room 101'), (2, 'Building B, Room 201')],
+        courses=[(1, 'Mathematics 101'), (2, 'Physics 201')],
+        teachers=[(1, 'Anne Baker'), (2, 'John Doe')],
+        roster=[(1, 1, 1, 'Morning'), (2, 1, 1, 'Morning'), (3, 2, 2, 'Afternoon')]
+    )
+    return summary
+
+def test_rows_group_roster_entries():
+    assert make_summary().rows() == [
+        {'class': 'Algebra basics class', 'period': 'Morning', 'course': 'Mathematics 101',
+         'teacher': 'Anne Baker', 'room': 'Building A, Room 101'},
+        {'class': 'Physics mechanics lecture', 'period': 'Afternoon', 'course': 'Physics 201',
+         'teacher': 'John Doe', 'room': 'Building B, Room 201'}
+    ]
+
+def test_group_stays_until_last_roster_row_removed():
+    summary = make_summary()
+
+    summary.remove_roster(1)
+    assert len(summary.rows()) == 2
+
+    summary.remove_roster(2)
+    assert [row['class'] for row in summary.rows()] == ['Physics mechanics lecture']
+
+def test_set_roster_moves_row():
+    summary = make_summary()
+    summary.set_roster(3, 1, 2, 'Evening')
+
+    rows = summary.rows()
+    assert {(row['class'], row['period'], row['teacher']) for row in rows} == {
+        ('Algebra basics class', 'Morning', 'Anne Baker'),
+        ('Algebra basics class', 'Evening', 'John Doe')
+    }
+
+def test_lookup_changes_are_reflected():
+    summary = make_summary()
+    summary.set_room(1, 'Building Z')
+    summary.set_teacher(2, 'Jane Doe')
+
+    rows = summary.rows()
+    assert rows[0]['room'] == 'Building Z'
+    assert rows[1]['teacher'] == 'Jane Doe'
+
+def test_missing_lookup_drops_row_like_inner_join():
+    summary = make_summary()
+    summary.remove_course(2)
+
+    assert [row['class'] for row in summary.rows()] == ['Algebra basics class']
+
+def test_rows_are_reused_until_changed():
+    summary = make_summary()
+    first = summary.rows()
+
+    summary.set_roster(4, 1, 1, 'Morning')
+    assert summary.rows() is first
+
+    summary.set_roster(5, 1, 1, 'Evening')
+    assert summary.rows() is not first
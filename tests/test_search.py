@@ -0,0 +1,78 @@
+import random
+import time
+from search import PeopleIndex, normalize, prefix_distance, tokenize
+
+PEOPLE = [
+    ("student", 1, "John", None, "Smith"),
+    ("student", 2, "Johnny", "K", "Doe"),
+    ("student", 3, "Mary-Jane", None, "O'Brien"),
+    ("teacher", 1, "José", None, "Johnson"),
+    ("teacher", 2, "Alice", None, "Smithers"),
+]
+
+
+def names(results):
+    return [(person["type"], person["id"]) for person in results]
+
+def test_tokenize_folds_case_accents_and_punctuation():
+    assert normalize("José") == "jose"
+    assert tokenize("Mary-Jane O'Brien") == ["mary", "jane", "obrien"]
+
+def test_prefix_distance():
+    assert prefix_distance("smiht", "smith", 1) == 1
+    assert prefix_distance("jonh", "johnson", 1) == 1
+    assert prefix_distance("brwn", "brown", 1) == 1
+    assert prefix_distance("smyth", "jones", 1) == 2
+
+def test_prefix_search_ranks_exact_tokens_first():
+    index = PeopleIndex()
+    index.load(PEOPLE)
+
+    assert names(index.search("john")) == [("student", 1), ("student", 2), ("teacher", 1)]
+    assert names(index.search("jo sm")) == [("student", 1)]
+    assert names(index.search("smith", kinds={"teacher"})) == [("teacher", 2)]
+    assert names(index.search("jose")) == [("teacher", 1)]
+    assert names(index.search("j", limit=2)) == [("student", 3), ("student", 1)]
+    assert index.search("  ") == []
+
+def test_fuzzy_search_fills_up_results():
+    index = PeopleIndex()
+    index.load(PEOPLE)
+
+    assert names(index.search("smiht")) == [("student", 1), ("teacher", 2)]
+    assert names(index.search("obrein")) == [("student", 3)]
+    assert index.search("zzz") == []
+
+def test_set_and_remove_keep_index_in_sync():
+    index = PeopleIndex()
+    index.load(PEOPLE)
+
+    index.set("student", 1, "Jon", None, "Smyth")
+    # Now only a typo away from "john", so it ranks after the prefix matches.
+    assert names(index.search("john")) == [("student", 2), ("teacher", 1), ("student", 1)]
+    assert names(index.search("smyth"))[0] == ("student", 1)
+    index.remove("teacher", 2)
+    assert names(index.search("smithers")) == []
+    assert "smithers" not in index.tokens
+    index.set("teacher", 3, "Zed", None, "Quinn")
+    assert names(index.search("qui")) == [("teacher", 3)]
+    assert index.tokens == sorted(index.tokens)
+    assert len(index) == 5
+
+def test_search_latency_at_100k_people():
+    rng = random.Random(7)
+    syllables = ["an", "ber", "co", "da", "el", "fi", "ga", "ho", "is", "jo", "ka", "li", "mo", "ne", "or"]
+    def name():
+        return "".join(rng.choice(syllables) for _ in range(rng.randint(2, 3))).capitalize()
+    index = PeopleIndex()
+    index.load(("student", i, name(), None, name()) for i in range(100000))
+
+    queries = [name()[:rng.randint(1, 6)] + " " + name()[:2] for _ in range(100)]
+    queries += [name()[::-1] for _ in range(100)]
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    assert timings[int(len(timings) * 0.99)] < 0.05
@@ -0,0 +1,71 @@
+from timetable import TimetableIndex
+
+
+def make_index():
+    index = TimetableIndex()
+    index.load(
+        students=[(100,), (101,), (102,)],
+        teachers=[(7, 'Anne Baker'), (8, 'John Doe')],
+        classes=[(1, 'Algebra basics class', 10, 20), (2, 'Physics mechanics lecture', 11, 21)],
+        rooms=[(10, 'Building A, Room 101'), (11, 'Building B, Room 201')],
+        courses=[(20, 'Mathematics 101'), (21, 'Physics 201')],
+        roster=[(1, 1, 100, 7, 'Morning'), (2, 1, 101, 7, 'Morning'), (3, 2, 100, 8, 'Afternoon')]
+    )
+    return index
+
+def test_student_timetable_is_denormalised():
+    assert make_index().timetable('student', 100) == [
+        {'period': 'Afternoon', 'idclass': 2, 'class': 'Physics mechanics lecture',
+         'idcourse': 21, 'course': 'Physics 201', 'idroom': 11, 'room': 'Building B, Room 201',
+         'idteacher': 8, 'teacher': 'John Doe'},
+        {'period': 'Morning', 'idclass': 1, 'class': 'Algebra basics class',
+         'idcourse': 20, 'course': 'Mathematics 101', 'idroom': 10, 'room': 'Building A, Room 101',
+         'idteacher': 7, 'teacher': 'Anne Baker'},
+    ]
+
+def test_teacher_gets_one_entry_per_class_and_period():
+    index = make_index()
+
+    assert [entry['idclass'] for entry in index.timetable('teacher', 7)] == [1]
+    index.remove_roster(1)
+    assert [entry['idclass'] for entry in index.timetable('teacher', 7)] == [1]
+    index.remove_roster(2)
+    assert index.timetable('teacher', 7) == []
+
+def test_unknown_people_and_people_without_classes():
+    index = make_index()
+
+    assert index.timetable('student', 102) == []
+    assert index.timetable('student', 999) is None
+    assert index.timetable('teacher', 999) is None
+    index.remove_student(100)
+    assert index.timetable('student', 100) is None
+
+def test_lookup_table_writes_update_affected_timetables():
+    index = make_index()
+
+    index.set_room(10, 'Building C, Room 5')
+    index.set_course(21, 'Physics 202')
+    index.set_teacher(7, 'Anne Carter')
+    entries = {entry['idclass']: entry for entry in index.timetable('student', 100)}
+    assert entries[1]['room'] == 'Building C, Room 5'
+    assert entries[1]['teacher'] == 'Anne Carter'
+    assert entries[2]['course'] == 'Physics 202'
+
+    index.set_class(1, 'Algebra II', 11, 20)
+    assert index.timetable('student', 101)[0]['class'] == 'Algebra II'
+    assert index.timetable('student', 101)[0]['room'] == 'Building B, Room 201'
+    index.remove_class(1)
+    assert index.timetable('teacher', 7)[0]['class'] is None
+
+def test_set_roster_moves_row_between_people():
+    index = make_index()
+    index.set_roster(3, 2, 102, 7, 'Evening')
+
+    assert [entry['period'] for entry in index.timetable('student', 100)] == ['Morning']
+    assert [(entry['period'], entry['idclass']) for entry in index.timetable('teacher', 7)] == [
+        ('Evening', 2), ('Morning', 1)]
+    assert index.timetable('teacher', 8) == []
+    assert index.by_teacher.get(8) is None
+    index.set_teacher(8, 'John Smith')
+    assert index.timetable('student', 102)[0]['teacher'] == 'Anne Baker'
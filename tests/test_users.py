@@ -0,0 +1,77 @@
+import threading
+import time
+from unittest.mock import patch
+from users import LoginThrottle, UserCache, hash_password, needs_rehash, verify_password
+
+FAST = "pbkdf2:sha256:1000"
+
+
+def test_hash_and_verify():
+    password_hash = hash_password("secret", FAST)
+
+    assert password_hash.startswith(FAST + "$")
+    assert password_hash != hash_password("secret", FAST)
+    assert verify_password(password_hash, "secret", FAST)
+    assert not verify_password(password_hash, "wrong", FAST)
+
+def test_unknown_user_never_verifies():
+    assert not verify_password(None, "anything", FAST)
+
+def test_needs_rehash_on_work_factor_change():
+    password_hash = hash_password("secret", FAST)
+
+    assert not needs_rehash(password_hash, FAST)
+    assert needs_rehash(password_hash, "pbkdf2:sha256:2000")
+
+def test_user_cache_keeps_unknown_users_and_expires():
+    cache = UserCache(ttl=60)
+    cache.set("ghost", None)
+    cache.set("alice", {"role": "student"})
+
+    assert cache.get("ghost") is None
+    assert cache.get("alice") == {"role": "student"}
+    assert cache.get("bob") is UserCache.MISSING
+    with patch("users.time.monotonic", return_value=time.monotonic() + 61):
+        assert cache.get("alice") is UserCache.MISSING
+
+def test_user_cache_invalidate_and_bound():
+    cache = UserCache(max_entries=2)
+    for name in ("a", "b", "c"):
+        cache.set(name, {"role": "student"})
+    cache.invalidate("c")
+
+    assert cache.get("a") is UserCache.MISSING
+    assert cache.get("c") is UserCache.MISSING
+    assert cache.stats()["evictions"] == 1
+
+def test_throttle_blocks_after_max_failures():
+    throttle = LoginThrottle(max_failures=3, window=60)
+    for _ in range(2):
+        throttle.failed("alice")
+    assert throttle.retry_after("alice") == 0
+
+    throttle.failed("alice")
+    assert 0 < throttle.retry_after("alice") <= 60
+    assert throttle.retry_after("bob") == 0
+    with patch("users.time.monotonic", return_value=time.monotonic() + 61):
+        assert throttle.retry_after("alice") == 0
+
+def test_throttle_reset_on_success():
+    throttle = LoginThrottle(max_failures=2, window=60)
+    throttle.failed("alice")
+    throttle.succeeded("alice")
+    throttle.failed("alice")
+
+    assert throttle.retry_after("alice") == 0
+
+def test_throttle_tracks_bounded_keys():
+    throttle = LoginThrottle(max_failures=1, window=60, max_keys=100)
+    threads = [threading.Thread(target=lambda n=n: [throttle.failed(f"user{n}-{i}") for i in range(100)])
+               for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert throttle.stats()["tracked"] == 100
+    assert throttle.stats()["failures"] == 400
@@ -0,0 +1,192 @@
+import threading
+
+
+class TimetableIndex:
+    """
+    Every student's and teacher's timetable, denormalised: for each person
+    the list of (period, class, course, room, teacher) entries is built
+    ahead of time, so a lookup is one dict hit. Roster rows are
+    reference-counted per (period, class, teacher) slot of each person,
+    and a write only rebuilds the timetables of the people it touches.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.students = set()
+        self.teachers = {}
+        self.classes = {}
+        self.rooms = {}
+        self.courses = {}
+        self.roster = {}
+        self.slots = {}
+        self.timetables = {}
+        # Who has a slot in a class, or with a teacher: the timetables to
+        # rebuild when that class or teacher changes.
+        self.by_class = {}
+        self.by_teacher = {}
+
+    def load(self, students=(), teachers=(), classes=(), rooms=(), courses=(), roster=()):
+        """
+        Replaces the index with full table contents, given as rows of
+        (idstudents,), (idteachers, name),
+        (idclasses, description, idroom, idcourse), (idrooms, location),
+        (idcourses, name) and
+        (idroster, idclass, idstudent, idteacher, class_period).
+        """
+        with self._lock:
+            self.students = {row[0] for row in students}
+            self.teachers = {row[0]: row[1] for row in teachers}
+            self.classes = {row[0]: (row[1], row[2], row[3]) for row in classes}
+            self.rooms = {row[0]: row[1] for row in rooms}
+            self.courses = {row[0]: row[1] for row in courses}
+            self.roster, self.slots, self.timetables = {}, {}, {}
+            self.by_class, self.by_teacher = {}, {}
+            changed = set()
+            for row in roster:
+                changed.update(self._add_roster(*row))
+            for person in changed:
+                self._rebuild(person)
+
+    def set_student(self, idstudents):
+        with self._lock:
+            self.students.add(idstudents)
+
+    def remove_student(self, idstudents):
+        with self._lock:
+            self.students.discard(idstudents)
+
+    def set_teacher(self, idteachers, name):
+        with self._lock:
+            self.teachers[idteachers] = name
+            self._rebuild_all(self.by_teacher.get(idteachers, ()))
+
+    def remove_teacher(self, idteachers):
+        with self._lock:
+            self.teachers.pop(idteachers, None)
+            self._rebuild_all(self.by_teacher.get(idteachers, ()))
+
+    def set_class(self, idclasses, description, idroom, idcourse):
+        with self._lock:
+            self.classes[idclasses] = (description, idroom, idcourse)
+            self._rebuild_all(self.by_class.get(idclasses, ()))
+
+    def remove_class(self, idclasses):
+        with self._lock:
+            self.classes.pop(idclasses, None)
+            self._rebuild_all(self.by_class.get(idclasses, ()))
+
+    def set_room(self, idrooms, location):
+        with self._lock:
+            self.rooms[idrooms] = location
+            self._rebuild_classes(1, idrooms)
+
+    def remove_room(self, idrooms):
+        with self._lock:
+            self.rooms.pop(idrooms, None)
+            self._rebuild_classes(1, idrooms)
+
+    def set_course(self, idcourses, name):
+        with self._lock:
+            self.courses[idcourses] = name
+            self._rebuild_classes(2, idcourses)
+
+    def remove_course(self, idcourses):
+        with self._lock:
+            self.courses.pop(idcourses, None)
+            self._rebuild_classes(2, idcourses)
+
+    def set_roster(self, idroster, idclass, idstudent, idteacher, period):
+        with self._lock:
+            changed = self._remove_roster(idroster)
+            changed.update(self._add_roster(idroster, idclass, idstudent, idteacher, period))
+            self._rebuild_all(changed)
+
+    def remove_roster(self, idroster):
+        with self._lock:
+            self._rebuild_all(self._remove_roster(idroster))
+
+    def timetable(self, kind, key):
+        """
+        The entries of a "student" or "teacher", ordered by period and
+        class, or None when there is no such person.
+        """
+        with self._lock:
+            if key not in (self.students if kind == "student" else self.teachers):
+                return None
+            return list(self.timetables.get((kind, key), ()))
+
+    def _people(self, idstudent, idteacher):
+        if idstudent is not None:
+            yield ("student", idstudent)
+        if idteacher is not None:
+            yield ("teacher", idteacher)
+
+    def _add_roster(self, idroster, idclass, idstudent, idteacher, period):
+        self.roster[idroster] = (idclass, idstudent, idteacher, period)
+        changed = set()
+        slot = (period, idclass, idteacher)
+        for person in self._people(idstudent, idteacher):
+            slots = self.slots.setdefault(person, {})
+            count = slots.get(slot, 0)
+            slots[slot] = count + 1
+            if not count:
+                self.by_class.setdefault(idclass, set()).add(person)
+                self.by_teacher.setdefault(idteacher, set()).add(person)
+                changed.add(person)
+        return changed
+
+    def _remove_roster(self, idroster):
+        row = self.roster.pop(idroster, None)
+        if row is None:
+            return set()
+        idclass, idstudent, idteacher, period = row
+        changed = set()
+        slot = (period, idclass, idteacher)
+        for person in self._people(idstudent, idteacher):
+            slots = self.slots[person]
+            slots[slot] -= 1
+            if slots[slot]:
+                continue
+            del slots[slot]
+            if not slots:
+                del self.slots[person]
+            if not any(other[1] == idclass for other in slots):
+                self._unlink(self.by_class, idclass, person)
+            if not any(other[2] == idteacher for other in slots):
+                self._unlink(self.by_teacher, idteacher, person)
+            changed.add(person)
+        return changed
+
+    def _unlink(self, links, key, person):
+        people = links[key]
+        people.discard(person)
+        if not people:
+            del links[key]
+
+    def _rebuild_classes(self, position, key):
+        for idclass, cls in self.classes.items():
+            if cls[position] == key:
+                self._rebuild_all(self.by_class.get(idclass, ()))
+
+    def _rebuild_all(self, people):
+        for person in list(people):
+            self._rebuild(person)
+
+    def _rebuild(self, person):
+        slots = self.slots.get(person)
+        if not slots:
+            self.timetables.pop(person, None)
+            return
+        entries = []
+        for period, idclass, idteacher in slots:
+            description, idroom, idcourse = self.classes.get(idclass, (None, None, None))
+            entries.append({
+                "period": period,
+                "idclass": idclass, "class": description,
+                "idcourse": idcourse, "course": self.courses.get(idcourse),
+                "idroom": idroom, "room": self.rooms.get(idroom),
+                "idteacher": idteacher, "teacher": self.teachers.get(idteacher),
+            })
+        entries.sort(key=lambda entry: (entry["period"], entry["class"] or "", entry["idclass"] or 0,
+                                        entry["idteacher"] or 0))
+        self.timetables[person] = entries
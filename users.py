@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_HASH_METHOD = "pbkdf2:sha256:600000"
+
+# Hashes checked against when a username does not exist, so an unknown
+# user costs as much as a wrong password and cannot be told apart by
+# response time. One per hash method, made on first use.
+dummy_hashes = {}
+
+
+def hash_password(password, method=DEFAULT_HASH_METHOD):
+    return generate_password_hash(password, method)
+
+def needs_rehash(password_hash, method=DEFAULT_HASH_METHOD):
+    """
+    True when password_hash was made with a different method or work
+    factor than the configured one.
+    """
+    return password_hash.split("$", 1)[0] != method
+
+def verify_password(password_hash, password, method=DEFAULT_HASH_METHOD):
+    if password_hash is None:
+        if method not in dummy_hashes:
+            dummy_hashes[method] = hash_password("dummy password", method)
+        check_password_hash(dummy_hashes[method], password)
+        return False
+    return check_password_hash(password_hash, password)
+
+
+class UserCache:
+    """
+    LRU of user records by username, each kept for ttl seconds. Unknown
+    usernames are cached too (as None) so repeated attempts on a missing
+    account do not reach the database. Writes in this process drop the
+    entry; other workers see them after at most ttl seconds.
+    """
+
+    MISSING = object()
+
+    def __init__(self, max_entries=10000, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, username):
+        """
+        The cached record, None for a cached unknown user, or MISSING.
+        """
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[username]
+                self._counters["misses"] += 1
+                return self.MISSING
+            self._entries.move_to_end(username)
+            self._counters["hits"] += 1
+            return entry[0]
+
+    def set(self, username, user):
+        with self._lock:
+            self._entries[username] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, username=None):
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+        return stats
+
+
+class LoginThrottle:
+    """
+    Counts failed logins per key (username or client address) over a
+    sliding window. Once a key reaches max_failures it is refused until
+    its oldest failure leaves the window. At most max_keys keys are
+    tracked; the least recently failed ones are forgotten first.
+    """
+
+    def __init__(self, max_failures=5, window=300, max_keys=100000):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._failures = OrderedDict()
+        self._counters = {"blocked": 0, "failures": 0}
+
+    def retry_after(self, *keys):
+        """
+        Seconds until the first of keys may try again, or 0 if none is
+        blocked.
+        """
+        now = time.monotonic()
+        wait = 0
+        with self._lock:
+            for key in keys:
+                failures = self._failures.get(key)
+                if failures is None:
+                    continue
+                while failures and failures[0] <= now - self.window:
+                    failures.popleft()
+                if not failures:
+                    del self._failures[key]
+                elif len(failures) >= self.max_failures:
+                    wait = max(wait, failures[0] + self.window - now)
+            if wait:
+                self._counters["blocked"] += 1
+        return wait
+
+    def failed(self, *keys):
+        now = time.monotonic()
+        with self._lock:
+            self._counters["failures"] += 1
+            for key in keys:
+                failures = self._failures.get(key)
+                if failures is None:
+                    failures = self._failures[key] = deque(maxlen=self.max_failures)
+                failures.append(now)
+                self._failures.move_to_end(key)
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+
+    def succeeded(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._failures.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["tracked"] = len(self._failures)
+        return stats